@@ -10,11 +10,11 @@ from typing import (
 )
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
-from agent.interview_response import QAResult, InterviewResult
+from agent.interview_response import QAResult, InterviewResult, Question
 from enum import Enum
 from datetime import datetime
 from langchain_core.messages import HumanMessage
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 import operator
 
 
@@ -29,6 +29,13 @@ class Difficulty(str, Enum):
     HARD = "Hard"
 
 
+class KickoffMode(str, Enum):
+    # generate the whole question list at kickoff, serve the next questions from it
+    PLAN = "plan"
+    # generate every question with a separate LLM call
+    INCREMENTAL = "incremental"
+
+
 def add_or_remove_messages(left: list[BaseMessage], right: list[BaseMessage] | list[str]) -> List[BaseMessage]:
     """Add or remove messages from the list.
     Args:
@@ -73,6 +80,24 @@ class AgentState(TypedDict):
     user_answer: str | None = None
     analyze_answer_response: QAResult | None = None
 
+    # interview plan (ordered questions generated at kickoff, only in plan mode)
+    # plan_index is the index of the next question to serve from the plan
+    # the plan is regenerated when the difficulty changes or regenerate_plan is set,
+    # both by ChatService.change_difficulty between two answers
+    interview_plan: List[Question] | None = None
+    plan_index: int = 0
+    plan_difficulty: Difficulty | None = None
+    regenerate_plan: bool = False
+    current_question: Question | None = None
+
+    # per-test model routing overrides (node -> model settings), applied on top of
+    # the routing table passed in config["configurable"]["model_routes"]
+    model_routes: Dict[str, Dict] | None = None
+
+    # usage records of the LLM calls of the interview (node, model, tokens, latency, wall time),
+    # see utils.llm.get_call_record, persisted with the test result
+    llm_usage: Annotated[List[Dict], operator.add] = []
+
     # final interview result
     interview_result: InterviewResult | None = None
 
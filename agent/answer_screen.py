@@ -0,0 +1,175 @@
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+from agent.interview_response import QAResult, Question, QuestionType, Answer
+from agent.qa_analyzer import get_question_number, GIVEUP_FEEDBACK
+from utils.metrics import metrics
+
+
+# Answers longer than this are truncated before they are analyzed and stored
+MAX_ANSWER_LENGTH = 4000
+# Answers of one question (the first answer, repeats and follow-ups), the last one is
+# graded as given and the question is given up instead of repeated
+MAX_ATTEMPTS_PER_QUESTION = 3
+# Shortest letter run checked for keyboard mash, shorter runs are choices ("A", "B, C") or acronyms
+MIN_GIBBERISH_TOKEN_LENGTH = 6
+# Shortest letter run with vowels checked for keyboard mash, shorter ones are left to the model
+MIN_VOWEL_GIBBERISH_TOKEN_LENGTH = 10
+# Longest consonant cluster and lowest vowel share of a word-like letter run
+MAX_WORD_CONSONANT_RUN = 3
+MIN_WORD_VOWEL_RATIO = 0.3
+# Share of the letters in gibberish runs above which the answer is gibberish
+GIBBERISH_LETTER_RATIO = 0.8
+
+KEYBOARD_ROWS = ("qwertyuiop", "asdfghjkl", "zxcvbnm")
+VOWELS = set("aeiouy")
+
+screened_answers = metrics.counter("answer_screened_total", "Answers settled locally without LLM analysis, by reason")
+truncated_answers = metrics.counter("answer_truncated_total", "Answers truncated to MAX_ANSWER_LENGTH before analysis")
+
+FEEDBACK = {
+    "empty": {
+        "English": "Your answer is empty, please answer the question.",
+        "Chinese": "您的回答为空，请回答问题。"
+    },
+    "gibberish": {
+        "English": "Your answer does not look like an answer to the question, please try again.",
+        "Chinese": "您的回答似乎与问题无关，请重新回答。"
+    },
+    "duplicate": {
+        "English": "This is the same answer as before, please add more details or answer differently.",
+        "Chinese": "您的回答与上次相同，请补充更多细节或换一种方式回答。"
+    },
+    "giveup": GIVEUP_FEEDBACK
+}
+
+
+def truncate_answer(answer: str, max_length: int = MAX_ANSWER_LENGTH) -> str:
+    """Cut pasted walls of text, the analysis only needs the beginning of the answer"""
+    if len(answer) <= max_length:
+        return answer
+    truncated_answers.inc()
+    return answer[:max_length]
+
+
+def normalize_answer(answer: str) -> str:
+    return " ".join(answer.split()).casefold()
+
+
+def char_entropy(text: str) -> float:
+    """Shannon entropy (bits per character) of the characters of text"""
+    counts = Counter(text)
+    return -sum(n / len(text) * math.log2(n / len(text)) for n in counts.values())
+
+
+def is_word_like(token: str) -> bool:
+    """Pronounceable shape of a lowercase letter run: enough vowels, short consonant clusters
+    and no letter tripled, e.g. "territory" or "pepper" but not "asdfasdfasdf"
+    """
+    if re.search(r"(.)\1\1", token):
+        return False
+    consonant_runs = re.findall(r"[^aeiouy]+", token)
+    if consonant_runs and max(len(run) for run in consonant_runs) > MAX_WORD_CONSONANT_RUN:
+        return False
+    return sum(char in VOWELS for char in token) / len(token) >= MIN_WORD_VOWEL_RATIO
+
+
+def is_gibberish_token(token: str) -> bool:
+    """Keyboard mash heuristics for one run of ASCII letters, e.g. "adfadsfdasf".
+    Args:
+        token: A run of ASCII letters.
+
+    Returns:
+        True if the run has no vowel, or is a long run that is not word-like and is typed along
+        one keyboard row or has a low letter entropy. camelCase identifiers ("TypeError") are never gibberish.
+    """
+    if len(token) < MIN_GIBBERISH_TOKEN_LENGTH or re.search(r"[a-z][A-Z]", token):
+        return False
+    token = token.lower()
+    if not VOWELS & set(token):
+        return True
+    if len(token) < MIN_VOWEL_GIBBERISH_TOKEN_LENGTH or is_word_like(token):
+        return False
+    return any(set(token) <= set(row) for row in KEYBOARD_ROWS) or char_entropy(token) < 2.5
+
+
+def is_gibberish(answer: str) -> bool:
+    """Answer made of keyboard mash or symbols only, answers in other scripts than Latin are left to the model"""
+    if re.search(r"[^\x00-\x7f]", answer):
+        return False
+    if not re.search(r"[A-Za-z0-9]", answer):
+        return True
+    tokens: List[str] = re.findall(r"[A-Za-z]+", answer)
+    letters = sum(len(token) for token in tokens)
+    gibberish_letters = sum(len(token) for token in tokens if is_gibberish_token(token))
+    return letters > 0 and gibberish_letters / letters >= GIBBERISH_LETTER_RATIO
+
+
+def get_attempts(qa_history: List[Tuple[str, str, QAResult]], question: str) -> List[str]:
+    """Answers already analyzed for the question, oldest first"""
+    # repeated and follow-up answers of a question keep the question text
+    return [answer for history_question, answer, _ in qa_history if history_question == question]
+
+
+def screen_answer(answer: str, question: str, qa_history: List[Tuple[str, str, QAResult]]) -> str | None:
+    """Check the answer locally before it is sent to the model.
+    Args:
+        answer: The (truncated) user answer.
+        question: The question text shown to the user.
+        qa_history: The history of the question and answer.
+
+    Returns:
+        Why the answer is settled without analysis (empty, duplicate or gibberish),
+        None if the answer needs the model.
+    """
+    attempts = get_attempts(qa_history, question)
+    if not answer.strip():
+        return "empty"
+    if attempts and normalize_answer(attempts[-1]) == normalize_answer(answer):
+        return "duplicate"
+    if is_gibberish(answer):
+        return "gibberish"
+    return None
+
+
+def build_screened_result(reason: str,
+                          question: str,
+                          answer: str,
+                          language: str,
+                          question_meta: Question | None = None,
+                          last_attempt: bool = False) -> QAResult:
+    """Build the invalid-answer QAResult of a screened answer.
+    Args:
+        reason: The reason returned by screen_answer.
+        question: The question text shown to the user.
+        answer: The user answer.
+        language: The feedback language.
+        question_meta: The question metadata (from the interview plan), if known.
+        last_attempt: The answer used the last attempt of the question, the question is given up
+            instead of repeated.
+
+    Returns:
+        The QAResult, repeated by the workflow unless the question is given up.
+    """
+    screened_answers.inc(reason=reason)
+    if question_meta is None:
+        question_meta = Question(question=question,
+                                 question_number=get_question_number(question),
+                                 question_type=QuestionType.NONE,
+                                 knowledge_point="",
+                                 answer="")
+
+    messages = FEEDBACK["giveup" if last_attempt else reason]
+    feedback = messages.get(language, messages["English"])
+    return QAResult(question=question_meta,
+                    answer=Answer(is_valid=False,
+                                  giveup=last_attempt,
+                                  suggest_more_details=False,
+                                  follow_up_question="",
+                                  feedback=feedback,
+                                  is_correct=False,
+                                  analysis="",
+                                  score=0),
+                    is_interview_over=False,
+                    summary=f"Q{question_meta.question_number} : not answered ({reason}) Score:0")
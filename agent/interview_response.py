@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import List
 from pydantic import BaseModel, Field
 
 class QuestionType(str, Enum):
@@ -16,6 +17,10 @@ class Question(BaseModel):
     question_type: QuestionType = Field(description="The type of the question")
     knowledge_point: str = Field(description="The knowledge point of the question")
     answer: str = Field(description="The answer of the question")
+
+
+class InterviewPlan(BaseModel):
+    questions: List[Question] = Field(description="The ordered list of interview questions, covering every knowledge point")
     
 
 class Answer(BaseModel):
@@ -29,6 +34,21 @@ class Answer(BaseModel):
     score: int = Field(description="The score of the answer (0-5)")
 
 
+class AnswerAnalysis(BaseModel):
+    """Compact analysis output, the verdict fields the workflow routes on and the question metadata
+    the skill analytics group on. The summary is filled in locally to build the QAResult."""
+    knowledge_point: str = Field(description="The knowledge point of the question")
+    question_type: QuestionType = Field(description="The type of the question")
+    is_valid: bool = Field(description="Whether the answer is a valid response")
+    giveup: bool = Field(description="Whether the user wants to giveup or skip the question")
+    suggest_more_details: bool = Field(description="Answer is too short, suggest more details")
+    follow_up_question: str = Field(description="A short friendly follow-up question, empty if not needed")
+    feedback: str = Field(description="A short friendly feedback to the user (one sentence)")
+    is_correct: bool = Field(description="Whether the answer is correct")
+    score: int = Field(description="The score of the answer (0-5)")
+    is_interview_over: bool = Field(description="Whether the interview is over")
+
+
 class QAResult(BaseModel):
     question: Question = Field(description="The question of the interview")
     answer: Answer = Field(description="The answer of the question")
@@ -0,0 +1,44 @@
+import math
+from datetime import datetime
+from typing import Dict, List, Tuple
+from agent.interview_response import QAResult, InterviewResult
+
+
+# Max score of a single answer, see Answer.score
+MAX_ANSWER_SCORE = 5
+# Max score of the interview, see InterviewResult.score
+MAX_INTERVIEW_SCORE = 10
+
+
+def compute_interview_statistics(qa_history: List[Tuple[str, str, QAResult]],
+                                 start_time: datetime,
+                                 end_time: datetime) -> InterviewResult:
+    """Compute the interview statistics exactly from the qa_history.
+
+    Follow-up and repeated answers of the same question are merged, the last
+    answer of each question counts.
+
+    Args:
+        qa_history: The history of the question and answer.
+        start_time: The start time of the interview.
+        end_time: The end time of the interview.
+
+    Returns:
+        The interview result without the narrative summary.
+    """
+    # the question text stays the same for repeated and follow-up answers
+    final_results: Dict[str, QAResult] = {question: qa_result for question, _, qa_result in qa_history}
+    results: List[QAResult] = list(final_results.values())
+
+    total_question_number: int = len(results)
+    correct_question_number: int = sum(r.answer.is_correct for r in results)
+    total_score: int = sum(min(max(r.answer.score, 0), MAX_ANSWER_SCORE) for r in results)
+    score: int = round(total_score * MAX_INTERVIEW_SCORE / (MAX_ANSWER_SCORE * total_question_number)) \
+        if total_question_number else 0
+    interview_time: int = max(0, math.ceil((end_time - start_time).total_seconds() / 60))
+
+    return InterviewResult(summary="",
+                           total_question_number=total_question_number,
+                           correct_question_number=correct_question_number,
+                           score=score,
+                           interview_time=interview_time)
@@ -0,0 +1,128 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict
+from langchain_core.messages import AIMessage
+from agent.interview_response import QAResult
+from utils.log_utils import logger
+from utils.metrics import metrics
+
+
+prefetch_requests = metrics.counter("prefetch_requests_total", "Next questions generated ahead of the answer")
+prefetch_hits = metrics.counter("prefetch_hits_total", "Prefetched next questions served to the candidate")
+prefetch_misses = metrics.counter("prefetch_misses_total", "Prefetched next questions discarded, by reason")
+prefetch_hit_rate = metrics.gauge("prefetch_hit_rate", "Hits / (hits + misses) of prefetched next questions")
+prefetch_wasted_tokens = metrics.counter("prefetch_wasted_tokens_total", "LLM tokens spent on discarded prefetches")
+
+
+@dataclass
+class PrefetchEntry:
+    """A next question generated in the background for one thread"""
+    future: Future
+    question: str
+    difficulty: str
+    created_at: datetime = field(default_factory=datetime.now)
+    discarded: bool = False
+
+
+class QuestionPrefetcher:
+    """Generate the likely next question while the candidate is answering the current one.
+
+    The prefetch is made with the qa_history available when the question is delivered,
+    it is used by send_next_question only if the answered question, the difficulty and
+    the analysis outcome still match, otherwise it is discarded and counted as waste.
+    """
+
+    def __init__(self, max_workers: int = 4, wait_timeout: float = 60):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="question-prefetch")
+        self._entries: Dict[str, PrefetchEntry] = {}
+        self._lock = threading.Lock()
+        self.wait_timeout = wait_timeout
+
+    def submit(self, thread_id: str, state: Dict, generate: Callable[[], AIMessage]) -> None:
+        """Start generating the next question for the question currently shown in state"""
+        thread_id = str(thread_id)
+        with self._lock:
+            entry = self._entries.get(thread_id)
+            if entry and entry.question == state["question"] and not entry.discarded:
+                # the same question is shown again (e.g. repeated), keep the running prefetch
+                return
+            self._entries.pop(thread_id, None)
+
+        if entry:
+            self._discard(entry, "superseded")
+
+        future = self._executor.submit(generate)
+        with self._lock:
+            self._entries[thread_id] = PrefetchEntry(future=future,
+                                                     question=state["question"],
+                                                     difficulty=state["difficulty"])
+        prefetch_requests.inc()
+        logger.info(f"Prefetching next question for thread {thread_id}")
+
+    def take(self, thread_id: str, state: Dict, remaining_time: int) -> AIMessage | None:
+        """Return the prefetched next question if it is still applicable, None otherwise"""
+        with self._lock:
+            entry = self._entries.pop(str(thread_id), None)
+        if entry is None:
+            return None
+
+        qa_result: QAResult | None = state.get("analyze_answer_response")
+        if entry.question != state["question"]:
+            reason = "question_changed"
+        elif entry.difficulty != state["difficulty"]:
+            reason = "difficulty_changed"
+        elif remaining_time <= 0:
+            reason = "time_up"
+        elif qa_result is None or qa_result.is_interview_over or \
+                not (qa_result.answer.is_valid or qa_result.answer.giveup):
+            reason = "analysis_outcome"
+        else:
+            try:
+                response: AIMessage = entry.future.result(timeout=self.wait_timeout)
+            except Exception as e:
+                logger.warning(f"Prefetch failed for thread {thread_id}: {e}")
+                self._record_miss("failed")
+                return None
+            prefetch_hits.inc()
+            self._update_hit_rate()
+            logger.info(f"Prefetch hit for thread {thread_id}")
+            return response
+
+        self._discard(entry, reason)
+        return None
+
+    def cancel(self, thread_id: str) -> None:
+        """Cancel the prefetch of a thread, e.g. when the interview ends"""
+        with self._lock:
+            entry = self._entries.pop(str(thread_id), None)
+        if entry:
+            self._discard(entry, "cancelled")
+
+    def _discard(self, entry: PrefetchEntry, reason: str) -> None:
+        entry.discarded = True
+        self._record_miss(reason)
+        if entry.future.cancel():
+            return
+        # already running, count the tokens once the generation finishes
+        entry.future.add_done_callback(self._record_wasted_tokens)
+
+    def _record_wasted_tokens(self, future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        usage = getattr(future.result(), "usage_metadata", None) or {}
+        prefetch_wasted_tokens.inc(usage.get("total_tokens", 0))
+
+    def _record_miss(self, reason: str) -> None:
+        prefetch_misses.inc(reason=reason)
+        self._update_hit_rate()
+
+    def _update_hit_rate(self) -> None:
+        hits = prefetch_hits.total()
+        total = hits + prefetch_misses.total()
+        prefetch_hit_rate.set(hits / total if total else 0)
+
+
+# Shared by the workflow nodes and the chat service
+question_prefetcher = QuestionPrefetcher()
@@ -2,32 +2,162 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agent.interview_response import QAResult
-from utils.llm import get_model
-from langchain_core.messages import HumanMessage
+import re
+from typing import Dict, List, Tuple
+from agent.interview_response import QAResult, AnswerAnalysis, Question, QuestionType, Answer
+from utils.llm import invoke_model, collect_usage, ModelRoute
+from utils.llm_scheduler import Priority
+from langchain_core.messages import HumanMessage, AIMessage
 from utils.prompt_utils import load_prompt
 from utils.log_utils import logger
 
 
-def analyze_question_answer(answer: str, question: str, language: str = "Chinese", model_name: str = "gpt-4o") -> QAResult:
-    logger.info("========== Analyzing Question Answer ==========")
-    
-    prompt_content: str = load_prompt('prompts/analyze_answer.txt')
+# Max length of the question / answer excerpts in the locally built summary
+SUMMARY_EXCERPT_LENGTH = 120
+
+# Feedback of a question given up after its last attempt
+GIVEUP_FEEDBACK = {
+    "English": "No valid answer was given to this question, moving on to the next one.",
+    "Chinese": "该问题未获得有效回答，进入下一题。"
+}
+
+
+def _excerpt(text: str, length: int = SUMMARY_EXCERPT_LENGTH) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= length else text[:length - 3] + "..."
+
+
+def get_question_number(question: str) -> int:
+    """Parse the Q<number> of a question text, 0 if not found"""
+    match = re.search(r"Q(\d+)", question)
+    return int(match.group(1)) if match else 0
+
+
+def build_qa_result(analysis: AnswerAnalysis,
+                    question: str,
+                    answer: str,
+                    question_meta: Question | None = None) -> QAResult:
+    """Build the full QAResult from the compact analysis and the question we already know.
+    Args:
+        analysis: The compact analysis from the model.
+        question: The question text shown to the user.
+        answer: The user answer.
+        question_meta: The question metadata (from the interview plan), if known, else the
+            knowledge point and type named by the model are used.
+
+    Returns:
+        The QAResult.
+    """
+    if question_meta is None:
+        # questions generated one at a time (incremental mode) have no plan metadata
+        question_meta = Question(question=question,
+                                 question_number=get_question_number(question),
+                                 question_type=analysis.question_type,
+                                 knowledge_point=analysis.knowledge_point,
+                                 answer="")
+
+    result_answer = Answer(is_valid=analysis.is_valid,
+                           giveup=analysis.giveup,
+                           suggest_more_details=analysis.suggest_more_details,
+                           follow_up_question=analysis.follow_up_question,
+                           feedback=analysis.feedback,
+                           is_correct=analysis.is_correct,
+                           analysis="",
+                           score=analysis.score)
+
+    summary = f"Q{question_meta.question_number} : {_excerpt(question)} {_excerpt(answer)} " \
+              f"Score:{analysis.score} {analysis.feedback}"
+
+    return QAResult(question=question_meta,
+                    answer=result_answer,
+                    is_interview_over=analysis.is_interview_over,
+                    summary=summary)
+
+
+def settle_last_attempt(qa_result: QAResult, language: str = "Chinese") -> QAResult:
+    """Move on after the last attempt of a question instead of repeating it.
+    An invalid answer gives the question up, a request for more details is dropped and the answer keeps its score.
+    Args:
+        qa_result: The analysis result of the last attempt.
+        language: The feedback language.
+
+    Returns:
+        The QAResult, never repeated by the workflow.
+    """
+    answer = qa_result.answer
+    if answer.giveup or (answer.is_valid and not answer.suggest_more_details):
+        return qa_result
+    updates = {"suggest_more_details": False, "follow_up_question": ""}
+    if not answer.is_valid:
+        updates["giveup"] = True
+        updates["feedback"] = GIVEUP_FEEDBACK.get(language, GIVEUP_FEEDBACK["English"])
+    return qa_result.model_copy(update={"answer": answer.model_copy(update=updates)})
+
+
+def run_analysis(answer: str,
+                 question: str,
+                 language: str = "Chinese",
+                 route: ModelRoute = ModelRoute(),
+                 compact: bool = True,
+                 elapsed_time: float | None = None,
+                 thread_id: str | None = None,
+                 llm_usage: List[Dict] | None = None) -> Tuple[AnswerAnalysis | QAResult, AIMessage]:
+    """Ask the model to analyze the answer.
+    Args:
+        answer: The user answer.
+        question: The question text.
+        language: The feedback language.
+        route: The model route of the analysis node.
+        compact: Use the compact AnswerAnalysis schema instead of the full QAResult.
+        elapsed_time: The elapsed interview time (in minutes), appended to the answer.
+        thread_id: The interview thread, for endpoint stickiness.
+        llm_usage: Collects the usage record of the call.
+
+    Returns:
+        The parsed structured output and the raw model message (with usage metadata).
+    """
+    prompt_file = 'prompts/analyze_answer_compact.txt' if compact else 'prompts/analyze_answer.txt'
+    prompt_content: str = load_prompt(prompt_file)
+    if elapsed_time is not None:
+        answer = answer + f"""\n\ntotal {elapsed_time} minutes passed"""
     human_prompt: HumanMessage = HumanMessage(content=prompt_content.format(
-        question=question, 
-        answer=answer, 
+        question=question,
+        answer=answer,
         language=language
     ))
-        
-    model = get_model(model=model_name).with_structured_output(QAResult)
-    response: QAResult = model.invoke([human_prompt])
-    
+
+    schema = AnswerAnalysis if compact else QAResult
+    response = invoke_model(route, [human_prompt], Priority.INTERACTIVE, output_tokens=256 if compact else 1024,
+                            node="analysis", schema=schema, thread_id=thread_id)
+    collect_usage(response, llm_usage)
+    if response["parsing_error"] is not None:
+        raise response["parsing_error"]
+    return response["parsed"], response["raw"]
+
+
+def analyze_question_answer(answer: str,
+                            question: str,
+                            language: str = "Chinese",
+                            route: ModelRoute = ModelRoute(),
+                            question_meta: Question | None = None,
+                            elapsed_time: float | None = None,
+                            thread_id: str | None = None,
+                            llm_usage: List[Dict] | None = None,
+                            last_attempt: bool = False) -> QAResult:
+    logger.info("========== Analyzing Question Answer ==========")
+
+    analysis, _ = run_analysis(answer, question, language, route, compact=True, elapsed_time=elapsed_time,
+                               thread_id=thread_id, llm_usage=llm_usage)
+    response: QAResult = build_qa_result(analysis, question, answer, question_meta)
+    if last_attempt:
+        response = settle_last_attempt(response, language)
+
     logger.info(f"Analysis Result: {response.model_dump_json(indent=2)}")
     return response
 
 if __name__ == "__main__":
     logger.info("Running QA Analyzer test cases")
-    
+
     # Test case 1: Invalid answer
     question = "Q2. What is the capital of France?"
     answer = "adfadsfdasf"
@@ -39,4 +169,3 @@ if __name__ == "__main__":
     answer = "A"
     logger.info("Test Case 2: Valid answer")
     qa_result = analyze_question_answer(answer, question, language="Chinese")
-
@@ -13,11 +13,14 @@ def execute_ai_interview_agent(workflow, inputs: dict):
     config = {
         "configurable": {
             "thread_id": uuid.uuid4(), 
-            "user_id": "Interviewer"
+            "user_id": "Interviewer",
+            # node -> model settings, see the llm.routes section of api/conf/config.yaml
+            "model_routes": {
+                "default": {"model": "gpt-4o"},
+                # "default": {"model": "claude-3-5-sonnet"},
+                # "default": {"model": "deepseek-v3"},
+            }
         },
-        # "model_name": "claude-3-5-sonnet",
-        "model_name": "gpt-4o",
-        # "model_name": "deepseek-v3",
     }
 
     # start the interview, generate the first question
@@ -1,65 +1,197 @@
-import json
-from typing import Dict, List
+import asyncio
+import orjson
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
 from langchain_core.messages import ToolMessage
 from agent.agent_state import AgentState
+from utils.metrics import metrics
+
+
+tool_calls_total = metrics.counter("tool_calls_total", "Tool calls executed by the tool node, by tool and outcome")
+tool_latency = metrics.histogram("tool_call_seconds", "Latency of the tool calls, by tool")
+
+
+def serialize_result(result: Any) -> str:
+    """Serialize a tool result with orjson, pydantic models are dumped, other unknown types use str"""
+    def default(value: Any) -> Any:
+        if hasattr(value, "model_dump"):
+            return value.model_dump()
+        return str(value)
+
+    return orjson.dumps(result, default=default).decode()
+
 
 class ToolNode:
     """Tool node class for handling tool operations"""
-    
-    def __init__(self, tools: List):
+
+    def __init__(self,
+                 tools: List,
+                 max_concurrency: int = 4,
+                 timeout: float = 30.0,
+                 timeouts: Dict[str, float] | None = None,
+                 pure_tools: Iterable[str] = (),
+                 cache_size: int = 256):
         """
         Initialize ToolNode with a list of tools
-        
+
         Args:
             tools: List of available tools
+            max_concurrency: Max number of tool calls of a message running at once (async only)
+            timeout: Default timeout of a tool call in seconds (async only)
+            timeouts: Timeout overrides by tool name
+            pure_tools: Names of the tools whose result only depends on their args, their results are memoized
+            cache_size: Max number of memoized results
         """
         self.tools = tools
         self.tools_by_name = {tool.name: tool for tool in tools}
-    
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.pure_tools = set(pure_tools)
+        self.cache_size = cache_size
+        self._cache: OrderedDict[Tuple[str, bytes], Any] = OrderedDict()
+
     def process_tool_calls(self, state: AgentState) -> Dict:
         """
         Process tool calls from the agent state
-        
+
         Args:
             state: Current agent state containing messages and tool calls
-            
+
         Returns:
             Dict containing list of tool messages
         """
         outputs = []
-        
+
         for tool_call in state["messages"][-1].tool_calls:
             tool_result = self._execute_tool(tool_call)
             outputs.append(self._create_tool_message(tool_call, tool_result))
-        
+
         return {"messages": outputs}
-    
+
+    async def aprocess_tool_calls(self, state: AgentState) -> Dict:
+        """
+        Process tool calls from the agent state concurrently
+
+        The calls run at most max_concurrency at once, each within its timeout. A call
+        that times out or fails gets an error tool message, the other results are kept.
+
+        Args:
+            state: Current agent state containing messages and tool calls
+
+        Returns:
+            Dict containing list of tool messages, in the order of the tool calls
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(tool_call: Dict) -> ToolMessage:
+            async with semaphore:
+                return await self._aexecute_tool_call(tool_call)
+
+        # gather keeps the order of the tool calls
+        outputs = await asyncio.gather(*[run(tool_call) for tool_call in state["messages"][-1].tool_calls])
+        return {"messages": list(outputs)}
+
     def _execute_tool(self, tool_call: Dict) -> Dict:
         """
         Execute a specific tool call
-        
+
         Args:
             tool_call: Dictionary containing tool call details
-            
+
         Returns:
             Tool execution result
         """
+        key = self._cache_key(tool_call)
+        if key in self._cache:
+            return self._cached(key, tool_call["name"])
         tool = self.tools_by_name[tool_call["name"]]
-        return tool.invoke(tool_call["args"])
-    
+        result = tool.invoke(tool_call["args"])
+        self._remember(key, result)
+        return result
+
+    async def _aexecute_tool_call(self, tool_call: Dict) -> ToolMessage:
+        """
+        Execute a specific tool call asynchronously within its timeout
+
+        Args:
+            tool_call: Dictionary containing tool call details
+
+        Returns:
+            ToolMessage containing the result or the error
+        """
+        name = tool_call["name"]
+        key = self._cache_key(tool_call)
+        if key in self._cache:
+            return self._create_tool_message(tool_call, self._cached(key, name))
+
+        timeout = self.timeouts.get(name, self.timeout)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            result = await asyncio.wait_for(self.tools_by_name[name].ainvoke(tool_call["args"]), timeout)
+        except asyncio.TimeoutError:
+            tool_calls_total.inc(tool=name, outcome="timeout")
+            return self._create_error_message(tool_call, f"Tool {name} timed out after {timeout}s")
+        except Exception as e:
+            tool_calls_total.inc(tool=name, outcome="error")
+            return self._create_error_message(tool_call, f"Tool {name} failed: {e}")
+
+        tool_latency.observe(loop.time() - start, tool=name)
+        tool_calls_total.inc(tool=name, outcome="ok")
+        self._remember(key, result)
+        return self._create_tool_message(tool_call, result)
+
+    def _cache_key(self, tool_call: Dict) -> Tuple[str, bytes] | None:
+        """Memoization key of a call of a pure tool, None for the other tools"""
+        if tool_call["name"] not in self.pure_tools:
+            return None
+        return tool_call["name"], orjson.dumps(tool_call["args"], option=orjson.OPT_SORT_KEYS)
+
+    def _cached(self, key: Tuple[str, bytes], name: str) -> Any:
+        self._cache.move_to_end(key)
+        tool_calls_total.inc(tool=name, outcome="cached")
+        return self._cache[key]
+
+    def _remember(self, key: Tuple[str, bytes] | None, result: Any) -> None:
+        if key is None:
+            return
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
     def _create_tool_message(self, tool_call: Dict, result: Dict) -> ToolMessage:
         """
         Create a tool message from execution result
-        
+
         Args:
             tool_call: Original tool call details
             result: Tool execution result
-            
+
         Returns:
             ToolMessage containing the result
         """
         return ToolMessage(
-            content=json.dumps(result),
+            content=serialize_result(result),
             name=tool_call["name"],
             tool_call_id=tool_call["id"]
-        )
\ No newline at end of file
+        )
+
+    def _create_error_message(self, tool_call: Dict, error: str) -> ToolMessage:
+        """
+        Create a tool message for a failed or timed out call, the model sees the error
+
+        Args:
+            tool_call: Original tool call details
+            error: Error description
+
+        Returns:
+            ToolMessage with error status
+        """
+        return ToolMessage(
+            content=serialize_result({"error": error}),
+            name=tool_call["name"],
+            tool_call_id=tool_call["id"],
+            status="error"
+        )
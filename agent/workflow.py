@@ -3,21 +3,152 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import ToolMessage, SystemMessage, AIMessage, HumanMessage
+from langchain_core.messages import ToolMessage, SystemMessage, AIMessage, HumanMessage, BaseMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_core.prompts import ChatPromptTemplate
-from agent.agent_state import AgentState
+from agent.agent_state import AgentState, KickoffMode
 from pydantic import BaseModel, Field   
-from utils.prompt_utils import load_prompt
-from utils.llm import get_model
-from agent.interview_response import Question, QAResult, Answer, QuestionType
+from utils.prompt_utils import load_prompt, build_layered_prompt
+from utils.llm import invoke_model, resolve_route, collect_usage, ModelRoute
+from utils.llm_scheduler import Priority
+from agent.interview_response import Question, QAResult, Answer, QuestionType, InterviewPlan
 from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.memory import MemorySaver
 from datetime import datetime   
 from agent.qa_analyzer import analyze_question_answer   
+from agent.answer_screen import screen_answer, build_screened_result, truncate_answer, get_attempts, \
+    MAX_ATTEMPTS_PER_QUESTION
+from agent.prefetch import question_prefetcher
 from utils.log_utils import logger
+from utils.metrics import metrics
 from agent.agent_state import get_qa_history
 from agent.interview_response import InterviewResult
+from agent.interview_stats import compute_interview_statistics
+from typing import Dict, List
+
+
+# Average time a candidate spends on one question, used to size the interview plan
+# and the question budget
+MINUTES_PER_QUESTION = 2
+
+interview_end_total = metrics.counter("interview_end_total", "Interviews ended by the workflow, by reason")
+
+
+def get_remaining_time(state: AgentState) -> int:
+    elapsed_time: int = int((datetime.now() - state["start_time"]).total_seconds() / 60)
+    return (state["interview_time"] - elapsed_time) if elapsed_time < state["interview_time"] else 0
+
+
+def get_question_budget(state: AgentState, config: RunnableConfig) -> int:
+    """Max number of questions of the interview, max_questions in the config or one per MINUTES_PER_QUESTION"""
+    max_questions = config["configurable"].get("max_questions")
+    return max_questions if max_questions else max(1, state["interview_time"] // MINUTES_PER_QUESTION)
+
+
+def get_remaining_questions(state: AgentState, config: RunnableConfig) -> int:
+    """Number of questions left in the budget, the question waiting for an answer included"""
+    # repeated and follow-up answers of a question keep the question text
+    answered = len({question for question, _, _ in state.get("qa_history", [])})
+    return get_question_budget(state, config) - answered
+
+
+def get_end_reason(state: AgentState, config: RunnableConfig) -> str | None:
+    """Why the interview is over after the last answer, None if another question should be asked.
+    Args:
+        state: The agent state.
+        config: The runnable config.
+
+    Returns:
+        time_up, question_budget or plan_finished, or None.
+    """
+    if get_remaining_time(state) <= 0:
+        return "time_up"
+    if get_remaining_questions(state, config) <= 0:
+        return "question_budget"
+    plan = state.get("interview_plan")
+    plan_outdated = state.get("regenerate_plan") or state.get("plan_difficulty") != state["difficulty"]
+    if plan is not None and not plan_outdated and state.get("plan_index", 0) >= len(plan):
+        return "plan_finished"
+    return None
+
+
+def get_node_route(node: str, state: AgentState, config: RunnableConfig) -> ModelRoute:
+    """Model route of a node, from the routing table in the config and the per-test overrides in the state"""
+    return resolve_route(node, config["configurable"].get("model_routes"), state.get("model_routes"))
+
+
+def get_interview_context(state: AgentState) -> dict:
+    """Per-test prompt context, identical for every call of an interview"""
+    return {
+        "job_title": state["job_title"],
+        "knowledge_points": state["knowledge_points"],
+        "difficulty": state["difficulty"],
+        "interview_time": state["interview_time"],
+        "language": state["language"]
+    }
+
+
+def get_closing_message(language: str) -> str:
+    if language == "Chinese":
+        return "面试结束，感谢您的参与。"
+    return "Interview Over, thank you for your participation."
+
+
+def build_question_prompt(state: AgentState, remaining_time: int) -> List[BaseMessage]:
+    """Prompt of the kickoff / next question, laid out for provider-side prefix caching.
+    Args:
+        state: The agent state.
+        remaining_time: The remaining interview time (in minutes).
+
+    Returns:
+        The prompt messages.
+    """
+    return build_layered_prompt('prompts/kickoff_interview_system.txt',
+                                'prompts/interview_context.txt',
+                                'prompts/kickoff_interview_turn.txt',
+                                context=get_interview_context(state),
+                                turn={"remaining_time": remaining_time,
+                                      "qa_history": get_qa_history(state["qa_history"])})
+
+
+def generate_interview_plan(state: AgentState,
+                            config: RunnableConfig,
+                            remaining_time: int,
+                            start_number: int = 1,
+                            llm_usage: List[Dict] | None = None) -> List[Question]:
+    """Generate the ordered question list for the rest of the interview in one LLM call.
+    Args:
+        state: The agent state.
+        config: The runnable config.
+        remaining_time: The remaining interview time (in minutes), used to size the plan.
+        start_number: The number of the first question in the plan.
+        llm_usage: Collects the usage record of the call.
+
+    Returns:
+        The ordered list of questions.
+    """
+    logger.info("========== Generate Interview Plan ==========")
+
+    question_count: int = max(1, remaining_time // MINUTES_PER_QUESTION)
+    prompt_messages = build_layered_prompt('prompts/plan_interview_system.txt',
+                                           'prompts/interview_context.txt',
+                                           'prompts/plan_interview_turn.txt',
+                                           context=get_interview_context(state),
+                                           turn={"remaining_time": remaining_time,
+                                                 "question_count": question_count,
+                                                 "start_number": start_number,
+                                                 "qa_history": get_qa_history(state["qa_history"])})
+
+    logger.info(f"System : {prompt_messages[-1].content}")
+    response = invoke_model(get_node_route("plan", state, config), prompt_messages, Priority.INTERACTIVE,
+                            output_tokens=4096, node="plan", schema=InterviewPlan,
+                            thread_id=config["configurable"].get("thread_id"))
+    collect_usage(response, llm_usage)
+    if response["parsing_error"] is not None:
+        raise response["parsing_error"]
+    plan: InterviewPlan = response["parsed"]
+    logger.info(f"Interview plan with {len(plan.questions)} questions generated")
+    return plan.questions
 
 
 def kickoff_interview(state: AgentState,     
@@ -25,25 +156,38 @@ def kickoff_interview(state: AgentState,
     
     logger.info("========== Kickoff Interview ==========")
 
-    prompt_content: str = load_prompt('prompts/kickoff_interview.txt')
-    human_prompt: HumanMessage = HumanMessage(content=prompt_content.format(job_title=state["job_title"], 
-                                                              knowledge_points=state["knowledge_points"],
-                                                              interview_time=state["interview_time"],
-                                                              remaining_time=state["interview_time"],
-                                                              language=state["language"],
-                                                              difficulty=state["difficulty"],
-                                                              qa_history=get_qa_history(state["qa_history"])))
-
-    model_name: str = config["configurable"].get("model_name", "gpt-4o")
-    model: ChatOpenAI = get_model(model=model_name)
-    
-    logger.info(f"System : {human_prompt.content}")
-    response = model.invoke([human_prompt])
+    kickoff_mode: str = config["configurable"].get("kickoff_mode", KickoffMode.PLAN)
+    llm_usage: List[Dict] = []
+    if kickoff_mode == KickoffMode.PLAN:
+        plan: List[Question] = generate_interview_plan(state, config, remaining_time=state["interview_time"],
+                                                       llm_usage=llm_usage)
+        if plan:
+            question: Question = plan[0]
+            return {
+                "messages": [AIMessage(content=question.question)],
+                "question": question.question,
+                "feedback": question.question,
+                "interview_plan": plan,
+                "plan_index": 1,
+                "plan_difficulty": state["difficulty"],
+                "regenerate_plan": False,
+                "current_question": question,
+                "llm_usage": llm_usage
+            }
+        logger.warning("Empty interview plan, falling back to incremental questions")
+
+    prompt_messages = build_question_prompt(state, remaining_time=state["interview_time"])
+
+    logger.info(f"System : {prompt_messages[-1].content}")
+    response = invoke_model(get_node_route("kickoff", state, config), prompt_messages, Priority.INTERACTIVE, node="kickoff",
+                            thread_id=config["configurable"].get("thread_id"))
+    collect_usage(response, llm_usage)
 
     return {
-        "messages": [human_prompt, response],
+        "messages": [*prompt_messages, response],
         "question": response.content,
-        "feedback": response.content
+        "feedback": response.content,
+        "llm_usage": llm_usage
     }
 
 
@@ -60,7 +204,7 @@ def analyze_answer(state: AgentState,
 
     end_time = datetime.now()
     elapsed_time = (end_time - state["start_time"]).total_seconds() / 60
-    answer: str = state["user_answer"]
+    answer: str = truncate_answer(state["user_answer"])
     user_message = answer + f"""\n\ntotal {elapsed_time} minutes passed"""
     if is_stop_by_user(answer):
         logger.info(f"Interview is stopped by user answer {answer}")
@@ -86,8 +230,31 @@ def analyze_answer(state: AgentState,
             "qa_history": [(state["question"], answer, qa_result)]
         }
 
-    model_name = config["configurable"].get("model_name", "gpt-4o")
-    response: QAResult = analyze_question_answer(user_message, state["question"], state["language"])
+    # the last attempt of a question is graded as given, the question is not repeated anymore
+    last_attempt = len(get_attempts(state["qa_history"], state["question"])) + 1 >= MAX_ATTEMPTS_PER_QUESTION
+
+    # empty, mashed and repeated answers are settled locally
+    reason = screen_answer(answer, state["question"], state["qa_history"])
+    if reason:
+        logger.info(f"Answer screened without analysis: {reason}")
+        qa_result = build_screened_result(reason, state["question"], answer, state["language"],
+                                          question_meta=state.get("current_question"),
+                                          last_attempt=last_attempt)
+        return {
+            "end_time": end_time,
+            "messages": [HumanMessage(content=user_message)],
+            "analyze_answer_response": qa_result,
+            "qa_history": [(state["question"], answer, qa_result)]
+        }
+
+    llm_usage: List[Dict] = []
+    response: QAResult = analyze_question_answer(answer, state["question"], state["language"],
+                                                 route=get_node_route("analysis", state, config),
+                                                 thread_id=config["configurable"].get("thread_id"),
+                                                 question_meta=state.get("current_question"),
+                                                 elapsed_time=elapsed_time,
+                                                 llm_usage=llm_usage,
+                                                 last_attempt=last_attempt)
 
     qa_tuple = (state["question"], answer, response)
 
@@ -95,7 +262,8 @@ def analyze_answer(state: AgentState,
         "end_time": end_time,
         "messages": [HumanMessage(content=user_message)], 
         "analyze_answer_response": response,
-        "qa_history": [qa_tuple]
+        "qa_history": [qa_tuple],
+        "llm_usage": llm_usage
     }    
 
 
@@ -123,27 +291,97 @@ def repeat_question(state: AgentState,
     }
 
 
+def send_next_planned_question(state: AgentState,
+                               config: RunnableConfig):
+
+    logger.info("========== Send Next Planned Question ==========")
+
+    plan: List[Question] = state["interview_plan"]
+    plan_index: int = state.get("plan_index", 0)
+    remaining_time: int = get_remaining_time(state)
+    updates = {}
+    llm_usage: List[Dict] = []
+
+    # regenerate the rest of the plan on demand, e.g. when the difficulty is adapted
+    if remaining_time > 0 and (state.get("regenerate_plan") or state.get("plan_difficulty") != state["difficulty"]):
+        logger.info(f"Regenerating interview plan, difficulty: {state['difficulty']}")
+        current_question: Question | None = state.get("current_question")
+        start_number: int = current_question.question_number + 1 if current_question else plan_index + 1
+        plan = generate_interview_plan(state, config, remaining_time=remaining_time, start_number=start_number,
+                                       llm_usage=llm_usage)
+        plan_index = 0
+        updates = {
+            "interview_plan": plan,
+            "plan_difficulty": state["difficulty"],
+            "regenerate_plan": False
+        }
+
+    if remaining_time > 0 and plan_index < len(plan):
+        next_question: Question | None = plan[plan_index]
+        content: str = next_question.question
+        plan_index += 1
+    else:
+        # e.g. the regenerated plan is empty, is_over_condition ends the interview
+        logger.info(f"Interview plan is finished, remaining time: {remaining_time} minutes")
+        return {
+            **updates,
+            "question": None,
+            "current_question": None,
+            "plan_index": plan_index,
+            "llm_usage": llm_usage
+        }
+
+    qa_result: QAResult = state["analyze_answer_response"]
+    ai_analysis = "User answer analysis:\n\n" + qa_result.answer.model_dump_json(indent=2) + "\n\n"
+    ai_message = AIMessage(content=ai_analysis + "Next question:\n\n" + content)
+
+    return {
+        **updates,
+        "messages": [ai_message],
+        "question": content,
+        "feedback": content,
+        "plan_index": plan_index,
+        "current_question": next_question,
+        "user_answer": None,
+        "analyze_answer_response": None,
+        "llm_usage": llm_usage
+    }
+
+
+def generate_next_question(state: AgentState,
+                           config: RunnableConfig,
+                           priority: Priority = Priority.INTERACTIVE) -> AIMessage:
+    """Generate the next question with the kickoff prompt and the current qa_history.
+    Args:
+        state: The agent state.
+        config: The runnable config.
+        priority: The LLM scheduler priority, deferrable for prefetches.
+
+    Returns:
+        The model response containing the next question (with its usage record).
+    """
+    prompt_messages = build_question_prompt(state, remaining_time=get_remaining_time(state))
+
+    logger.info(f"System : {prompt_messages[-1].content}")
+    return invoke_model(get_node_route("next_question", state, config), prompt_messages, priority, node="next_question",
+                        thread_id=config["configurable"].get("thread_id"))
+
+
 def send_next_question(state: AgentState,
                       config: RunnableConfig):
 
-    logger.info("========== Send Next Question ==========")
+    if state.get("interview_plan") is not None:
+        return send_next_planned_question(state, config)
 
-    model_name: str = config["configurable"].get("model_name", "gpt-4o")
-    model: ChatOpenAI = get_model(model=model_name)
-    
-    prompt_content: str = load_prompt('prompts/kickoff_interview.txt')
-    elapsed_time: int = int((datetime.now() - state["start_time"]).total_seconds() / 60)
-    remaining_time: int = (state["interview_time"] - elapsed_time) if elapsed_time < state["interview_time"] else 0
-    human_prompt: HumanMessage = HumanMessage(content=prompt_content.format(job_title=state["job_title"], 
-                                                              knowledge_points=state["knowledge_points"],
-                                                              interview_time=state["interview_time"],
-                                                              remaining_time=remaining_time,
-                                                              language=state["language"],
-                                                              difficulty=state["difficulty"],
-                                                              qa_history=get_qa_history(state["qa_history"])))
+    logger.info("========== Send Next Question ==========")
 
-    logger.info(f"System : {human_prompt.content}")
-    response = model.invoke([human_prompt])
+    # use the question prefetched while the candidate was answering, if still applicable
+    thread_id = config["configurable"].get("thread_id")
+    response = question_prefetcher.take(thread_id, state, get_remaining_time(state))
+    if response is None:
+        response = generate_next_question(state, config)
+    llm_usage: List[Dict] = []
+    collect_usage(response, llm_usage)
 
     qa_result: QAResult = state["analyze_answer_response"]
     ai_analysis = "User answer analysis:\n\n" + qa_result.answer.model_dump_json(indent=2) + "\n\n"
@@ -155,38 +393,100 @@ def send_next_question(state: AgentState,
         "feedback": response.content,
         "user_answer": None,
         "analyze_answer_response": None,
+        "llm_usage": llm_usage
     }
 
 
+def generate_interview_summary(job_title: str,
+                               knowledge_points: str,
+                               interview_time: int,
+                               language: str,
+                               qa_history: str,
+                               statistics: InterviewResult,
+                               route: ModelRoute = ModelRoute(),
+                               thread_id: str | None = None,
+                               llm_usage: List[Dict] | None = None) -> str:
+    """Ask the model for the narrative summary only, the statistics are computed locally.
+    Args:
+        job_title: The job title.
+        knowledge_points: The knowledge points of the interview.
+        interview_time: The planned interview time (in minutes).
+        language: The interview language.
+        qa_history: The history string of the question and answer, see get_qa_history.
+        statistics: The interview statistics.
+        route: The model route of the summary node.
+        thread_id: The interview thread, for endpoint stickiness.
+        llm_usage: Collects the usage record of the call.
+
+    Returns:
+        The narrative summary.
+    """
+    prompt_content: str = load_prompt('prompts/summarize_interview.txt')
+    human_prompt: HumanMessage = HumanMessage(content=prompt_content.format(job_title=job_title, 
+                                                              knowledge_points=knowledge_points,
+                                                              interview_time=interview_time,
+                                                              language=language,
+                                                              qa_history=qa_history,
+                                                              correct_question_number=statistics.correct_question_number,
+                                                              total_question_number=statistics.total_question_number,
+                                                              score=statistics.score,
+                                                              elapsed_time=statistics.interview_time))
+
+    logger.info(f"System : {human_prompt.content}")
+    response = invoke_model(route, [human_prompt], Priority.DEFERRABLE, output_tokens=1024, node="summary",
+                            thread_id=thread_id)
+    collect_usage(response, llm_usage)
+    return response.content
+
+
 def summarize_interview(state: AgentState,
                         config: RunnableConfig):
     logger.info("========== Summarize Interview ==========")
 
-    prompt_content: str = load_prompt('prompts/summarize_interview.txt')
-    human_prompt: HumanMessage = HumanMessage(content=prompt_content.format(job_title=state["job_title"], 
-                                                              knowledge_points=state["knowledge_points"],
-                                                              interview_time=state["interview_time"],
-                                                              language=state["language"],
-                                                              qa_history=get_qa_history(state["qa_history"])))
-
-    model_name: str = config["configurable"].get("model_name", "gpt-4o")
-    model: ChatOpenAI = get_model(model=model_name).with_structured_output(InterviewResult)
-    
-    logger.info(f"System : {human_prompt.content}")
-    response: InterviewResult = model.invoke([human_prompt])
-    logger.info(f"Interview Result : {response.model_dump_json(indent=2)}")
+    end_time = datetime.now()
+    interview_result: InterviewResult = compute_interview_statistics(state["qa_history"], state["start_time"], end_time)
+    # the closing message is built locally, the model is not asked to end the interview
+    closing_message: str = get_closing_message(state["language"])
+    closing = {
+        "messages": [AIMessage(content=closing_message)],
+        "question": None,
+        "feedback": closing_message,
+        "end_time": end_time
+    }
+
+    # the narrative can be generated after the candidate has seen the final message
+    if config["configurable"].get("defer_summary", False):
+        logger.info(f"Interview Result (summary deferred) : {interview_result.model_dump_json(indent=2)}")
+        return {
+            **closing,
+            "interview_result": interview_result
+        }
+
+    llm_usage: List[Dict] = []
+    interview_result.summary = generate_interview_summary(job_title=state["job_title"],
+                                                          knowledge_points=state["knowledge_points"],
+                                                          interview_time=state["interview_time"],
+                                                          language=state["language"],
+                                                          qa_history=get_qa_history(state["qa_history"]),
+                                                          statistics=interview_result,
+                                                          route=get_node_route("summary", state, config),
+                                                          thread_id=config["configurable"].get("thread_id"),
+                                                          llm_usage=llm_usage)
+    logger.info(f"Interview Result : {interview_result.model_dump_json(indent=2)}")
 
     return {
-        "interview_result": response
+        **closing,
+        "interview_result": interview_result,
+        "llm_usage": llm_usage
     }
 
 
 def is_over_condition(state: AgentState,
                       config: RunnableConfig):
     logger.info("========== Check Is Over Condition ==========")
-    question: str = state["question"]
-    if "面试结束" in question or "Interview Over" in question:
-        logger.info(f"Interview is over: {question}")
+    if not state.get("question"):
+        logger.info("Interview is over, no question left")
+        interview_end_total.inc(reason="no_question")
         return "summarize_interview"
     else:
         return "analyze_answer"
@@ -205,6 +505,13 @@ def check_analyze_answer_response_condition(state: AgentState,
 
     if qa_result.is_interview_over:
         logger.info("Interview is over")
+        interview_end_total.inc(reason="analysis")
+        return "summarize_interview"
+
+    if get_remaining_time(state) <= 0:
+        # no more repeated questions either
+        logger.info("Interview is over: time_up")
+        interview_end_total.inc(reason="time_up")
         return "summarize_interview"
 
     if qa_result.answer and not qa_result.answer.is_valid and not qa_result.answer.giveup:
@@ -215,6 +522,13 @@ def check_analyze_answer_response_condition(state: AgentState,
         logger.info("Suggest more details, repeating question")
         return "repeat_question"
 
+    # the time and question budget is checked locally, no generation is spent on ending the interview
+    end_reason = get_end_reason(state, config)
+    if end_reason:
+        logger.info(f"Interview is over: {end_reason}")
+        interview_end_total.inc(reason=end_reason)
+        return "summarize_interview"
+
     logger.info("Moving to next question")
     return "send_next_question"
 
@@ -276,11 +590,11 @@ def generate_workflow_mermaid() -> str:
         B -->|check_analyze_answer_response| C{Condition Check}
         C -->|Repeat Question| D[repeat_question]
         C -->|Next Question| E[send_next_question]
-        C -->|Interview Over| F[summarize_interview]
+        C -->|Interview Over / Budget Exhausted| F[summarize_interview]
         
         D --> B
         
-        E -->|is_over_condition| G{Is Over?}
+        E -->|is_over_condition| G{No Question Left?}
         G -->|Yes| F
         G -->|No| B
         
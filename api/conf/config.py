@@ -1,7 +1,7 @@
 from dataclasses import dataclass
-from typing import List
-from omegaconf import DictConfig
-import hydra
+from functools import lru_cache
+from typing import Any, Dict, List
+from omegaconf import DictConfig, OmegaConf
 import os
 from dotenv import load_dotenv
 
@@ -33,22 +33,59 @@ class CorsConfig:
     allow_methods: List[str]
     allow_headers: List[str]
 
+@dataclass
+class LLMConfig:
+    kickoff_mode: str
+    routes: Dict[str, Dict[str, Any]]
+    allowed_models: List[str]
+    max_tokens_cap: int
+
+@dataclass
+class FinalizationConfig:
+    run_in_api: bool
+    batch_size: int
+    poll_interval: float
+    lease_seconds: int
+    max_attempts: int
+    retry_base_delay: float
+    summary_concurrency: int
+
+@dataclass
+class DeadlineConfig:
+    run_in_api: bool
+    batch_size: int
+    poll_interval: float
+    grace_seconds: int
+    orphan_grace_seconds: int
+
 @dataclass
 class Config:
     app: AppConfig
     server: ServerConfig
     logging: LoggingConfig
     cors: CorsConfig
+    llm: LLMConfig
+    finalization: FinalizationConfig
+    deadline: DeadlineConfig
 
     @classmethod
     def load_config(cls) -> 'Config':
-        """Load configuration using Hydra"""
-        with hydra.initialize(version_base=None, config_path="../conf"):
-            cfg = hydra.compose(config_name="config")
+        """
+        Load configuration, read once per process
+
+        The single config.yaml has no defaults list nor overrides, OmegaConf reads it
+        directly: composing it with Hydra made up most of the time to load it.
+        """
+        return _load_config_file()
+
+
+@lru_cache(maxsize=1)
+def _load_config_file() -> DictConfig:
+    cfg = OmegaConf.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml"))
 
-            # Override cors allow_origins from environment variable
-            allow_origins_str = os.getenv("CORS_ALLOWED_ORIGINS")
-            if allow_origins_str:
-                cfg.cors.allow_origins = allow_origins_str.split(',')
+    # Override cors allow_origins from environment variable
+    allow_origins_str = os.getenv("CORS_ALLOWED_ORIGINS")
+    if allow_origins_str:
+        cfg.cors.allow_origins = allow_origins_str.split(',')
 
-            return hydra.utils.instantiate(cfg)
\ No newline at end of file
+    return cfg
\ No newline at end of file
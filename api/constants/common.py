@@ -68,4 +68,15 @@ class QuestionType(str, Enum):
     
     @classmethod
     def choices(cls):
-        return [member.value for member in cls]
\ No newline at end of file
+        return [member.value for member in cls]
+
+class TaskStatus(str, Enum):
+    """Status options for background tasks"""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    
+    @classmethod
+    def choices(cls):
+        return [member.value for member in cls]
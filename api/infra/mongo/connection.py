@@ -7,7 +7,11 @@ import os
 load_dotenv()
 
 def init_mongodb():
-    """Test MongoDB connection"""
+    """
+    Connect to MongoDB, once per process: by the lifespan of the API, or by the scripts
+
+    MongoEngine opens the connection lazily, on the first query
+    """
     try:
         disconnect()
         mongo_uri = os.getenv("MONGODB_URI")  # Fetch MongoDB URI from the environment variable
@@ -17,5 +21,3 @@ def init_mongodb():
         logger.info("Successfully connected to MongoDB!")
     except Exception as e:
         logger.error(f"Connection failed: {e}")
-
-init_mongodb()
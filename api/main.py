@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from api.conf.config import Config
 from api.infra.mongo.connection import init_mongodb
 # from api.infra.mongo.connection import init_mongodb, MongoConnection
@@ -5,9 +7,6 @@ from api.infra.mongo.connection import init_mongodb
 # Load configuration
 config = Config.load_config()
 
-# Initialize MongoDB
-init_mongodb()
-
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -23,8 +22,10 @@ from api.middleware.error_handler import (
     validation_exception_handler,
     generic_exception_handler
 )
-from api.router import health, test, user, job, question, chat, test_result
+from api.router import health, test, user, job, question, chat, test_result, analytics, export, finalization
 from api.exceptions.api_error import APIError
+from api.service.finalization_queue import finalization_queue
+from api.service.deadline_scheduler import deadline_scheduler
 
 
 # Configure logging
@@ -35,8 +36,31 @@ logger.add(
     rotation=config.logging.rotation
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the process: MongoDB connection, workflow graph and background workers, then stop the workers"""
+    # Initialize MongoDB, once per process
+    init_mongodb()
+
+    # Compile the workflow graph in a worker thread while the first requests are served,
+    # a chat request arriving before it is ready builds it (once, see ChatService.workflow)
+    warm_up = asyncio.create_task(asyncio.to_thread(chat.chat_service.warm_up))
+
+    # Finalization queue worker and deadline scheduler
+    if config.finalization.run_in_api:
+        finalization_queue.start()
+    if config.deadline.run_in_api:
+        deadline_scheduler.start()
+
+    yield
+
+    await finalization_queue.stop()
+    await deadline_scheduler.stop()
+    await asyncio.gather(warm_up, return_exceptions=True)
+
 app = FastAPI(
     title=config.app.name,
+    lifespan=lifespan,
     openapi_url=f"{config.app.api_v1_str}/openapi.json",
     docs_url=f"{config.app.api_v1_str}/doc",
 )
@@ -65,6 +89,19 @@ app.include_router(job.router, prefix=config.app.api_v1_str)
 app.include_router(question.router, prefix=config.app.api_v1_str)
 app.include_router(chat.router, prefix=config.app.api_v1_str)
 app.include_router(test_result.router, prefix=config.app.api_v1_str)
+app.include_router(analytics.router, prefix=config.app.api_v1_str)
+app.include_router(export.router, prefix=config.app.api_v1_str)
+app.include_router(finalization.router, prefix=config.app.api_v1_str)
+
+# Model routing table of the interview workflow nodes
+chat.chat_service.configure(config.llm)
+
+# Finalization queue worker (summarizes and persists completed interviews)
+finalization_queue.configure(config.finalization)
+
+# Deadline scheduler (finalizes abandoned interviews, releases the sessions of this process)
+deadline_scheduler.configure(config.deadline)
+deadline_scheduler.attach(chat.chat_service)
 
 # def shutdown_event():
 #     MongoConnection.close_client()
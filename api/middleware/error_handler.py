@@ -27,7 +27,8 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> JSONRe
             code=str(exc.status_code),
             message=exc.detail,
             data=None
-        ).model_dump()
+        ).model_dump(),
+        headers=getattr(exc, "headers", None)
     )
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class SkillReport(BaseModel):
+    """知识点掌握情况模型"""
+    knowledge_point: str = Field(..., description="知识点")
+    count: int = Field(..., description="作答数量")
+    correct_ratio: float = Field(..., description="正确率")
+    smoothed_correct_ratio: float = Field(..., description="平滑后的正确率(按总体正确率加先验), 用于排名")
+    mean_score: float = Field(..., description="平均得分(0-5)")
+
+class SkillHeatmap(BaseModel):
+    """知识点热力图模型"""
+    group_by: str = Field(..., description="行分组", examples=["test", "user", "week"])
+    rows: List[str] = Field(..., description="行标签(测试ID、用户ID或周一日期)")
+    total_rows: int = Field(..., description="截断前的行数")
+    knowledge_points: List[str] = Field(..., description="列标签(知识点)")
+    count: List[List[int]] = Field(..., description="作答数量矩阵")
+    correct_ratio: List[List[Optional[float]]] = Field(..., description="正确率矩阵, 无作答为空")
+    mean_score: List[List[Optional[float]]] = Field(..., description="平均得分矩阵, 无作答为空")
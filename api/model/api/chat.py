@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from uuid import UUID
+from api.constants.common import Difficulty
 
 
 class StartChatRequest(BaseModel):
@@ -21,6 +22,12 @@ class AnswerRequest(BaseModel):
     question_id: str = Field(..., description="问题ID")
     user_answer: str = Field(..., description="用户回答")
 
+class ChangeDifficultyRequest(BaseModel):
+    """修改面试难度请求模型"""
+    user_id: str = Field(..., description="用户ID")
+    test_id: str = Field(..., description="测试ID")
+    difficulty: str = Field(..., description="新的难度（之后的问题生效）", examples=Difficulty.choices())
+
 class ChatResponse(BaseModel):
     """聊天响应模型"""
     qa_history: Optional[List[Dict[str, Any]]] = Field(None, description="问答历史")
@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+from api.constants.common import TaskStatus
+
+class FinalizationTaskResponse(BaseModel):
+    """面试结果生成任务响应模型"""
+    test_id: str = Field(..., description="测试ID")
+    user_id: str = Field(..., description="用户ID")
+    status: str = Field(..., description="任务状态", examples=TaskStatus.choices())
+    attempts: int = Field(..., description="已尝试次数")
+    last_error: Optional[str] = Field(None, description="最近一次错误信息")
+    create_date: Optional[datetime] = Field(None, description="创建时间")
+    update_date: Optional[datetime] = Field(None, description="更新时间")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime
 from api.constants.common import TestType, Difficulty, Language, TestStatus
 
@@ -16,6 +16,8 @@ class CreateTestRequest(TestBase):
     question_ids: Optional[List[str]] = Field(None, description="测试包含的问题ID列表")
     examination_points: Optional[List[str]] = Field(None, description="考查要点列表")
     test_time: Optional[int] = Field(None, description="测试时间（分钟）", ge=1, le=120)
+    model_routes: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="面试模型路由覆盖（节点 -> model/temperature/max_tokens），受配置中的模型白名单和 max_tokens 上限限制",
+                                                               examples=[{"analysis": {"model": "gpt-4o", "temperature": 0}}])
 
 class UpdateTestRequest(BaseModel):
     """更新测试请求模型"""
@@ -28,6 +30,7 @@ class UpdateTestRequest(BaseModel):
     question_ids: Optional[List[str]] = Field(None, description="测试包含的问题ID列表")
     examination_points: Optional[List[str]] = Field(None, description="考查要点列表")
     test_time: Optional[int] = Field(None, description="测试时间（分钟）", ge=1, le=120)
+    model_routes: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="面试模型路由覆盖（节点 -> model/temperature/max_tokens）")
 
 class TestResponse(TestBase):
     """测试响应模型"""
@@ -41,6 +44,7 @@ class TestResponse(TestBase):
     question_ids: List[str] = Field(default=[], description="测试包含的问题ID列表")
     examination_points: List[str] = Field(default=[], description="考查要点列表")
     test_time: int = Field(..., description="测试时间（分钟）")
+    model_routes: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="面试模型路由覆盖")
     create_date: datetime = Field(..., description="创建时间")
     start_date: datetime = Field(..., description="开始时间")
     expire_date: datetime = Field(..., description="过期时间")
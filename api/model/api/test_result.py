@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Dict, Any, Optional
+from agent.interview_stats import MAX_INTERVIEW_SCORE
 
 class QuestionAnswer(BaseModel):
     """问题答案模型"""
@@ -14,11 +15,13 @@ class CreateTestResultRequest(BaseModel):
     test_id: str = Field(..., description="测试ID")
     user_id: str = Field(..., description="用户ID")
     summary: str = Field(..., description="总结")
-    score: float = Field(..., description="分数", ge=0, le=100)
+    score: float = Field(..., description="分数(0-10, 面试评分)", ge=0, le=MAX_INTERVIEW_SCORE)
     question_number: int = Field(..., description="问题数量", ge=0)
     correct_number: int = Field(..., description="正确答案数量", ge=0)
     elapse_time: int = Field(..., description="耗时(分钟)", ge=0)
     qa_history: List[Dict[str, Any]] = Field(..., description="问答历史")
+    job_id: Optional[str] = Field(None, description="职位ID")
+    llm_usage: Optional[Dict[str, Any]] = Field(None, description="LLM用量(令牌数和耗时)")
     
     @field_validator('correct_number')
     @classmethod
@@ -30,7 +33,7 @@ class CreateTestResultRequest(BaseModel):
 class UpdateTestResultRequest(BaseModel):
     """更新测试结果请求模型"""
     summary: Optional[str] = Field(None, description="总结")
-    score: Optional[float] = Field(None, description="分数", ge=0, le=100)
+    score: Optional[float] = Field(None, description="分数(0-10, 面试评分)", ge=0, le=MAX_INTERVIEW_SCORE)
     question_number: Optional[int] = Field(None, description="问题数量", ge=0)
     correct_number: Optional[int] = Field(None, description="正确答案数量", ge=0)
     elapse_time: Optional[int] = Field(None, description="耗时(分钟)", ge=0)
@@ -54,4 +57,48 @@ class TestResultResponse(BaseModel):
     question_number: int = Field(..., description="问题数量")
     correct_number: int = Field(..., description="正确答案数量")
     elapse_time: int = Field(..., description="耗时(分钟)")
-    qa_history: List[Dict[str, Any]] = Field(..., description="问答历史")
\ No newline at end of file
+    qa_history: Optional[List[Dict[str, Any]]] = Field(None, description="问答历史(仅创建和更新时返回, 查询请分页获取)")
+    job_id: Optional[str] = Field(None, description="职位ID")
+    llm_usage: Optional[Dict[str, Any]] = Field(None, description="LLM用量(令牌数和耗时)")
+    percentile_rank: Optional[float] = Field(None, description="百分位排名(同职位同难度中得分低于该结果的比例, 同分计一半)")
+
+class QAEntryResponse(BaseModel):
+    """问答记录响应模型"""
+    index: int = Field(..., description="序号(从0开始)")
+    question: str = Field(..., description="问题内容")
+    answer: str = Field(..., description="回答内容")
+    question_type: Optional[str] = Field(None, description="问题类型")
+    knowledge_point: Optional[str] = Field(None, description="知识点")
+    score: Optional[float] = Field(None, description="得分")
+    is_correct: Optional[bool] = Field(None, description="是否正确")
+    is_valid: Optional[bool] = Field(None, description="是否为有效回答")
+    giveup: Optional[bool] = Field(None, description="是否放弃")
+    feedback: Optional[str] = Field(None, description="反馈")
+    summary: Optional[str] = Field(None, description="问答总结")
+
+class LLMUsageReport(BaseModel):
+    """LLM用量汇总模型"""
+    key: Optional[str] = Field(None, description="汇总键(职位ID或模型)")
+    node: Optional[str] = Field(None, description="工作流节点")
+    tests: int = Field(..., description="测试数量")
+    calls: int = Field(..., description="调用次数")
+    input_tokens: int = Field(..., description="输入令牌数")
+    output_tokens: int = Field(..., description="输出令牌数")
+    cached_tokens: int = Field(..., description="缓存命中的输入令牌数")
+    latency: float = Field(..., description="调用耗时(秒)")
+    wall_time: float = Field(..., description="含排队和重试的总耗时(秒)")
+    avg_tokens_per_test: float = Field(..., description="每个测试的平均令牌数")
+    avg_wall_time_per_test: float = Field(..., description="每个测试的平均耗时(秒)")
+class ScoreStatsReport(BaseModel):
+    """职位成绩统计模型, 分数均为面试评分(0-10)"""
+    job_id: Optional[str] = Field(None, description="职位ID")
+    difficulty: Optional[str] = Field(None, description="难度")
+    language: Optional[str] = Field(None, description="语言")
+    count: int = Field(..., description="测试结果数量")
+    mean_score: float = Field(..., description="平均分(0-10)")
+    score_variance: float = Field(..., description="分数方差")
+    correct_ratio: float = Field(..., description="答题正确率")
+    score_histogram: Dict[str, int] = Field(..., description="分数分布(分段下限 -> 数量, 每1分一段, 0-10)")
+    mean_elapse_time: float = Field(..., description="平均耗时(分钟)")
+    elapse_time_variance: float = Field(..., description="耗时方差")
+    elapse_time_histogram: Dict[str, int] = Field(..., description="耗时分布(分段下限(分钟) -> 数量)")
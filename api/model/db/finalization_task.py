@@ -0,0 +1,42 @@
+from mongoengine import Document, StringField, IntField, DictField, DateTimeField
+from datetime import datetime, UTC
+from api.constants.common import TaskStatus
+
+class FinalizationTask(Document):
+    """Background task that summarizes and persists a completed interview"""
+
+    # Test id, e.g. '1234567890', one task per test (idempotency key)
+    test_id = StringField(required=True, unique=True)
+
+    # User id, e.g. '1234567890'
+    user_id = StringField(required=True)
+
+    # Final interview state needed to summarize and persist the result
+    # e.g. {'job_title': 'React Developer', 'interview_result': {...}, 'qa_history': [...]}
+    payload = DictField(required=True)
+
+    # Narrative summary, saved once generated so retries don't call the LLM again
+    summary = StringField()
+
+    # Task status, e.g. 'pending'
+    status = StringField(required=True, choices=TaskStatus.choices(), default=TaskStatus.PENDING.value)
+
+    # Number of processing attempts
+    attempts = IntField(required=True, min_value=0, default=0)
+
+    # Last error message
+    last_error = StringField()
+
+    # Timestamps
+    next_run_date = DateTimeField(default=lambda: datetime.now(UTC))
+    lease_expire_date = DateTimeField()
+    create_date = DateTimeField(default=lambda: datetime.now(UTC))
+    update_date = DateTimeField(default=lambda: datetime.now(UTC))
+
+    meta = {
+        'collection': 'ai_finalization_task',
+        'indexes': [
+            ('status', 'next_run_date'),
+            ('status', 'lease_expire_date')
+        ]
+    }
\ No newline at end of file
@@ -24,10 +24,8 @@ class Job(Document):
     
     meta = {
         'collection': 'ai_job',
+        # job_id is indexed by its unique constraint
         'indexes': [
-            'job_id',
-            'job_title',
-            'technical_skills',
-            'soft_skills'
+            'job_title'
         ]
     } 
\ No newline at end of file
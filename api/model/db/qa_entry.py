@@ -0,0 +1,43 @@
+from mongoengine import Document, StringField, IntField, FloatField, BooleanField
+
+class QAEntry(Document):
+    """One question and answer of a test result, stored apart from the result document"""
+
+    # Test id of the result, e.g. '1234567890'
+    test_id = StringField(required=True)
+
+    # Position of the entry in the Q&A history, from 0, e.g. 3
+    index = IntField(required=True, min_value=0)
+
+    # Question, e.g. 'What is the capital of France?'
+    question = StringField(required=True)
+
+    # Answer of the candidate, e.g. 'Paris'
+    answer = StringField(required=True)
+
+    # Type of the question, e.g. 'Short Answer'
+    question_type = StringField()
+
+    # Knowledge point of the question, e.g. 'React hooks'
+    knowledge_point = StringField()
+
+    # Score of the answer, e.g. 4
+    score = FloatField()
+
+    # Whether the answer is correct, valid or given up
+    is_correct = BooleanField()
+    is_valid = BooleanField()
+    giveup = BooleanField()
+
+    # Feedback to the candidate, e.g. 'Good answer!'
+    feedback = StringField()
+
+    # One line summary of the question and answer, e.g. 'Q3 React hooks: correct, 4/5'
+    summary = StringField()
+
+    meta = {
+        'collection': 'ai_qa_entry',
+        'indexes': [
+            {'fields': ('test_id', 'index'), 'unique': True}
+        ]
+    }
@@ -30,8 +30,11 @@ class Question(Document):
     
     meta = {
         'collection': 'ai_question',
+        # question_id is indexed by its unique constraint
         'indexes': [
             ('job_title', 'language'),
-            'examination_points'
+            'examination_points',
+            'difficulty',
+            'type'
         ]
     } 
\ No newline at end of file
@@ -0,0 +1,32 @@
+from mongoengine import Document, StringField, IntField, FloatField, ListField, BinaryField, DateTimeField
+from datetime import datetime, UTC
+
+class ScoreSketch(Document):
+    """Quantile sketch (t-digest) of the scores of the test results of a job and difficulty"""
+
+    # Job id, e.g. '1234567890'
+    job_id = StringField()
+
+    # Difficulty of the tests, e.g. 'medium'
+    difficulty = StringField()
+
+    # Serialized t-digest, see api.utils.tdigest.TDigest.to_bytes
+    digest = BinaryField()
+
+    # Scores written since the last compaction, merged into the digest when read
+    pending = ListField(FloatField())
+
+    # Previous scores of updated results, removed from the digest when read
+    removed = ListField(FloatField())
+
+    # Compaction version, for the optimistic concurrency of the compactions
+    version = IntField(required=True, default=0)
+
+    update_date = DateTimeField(default=lambda: datetime.now(UTC))
+
+    meta = {
+        'collection': 'ai_score_sketch',
+        'indexes': [
+            {'fields': ('job_id', 'difficulty'), 'unique': True}
+        ]
+    }
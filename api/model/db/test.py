@@ -1,4 +1,4 @@
-from mongoengine import Document, StringField, DateTimeField, IntField, ListField, ReferenceField
+from mongoengine import Document, StringField, DateTimeField, IntField, ListField, ReferenceField, DictField
 from datetime import datetime, UTC, timedelta
 from api.constants.common import Language, TestType, Difficulty, TestStatus
 from api.model.db.job import Job
@@ -29,6 +29,10 @@ class Test(Document):
 
     # Test questions
     question_ids = ListField(StringField(), default=[])
+
+    # Model routing overrides of the interview, set by whoever creates the test,
+    # e.g. {'analysis': {'model': 'gpt-4o', 'temperature': 0}}
+    model_routes = DictField()
     
     # Test status
     status = StringField(
@@ -43,16 +47,26 @@ class Test(Document):
     expire_date = DateTimeField(default=lambda: datetime.now(UTC) + timedelta(days=7))
     update_date = DateTimeField(default=lambda: datetime.now(UTC))
     close_date = DateTimeField()
+
+    # Interview deadline (start of the interview + test_time, capped by expire_date),
+    # set while the interview is tracked by the deadline scheduler
+    deadline_date = DateTimeField()
     
     meta = {
         'collection': 'ai_test',
+        # test_id and activate_code are indexed by their unique constraint,
+        # checked against the repository queries by api.scripts.init_db --check
         'indexes': [
-            'test_id',
-            'activate_code',
-            'user_id',
-            'job_id',
+            # tests of a user, newest first
+            ('user_id', '-create_date'),
+            # tests of a job, by status (exports)
+            ('job_id', 'status'),
+            # tests by status, soonest to expire first
+            ('status', 'expire_date'),
             ('type', 'language', 'difficulty'),
-            'status',
-            'create_date'
+            # listing newest first, exports by date range
+            '-create_date',
+            # interviews tracked by the deadline scheduler only
+            {'fields': ['deadline_date'], 'sparse': True}
         ]
     } 
\ No newline at end of file
@@ -1,5 +1,6 @@
-from mongoengine import Document, StringField, IntField, FloatField, ListField, DictField
+from mongoengine import Document, StringField, IntField, FloatField, ListField, DictField, DateTimeField
 from datetime import datetime, UTC
+from agent.interview_stats import MAX_INTERVIEW_SCORE
 
 class TestResult(Document):
     """Test result document model"""
@@ -10,11 +11,14 @@ class TestResult(Document):
     # User id, e.g. '1234567890'
     user_id = StringField(required=True)
 
+    # Job id of the test, e.g. '1234567890'
+    job_id = StringField()
+
     # Summary, e.g. 'Good job!' 
     summary = StringField(required=True)
 
-    # Score, e.g. 80
-    score = FloatField(required=True, min_value=0, max_value=100)
+    # Score on the interview scale (0-10), e.g. 8
+    score = FloatField(required=True, min_value=0, max_value=MAX_INTERVIEW_SCORE)
 
     # Question number, e.g. 10
     question_number = IntField(required=True, min_value=0)
@@ -25,14 +29,27 @@ class TestResult(Document):
     # Elapse time, e.g. 10 minutes
     elapse_time = IntField(required=True, min_value=0)  # in minutes
 
-    # Q&A history, e.g. [{'question': 'What is the capital of France?', 'answer': 'Paris'}]
-    qa_history = ListField(DictField(), required=True)  # list of Q&A pairs
+    # Q&A history embedded by the previous versions, e.g. [{'question': 'What is the capital of France?', 'answer': 'Paris'}]
+    # the entries are now stored in the ai_qa_entry collection (see QAEntry), moved by api.scripts.migrate_qa_history
+    qa_history = ListField(DictField())
+
+    # LLM usage of the interview, e.g. {'calls': 12, 'input_tokens': 18000, 'output_tokens': 2400,
+    # 'cached_tokens': 9000, 'latency': 31.2, 'wall_time': 35.8, 'by_node': [{'node': 'analysis', 'model': 'gpt-4o-mini', ...}]}
+    llm_usage = DictField()
+
+    # Create date, e.g. '2025-01-01 10:00:00'
+    create_date = DateTimeField(default=lambda: datetime.now(UTC))
     
     meta = {
         'collection': 'ai_test_result',
+        # test_id is indexed by its unique constraint,
+        # checked against the repository queries by api.scripts.init_db --check
         'indexes': [
-            'test_id',
-            'user_id',
-            'score'
+            # results of a user, newest first
+            ('user_id', '-create_date'),
+            # results of a job by date range (usage reports, exports, skill analytics)
+            ('job_id', 'create_date'),
+            # exports by date range
+            'create_date'
         ]
     } 
\ No newline at end of file
@@ -0,0 +1,44 @@
+from mongoengine import Document, StringField, IntField, FloatField, DictField, DateTimeField
+from datetime import datetime, UTC
+
+class TestResultStats(Document):
+    """Score statistics of the test results of a job, difficulty and language, updated incrementally"""
+
+    # Job id, e.g. '1234567890'
+    job_id = StringField()
+
+    # Difficulty of the tests, e.g. 'medium'
+    difficulty = StringField()
+
+    # Language of the tests, e.g. 'English'
+    language = StringField()
+
+    # Number of test results, e.g. 42
+    count = IntField(required=True, min_value=0, default=0)
+
+    # Sum and sum of squares of the scores, for the mean and the variance
+    score_sum = FloatField(required=True, default=0)
+    score_sq_sum = FloatField(required=True, default=0)
+
+    # Total questions and correct answers, for the correct ratio
+    question_sum = IntField(required=True, default=0)
+    correct_sum = IntField(required=True, default=0)
+
+    # Sum and sum of squares of the elapse times (minutes)
+    elapse_time_sum = FloatField(required=True, default=0)
+    elapse_time_sq_sum = FloatField(required=True, default=0)
+
+    # Number of results by score bucket lower bound, e.g. {'7': 12, '8': 20}
+    score_histogram = DictField()
+
+    # Number of results by elapse time bucket lower bound (minutes), e.g. {'10': 5, '15': 30}
+    elapse_time_histogram = DictField()
+
+    update_date = DateTimeField(default=lambda: datetime.now(UTC))
+
+    meta = {
+        'collection': 'ai_test_result_stats',
+        'indexes': [
+            {'fields': ('job_id', 'difficulty', 'language'), 'unique': True}
+        ]
+    }
@@ -15,10 +15,8 @@ class User(Document):
     
     meta = {
         'collection': 'ai_user',
+        # user_id and email are indexed by their unique constraint
         'indexes': [
-            'user_id',
-            'email',
-            'staff_id',
-            ('status', 'role')
+            'staff_id'
         ]
     } 
\ No newline at end of file
@@ -0,0 +1,125 @@
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, UTC, timedelta
+from pymongo import ReturnDocument
+from api.model.db.finalization_task import FinalizationTask
+from api.constants.common import TaskStatus
+from api.utils.log_decorator import log
+
+class FinalizationTaskRepository:
+    @log
+    async def enqueue_task(self, test_id: str, user_id: str, payload: Dict[str, Any], summary: Optional[str] = None) -> bool:
+        """
+        Enqueue a finalization task, idempotent by test ID
+
+        A task enqueued with its summary is persisted without calling the LLM
+
+        Returns:
+            bool: True if a new task was created, False if the test already has a task
+        """
+        now = datetime.now(UTC)
+        result = FinalizationTask._get_collection().update_one(
+            {"test_id": test_id},
+            {"$setOnInsert": {
+                "test_id": test_id,
+                "user_id": user_id,
+                "payload": payload,
+                "summary": summary,
+                "status": TaskStatus.PENDING.value,
+                "attempts": 0,
+                "next_run_date": now,
+                "create_date": now,
+                "update_date": now
+            }},
+            upsert=True
+        )
+        return result.upserted_id is not None
+
+    @log
+    async def claim_tasks(self, limit: int, lease_seconds: int) -> List[FinalizationTask]:
+        """
+        Claim due tasks for processing
+
+        Pending tasks whose next run date has passed, and running tasks whose lease
+        expired (the worker died), are leased to the caller (at-least-once delivery).
+        """
+        now = datetime.now(UTC)
+        collection = FinalizationTask._get_collection()
+        claimed = []
+        for _ in range(limit):
+            document = collection.find_one_and_update(
+                {"$or": [
+                    {"status": TaskStatus.PENDING.value, "next_run_date": {"$lte": now}},
+                    {"status": TaskStatus.RUNNING.value, "lease_expire_date": {"$lte": now}}
+                ]},
+                {
+                    "$set": {
+                        "status": TaskStatus.RUNNING.value,
+                        "lease_expire_date": now + timedelta(seconds=lease_seconds),
+                        "update_date": now
+                    },
+                    "$inc": {"attempts": 1}
+                },
+                sort=[("next_run_date", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if document is None:
+                break
+            claimed.append(FinalizationTask._from_son(document))
+        return claimed
+
+    @log
+    async def save_summary(self, test_id: str, summary: str, llm_usage: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Save the generated summary of a task, with the usage records of its LLM calls"""
+        FinalizationTask._get_collection().update_one(
+            {"test_id": test_id},
+            {
+                "$set": {"summary": summary, "update_date": datetime.now(UTC)},
+                "$push": {"payload.llm_usage": {"$each": llm_usage or []}}
+            }
+        )
+
+    @log
+    async def mark_done(self, test_ids: List[str]) -> int:
+        """Mark tasks as done"""
+        if not test_ids:
+            return 0
+        return FinalizationTask.objects(test_id__in=test_ids).update(
+            set__status=TaskStatus.DONE.value,
+            unset__lease_expire_date=True,
+            set__update_date=datetime.now(UTC)
+        )
+
+    @log
+    async def reschedule_task(self, test_id: str, error: str, next_run_date: Optional[datetime]) -> None:
+        """Reschedule a failed task, or mark it failed when next_run_date is None"""
+        status = TaskStatus.PENDING if next_run_date else TaskStatus.FAILED
+        FinalizationTask.objects(test_id=test_id).update_one(
+            set__status=status.value,
+            set__last_error=error,
+            set__next_run_date=next_run_date,
+            unset__lease_expire_date=True,
+            set__update_date=datetime.now(UTC)
+        )
+
+    @log
+    async def get_failed_tasks(self, skip: int = 0, limit: int = 20) -> Tuple[List[FinalizationTask], int]:
+        """Get the failed tasks, most recently failed first, and their total number"""
+        query = FinalizationTask.objects(status=TaskStatus.FAILED.value)
+        return list(query.order_by("-update_date").skip(skip).limit(limit)), query.count()
+
+    @log
+    async def requeue_failed_task(self, test_id: str) -> bool:
+        """Make a failed task pending again with zero attempts, False if the task is not failed"""
+        now = datetime.now(UTC)
+        updated = FinalizationTask.objects(test_id=test_id, status=TaskStatus.FAILED.value).update_one(
+            set__status=TaskStatus.PENDING.value,
+            set__attempts=0,
+            set__next_run_date=now,
+            set__update_date=now
+        )
+        return updated == 1
+
+    @log
+    async def get_task_by_test_id(self, test_id: str) -> Optional[FinalizationTask]:
+        """Get the finalization task of a test"""
+        return FinalizationTask.objects(test_id=test_id).first()
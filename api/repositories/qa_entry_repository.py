@@ -0,0 +1,105 @@
+from typing import List, Dict, Any, Tuple
+from pymongo import ReplaceOne, DeleteMany
+from api.model.db.qa_entry import QAEntry
+from api.utils.log_decorator import log
+
+
+def qa_entry_fields(test_id: str, index: int, qa: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Typed fields of a Q&A history entry
+
+    The entries written by the interview workflow keep the QAResult in their summary,
+    the entries of the API clients may give the score and the feedback directly.
+
+    Args:
+        test_id: Test ID of the result
+        index: Position of the entry in the history
+        qa: Q&A history entry, e.g. {'question': ..., 'answer': ..., 'summary': QAResult dict}
+
+    Returns:
+        Dict[str, Any]: Fields of the QAEntry document, unknown values left out
+    """
+    qa_result = qa.get("summary") if isinstance(qa.get("summary"), dict) else {}
+    question = qa_result.get("question") or {}
+    answer = qa_result.get("answer") or {}
+    fields = {
+        "test_id": test_id,
+        "index": index,
+        "question": str(qa.get("question", "")),
+        "answer": str(qa.get("answer", "")),
+        "question_type": question.get("question_type"),
+        "knowledge_point": question.get("knowledge_point") or qa.get("knowledge_point"),
+        "score": answer.get("score", qa.get("score")),
+        "is_correct": answer.get("is_correct", qa.get("is_correct")),
+        "is_valid": answer.get("is_valid"),
+        "giveup": answer.get("giveup"),
+        "feedback": answer.get("feedback") or qa.get("feedback"),
+        "summary": qa_result.get("summary") or (qa.get("summary") if isinstance(qa.get("summary"), str) else None)
+    }
+    return {key: value for key, value in fields.items() if value is not None}
+
+
+class QAEntryRepository:
+    @property
+    def collection(self):
+        """The underlying MongoDB collection, looked up on use: the repositories are built at import
+        time, before the lifespan connects MongoDB"""
+        return QAEntry._get_collection()
+
+    @log
+    async def replace_entries(self, histories: Dict[str, List[Dict[str, Any]]]) -> int:
+        """
+        Replace the Q&A histories of several test results in one batched write
+
+        The entries are upserted by position and the entries past the new history removed,
+        so a history is never read empty while it is replaced.
+
+        Args:
+            histories: Q&A history by test ID
+
+        Returns:
+            int: Number of written entries
+        """
+        operations = []
+        for test_id, qa_history in histories.items():
+            for index, qa in enumerate(qa_history):
+                operations.append(ReplaceOne({"test_id": test_id, "index": index},
+                                             qa_entry_fields(test_id, index, qa), upsert=True))
+            operations.append(DeleteMany({"test_id": test_id, "index": {"$gte": len(qa_history)}}))
+        if not operations:
+            return 0
+        self.collection.bulk_write(operations, ordered=False)
+        return sum(len(qa_history) for qa_history in histories.values())
+
+    @log
+    async def get_entries(self, test_id: str, skip: int = 0, limit: int = 20) -> Tuple[List[QAEntry], int]:
+        """
+        Get one page of the Q&A history of a test result
+
+        Args:
+            test_id: Test ID
+            skip: Number of entries to skip
+            limit: Maximum number of entries
+
+        Returns:
+            Tuple[List[QAEntry], int]: The entries in history order and the total number of entries
+        """
+        total = QAEntry.objects(test_id=test_id).count()
+        entries = list(QAEntry.objects(test_id=test_id).order_by("index").skip(skip).limit(limit)) if total > skip else []
+        return entries, total
+
+    def iter_answers(self, test_ids: List[str], batch_size: int = 2000):
+        """
+        Stream the (test_id, question, knowledge point, score, is correct) of the entries of
+        several test results, grouped by test result in history order
+
+        Args:
+            test_ids: Test IDs
+            batch_size: Entries per cursor batch
+        """
+        projection = {"_id": 0, "test_id": 1, "question": 1, "knowledge_point": 1, "score": 1, "is_correct": 1}
+        cursor = self.collection.find({"test_id": {"$in": test_ids}}, projection, batch_size=batch_size) \
+            .sort([("test_id", 1), ("index", 1)])
+        for document in cursor:
+            yield (document["test_id"], document.get("question", ""), document.get("knowledge_point"),
+                   document.get("score") or 0, bool(document.get("is_correct")))
@@ -71,5 +71,5 @@ class QuestionRepository:
     
     @log
     async def get_questions_by_knowledge_point(self, knowledge_point: str) -> List[Question]:
-        """Get questions by knowledge point"""
-        return Question.objects(knowledge_points=knowledge_point).all() 
\ No newline at end of file
+        """Get questions by knowledge point, i.e. questions with this examination point"""
+        return Question.objects(examination_points=knowledge_point).all()
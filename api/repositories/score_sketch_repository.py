@@ -0,0 +1,152 @@
+from typing import List, Dict, Any, Tuple
+from datetime import datetime, UTC
+from bson import Binary
+from pymongo import UpdateOne, ReplaceOne
+from api.model.db.test import Test
+from api.model.db.test_result import TestResult
+from api.model.db.score_sketch import ScoreSketch
+from api.utils.tdigest import TDigest
+from api.utils.log_decorator import log
+
+# Accuracy / size of the sketches, ~100 centroids (~1.6 KB) per job and difficulty
+SKETCH_COMPRESSION = 100
+# Pending and removed scores above which a sketch is compacted after a write
+COMPACT_THRESHOLD = 64
+
+# (job_id, difficulty)
+SketchKey = Tuple[str, str]
+
+
+def load_digest(document: Dict[str, Any]) -> TDigest:
+    """Digest of a sketch document with its pending and removed scores applied"""
+    digest = TDigest.from_bytes(document.get("digest"), SKETCH_COMPRESSION)
+    digest.update(document.get("pending", []))
+    for score in document.get("removed", []):
+        digest.remove(score)
+    return digest
+
+
+class ScoreSketchRepository:
+    @property
+    def collection(self):
+        """The underlying MongoDB collection, looked up on use: the repositories are built at import
+        time, before the lifespan connects MongoDB"""
+        return ScoreSketch._get_collection()
+
+    @log
+    async def add_scores(self, changes: Dict[SketchKey, Tuple[List[float], List[float]]]) -> None:
+        """
+        Record the scores of created and updated test results in one batched write
+
+        The scores are appended to the sketch documents, the sketches with many pending
+        scores are then compacted.
+
+        Args:
+            changes: (added scores, removed scores) by (job_id, difficulty)
+        """
+        if not changes:
+            return
+        now = datetime.now(UTC)
+        operations = [
+            UpdateOne({"job_id": job_id, "difficulty": difficulty},
+                      {"$push": {"pending": {"$each": added}, "removed": {"$each": removed}},
+                       "$set": {"update_date": now},
+                       "$setOnInsert": {"version": 0}},
+                      upsert=True)
+            for (job_id, difficulty), (added, removed) in changes.items()
+        ]
+        self.collection.bulk_write(operations, ordered=False)
+
+        due = self.collection.find({
+            "$or": [{"job_id": job_id, "difficulty": difficulty} for job_id, difficulty in changes],
+            "$expr": {"$gte": [{"$add": [{"$size": "$pending"}, {"$size": "$removed"}]}, COMPACT_THRESHOLD]}
+        })
+        for document in due:
+            self._compact(document)
+
+    def _compact(self, document: Dict[str, Any]) -> bool:
+        """
+        Merge the pending and removed scores read with the document into its digest
+
+        Scores pushed since the document was read are kept, a concurrent compaction
+        wins (the version does not match anymore) and this one is dropped.
+
+        Returns:
+            bool: True if the document was compacted
+        """
+        digest = load_digest(document)
+
+        def rest(field: str) -> Dict[str, Any]:
+            # the scores pushed after the read
+            return {"$slice": [f"${field}", len(document.get(field, [])), {"$max": [1, {"$size": f"${field}"}]}]}
+
+        result = self.collection.update_one(
+            {"_id": document["_id"], "version": document.get("version", 0)},
+            [{"$set": {
+                "digest": {"$literal": Binary(digest.to_bytes())},
+                "pending": rest("pending"),
+                "removed": rest("removed"),
+                "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+            }}]
+        )
+        return result.modified_count == 1
+
+    @log
+    async def get_digests(self, keys: List[SketchKey]) -> Dict[SketchKey, TDigest]:
+        """
+        Get the digests of several jobs and difficulties in one query
+
+        Args:
+            keys: (job_id, difficulty) pairs
+
+        Returns:
+            Dict[SketchKey, TDigest]: Digest by (job_id, difficulty), keys without results are left out
+        """
+        if not keys:
+            return {}
+        cursor = self.collection.find({"$or": [{"job_id": job_id, "difficulty": difficulty}
+                                               for job_id, difficulty in set(keys)]})
+        return {(document.get("job_id"), document.get("difficulty")): load_digest(document) for document in cursor}
+
+    @log
+    async def rebuild(self) -> int:
+        """
+        Rebuild the sketches from the test results
+
+        The aggregation pipeline counts the results by job, difficulty and score, each
+        digest is built from these weighted scores. Sketches of jobs without results
+        anymore are removed.
+
+        Returns:
+            int: Number of sketches
+        """
+        started = datetime.now(UTC)
+        pipeline = [
+            {"$lookup": {"from": Test._get_collection_name(), "localField": "test_id", "foreignField": "test_id", "as": "test"}},
+            {"$unwind": {"path": "$test", "preserveNullAndEmptyArrays": True}},
+            {"$group": {
+                "_id": {
+                    "job_id": {"$ifNull": ["$job_id", "$test.job_id"]},
+                    "difficulty": "$test.difficulty",
+                    "score": "$score"
+                },
+                "count": {"$sum": 1}
+            }}
+        ]
+        digests: Dict[SketchKey, TDigest] = {}
+        for group in TestResult._get_collection().aggregate(pipeline, allowDiskUse=True):
+            key = (group["_id"].get("job_id"), group["_id"].get("difficulty"))
+            digests.setdefault(key, TDigest(SKETCH_COMPRESSION)).add(group["_id"]["score"], group["count"])
+
+        now = datetime.now(UTC)
+        operations = [
+            ReplaceOne({"job_id": job_id, "difficulty": difficulty},
+                       {"job_id": job_id, "difficulty": difficulty, "digest": Binary(digest.to_bytes()),
+                        "pending": [], "removed": [], "version": 0, "update_date": now},
+                       upsert=True)
+            for (job_id, difficulty), digest in digests.items()
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        self.collection.delete_many({"update_date": {"$lt": started}})
+        return len(digests)
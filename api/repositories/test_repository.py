@@ -1,14 +1,17 @@
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, Any, Iterator
 from loguru import logger
 from api.model.db.test import Test, TestStatus
 from api.utils.log_decorator import log
 from datetime import datetime, UTC  
+from pymongo import ReturnDocument
 from mongoengine import Document, StringField, DateTimeField
 
 class TestRepository:
-    def __init__(self):
-        # Assuming you are using MongoEngine
-        self.collection = Test._get_collection()  # Get the underlying MongoDB collection
+    @property
+    def collection(self):
+        """The underlying MongoDB collection, looked up on use: the repositories are built at import
+        time, before the lifespan connects MongoDB"""
+        return Test._get_collection()
 
     @log
     async def create_test(self, test: Test) -> Test:
@@ -22,8 +25,8 @@ class TestRepository:
     
     @log
     async def get_tests(self, skip: int = 0, limit: int = 100) -> List[Test]:
-        """Get a list of tests (paginated)"""
-        return Test.objects().skip(skip).limit(limit).all()
+        """Get a list of tests (paginated), newest first"""
+        return Test.objects().order_by("-create_date").skip(skip).limit(limit).all()
         
     @log
     async def get_paginated_tests(self, page: int = 1, page_size: int = 10) -> Tuple[List[Test], int]:
@@ -39,7 +42,7 @@ class TestRepository:
         """
         skip = (page - 1) * page_size
         total_count = Test.objects().count()
-        tests = Test.objects().skip(skip).limit(page_size).all()
+        tests = Test.objects().order_by("-create_date").skip(skip).limit(page_size).all()
         return tests, total_count
     
     @log
@@ -50,8 +53,8 @@ class TestRepository:
     
     @log
     async def get_tests_by_user_id(self, user_id: str, skip: int = 0, limit: int = 100) -> List[Test]:
-        """Get tests by user ID"""
-        return Test.objects(user_id=user_id).skip(skip).limit(limit).all()
+        """Get tests by user ID, newest first"""
+        return Test.objects(user_id=user_id).order_by("-create_date").skip(skip).limit(limit).all()
     
     @log
     async def get_tests_by_job_id(self, job_id: str, skip: int = 0, limit: int = 100) -> List[Test]:
@@ -60,8 +63,8 @@ class TestRepository:
     
     @log
     async def get_tests_by_status(self, status: str, skip: int = 0, limit: int = 100) -> List[Test]:
-        """Get tests by status"""
-        return Test.objects(status=status).skip(skip).limit(limit).all()
+        """Get tests by status, soonest to expire first"""
+        return Test.objects(status=status).order_by("expire_date").skip(skip).limit(limit).all()
     
     @log
     async def get_tests_by_type(self, type: str, skip: int = 0, limit: int = 100) -> List[Test]:
@@ -99,4 +102,132 @@ class TestRepository:
             return None
         except Exception as e:
             logger.error(f"Failed to update test status: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    @log
+    async def bulk_update_status(self, test_ids: List[str], status: TestStatus) -> int:
+        """
+        Update the status of several tests in one write
+        
+        Args:
+            test_ids: Test IDs
+            status: New status
+            
+        Returns:
+            int: Number of updated tests
+        """
+        if not test_ids:
+            return 0
+        now = datetime.now(UTC)
+        update = {"status": status.value, "update_date": now}
+        if status == TestStatus.COMPLETED:
+            update["close_date"] = now
+        result = self.collection.update_many({"test_id": {"$in": test_ids}}, {"$set": update})
+        logger.info(f"Updated status of {result.modified_count} tests -> {status}")
+        return result.modified_count
+    @log
+    async def get_stats_keys(self, test_ids: List[str]) -> Dict[str, Dict[str, str]]:
+        """
+        Get the job ID, difficulty and language of several tests in one query
+        
+        Args:
+            test_ids: Test IDs
+            
+        Returns:
+            Dict[str, Dict[str, str]]: job_id, difficulty and language by test ID, unknown tests are left out
+        """
+        if not test_ids:
+            return {}
+        cursor = self.collection.find({"test_id": {"$in": test_ids}},
+                                      {"test_id": 1, "job_id": 1, "difficulty": 1, "language": 1, "_id": 0})
+        return {document.pop("test_id"): document for document in cursor}
+
+    @log
+    async def mark_started(self, test_id: str, deadline: datetime) -> bool:
+        """
+        Mark an open test as on-going and set its interview deadline
+        
+        Args:
+            test_id: Test ID
+            deadline: Interview deadline, capped by the expire date of the test
+            
+        Returns:
+            bool: True if the test was open
+        """
+        now = datetime.now(UTC)
+        result = self.collection.update_one(
+            {"test_id": test_id, "status": TestStatus.OPEN.value},
+            [{"$set": {
+                "status": TestStatus.ONGOING.value,
+                "start_date": now,
+                # $min ignores a missing expire_date
+                "deadline_date": {"$min": [deadline, "$expire_date"]},
+                "update_date": now
+            }}]
+        )
+        return result.modified_count > 0
+
+    @log
+    async def claim_due_tests(self, before: datetime, limit: int) -> List[Test]:
+        """
+        Claim tests whose interview deadline is before the given date
+        
+        The deadline is cleared on claim, so a test is claimed once.
+        
+        Args:
+            before: Deadline bound
+            limit: Max number of tests
+            
+        Returns:
+            List[Test]: Claimed tests
+        """
+        claimed = []
+        for _ in range(limit):
+            document = self.collection.find_one_and_update(
+                {"deadline_date": {"$lte": before}},
+                {
+                    "$unset": {"deadline_date": ""},
+                    "$set": {"update_date": datetime.now(UTC)}
+                },
+                sort=[("deadline_date", 1)],
+                return_document=ReturnDocument.BEFORE
+            )
+            if document is None:
+                break
+            claimed.append(Test._from_son(document))
+        return claimed
+
+    @log
+    async def set_deadline(self, test_id: str, deadline: datetime) -> None:
+        """Set the interview deadline of a test, e.g. to claim it again"""
+        self.collection.update_one({"test_id": test_id}, {"$set": {"deadline_date": deadline}})
+
+    def iter_tests(self, fields: List[str], job_id: Optional[str] = None, status: Optional[str] = None,
+                   start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                   batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the tests for an export, only the exported fields are read
+        
+        Args:
+            fields: Exported fields
+            job_id: Only the tests of this job if given
+            status: Only the tests with this status if given
+            start_date: Only the tests created at or after this date if given
+            end_date: Only the tests created before this date if given
+            batch_size: Tests per cursor batch
+            
+        Returns:
+            Iterator[Dict[str, Any]]: The tests, as raw documents
+        """
+        query: Dict[str, Any] = {}
+        if job_id:
+            query["job_id"] = job_id
+        if status:
+            query["status"] = status
+        if start_date or end_date:
+            query["create_date"] = {}
+            if start_date:
+                query["create_date"]["$gte"] = start_date
+            if end_date:
+                query["create_date"]["$lt"] = end_date
+        return self.collection.find(query, {"_id": 0, **{field: 1 for field in fields}}, batch_size=batch_size)
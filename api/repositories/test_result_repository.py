@@ -1,6 +1,13 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Iterator
+from datetime import datetime, UTC
+from pymongo import UpdateOne
 from api.model.db.test_result import TestResult
+from api.repositories.qa_entry_repository import QAEntryRepository
 from api.utils.log_decorator import log
+from api.utils.skill_matrix import SkillColumns, SkillColumnsBuilder
+
+# Summed fields of the llm_usage summary, see utils.llm.summarize_usage
+USAGE_FIELDS = ("calls", "input_tokens", "output_tokens", "cached_tokens", "latency", "wall_time")
 
 class TestResultRepository:
     @log
@@ -10,10 +17,252 @@ class TestResultRepository:
     
     @log
     async def get_result_by_test_id(self, test_id: str) -> Optional[TestResult]:
-        """Get test result by test ID"""
-        return TestResult.objects(test_id=test_id).first()
+        """Get test result by test ID, without the Q&A history"""
+        return TestResult.objects(test_id=test_id).exclude("qa_history").first()
     
     @log
     async def get_results_by_user_id(self, user_id: str) -> List[TestResult]:
-        """Get all test results for a user"""
-        return TestResult.objects(user_id=user_id).all() 
\ No newline at end of file
+        """Get all test results for a user, newest first, without the Q&A history"""
+        return TestResult.objects(user_id=user_id).exclude("qa_history").order_by("-create_date").all()
+    
+    @log
+    async def get_embedded_qa_history(self, test_id: str) -> List[Dict[str, Any]]:
+        """Get the Q&A history embedded in a result not migrated to the ai_qa_entry collection yet"""
+        document = TestResult._get_collection().find_one({"test_id": test_id}, {"_id": 0, "qa_history": 1})
+        return (document or {}).get("qa_history") or []
+    
+    @log
+    async def bulk_upsert_results(self, results: List[Dict[str, Any]]) -> int:
+        """
+        Create or update test results in one batched write, keyed by test ID
+        
+        The Q&A histories are written to the ai_qa_entry collection, the history embedded
+        by the previous versions is removed
+        
+        Args:
+            results: List of test result fields, each containing test_id
+            
+        Returns:
+            int: Number of created or updated results
+        """
+        if not results:
+            return 0
+        now = datetime.now(UTC)
+        operations = [UpdateOne({"test_id": result["test_id"]},
+                                {"$set": result, "$setOnInsert": {"create_date": now}, "$unset": {"qa_history": ""}},
+                                upsert=True)
+                      for result in results]
+        bulk_result = TestResult._get_collection().bulk_write(operations, ordered=False)
+        return bulk_result.upserted_count + bulk_result.modified_count
+    
+    @log
+    async def migrate_qa_histories(self, batch_size: int = 500) -> int:
+        """
+        Move the Q&A histories embedded in the results to the ai_qa_entry collection
+        
+        Each batch is written to the entries before it is removed from the results,
+        an interrupted migration is resumed by running it again
+        
+        Args:
+            batch_size: Results per batch
+            
+        Returns:
+            int: Number of migrated results
+        """
+        collection = TestResult._get_collection()
+        qa_entry_repository = QAEntryRepository()
+        migrated = 0
+        while True:
+            batch = list(collection.find({"qa_history": {"$exists": True}}, {"_id": 0, "test_id": 1, "qa_history": 1})
+                         .limit(batch_size))
+            if not batch:
+                return migrated
+            await qa_entry_repository.replace_entries({document["test_id"]: document.get("qa_history") or []
+                                                       for document in batch})
+            collection.update_many({"test_id": {"$in": [document["test_id"] for document in batch]}},
+                                   {"$unset": {"qa_history": ""}})
+            migrated += len(batch)
+    
+    def iter_results(self, fields: List[str], job_id: Optional[str] = None, start_date: Optional[datetime] = None,
+                     end_date: Optional[datetime] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the test results for an export, only the exported fields are read
+        
+        Args:
+            fields: Exported fields
+            job_id: Only the results of this job if given
+            start_date: Only the results created at or after this date if given
+            end_date: Only the results created before this date if given
+            batch_size: Results per cursor batch
+            
+        Returns:
+            Iterator[Dict[str, Any]]: The results, as raw documents
+        """
+        query: Dict[str, Any] = {}
+        if job_id:
+            query["job_id"] = job_id
+        if start_date or end_date:
+            query["create_date"] = {}
+            if start_date:
+                query["create_date"]["$gte"] = start_date
+            if end_date:
+                query["create_date"]["$lt"] = end_date
+        return TestResult._get_collection().find(query, {"_id": 0, **{field: 1 for field in fields}},
+                                                 batch_size=batch_size)
+    
+    @log
+    async def get_stats_values(self, test_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the fields of several test results counted in the score statistics, in one query
+        
+        Args:
+            test_ids: Test IDs
+            
+        Returns:
+            Dict[str, Dict[str, Any]]: job_id, score, question_number, correct_number and elapse_time by test ID,
+            tests without result are left out
+        """
+        if not test_ids:
+            return {}
+        projection = {"test_id": 1, "job_id": 1, "score": 1, "question_number": 1, "correct_number": 1,
+                      "elapse_time": 1, "_id": 0}
+        cursor = TestResult._get_collection().find({"test_id": {"$in": test_ids}}, projection)
+        return {document.pop("test_id"): document for document in cursor}
+    
+    @log
+    async def load_skill_columns(
+        self,
+        job_id: Optional[str] = None,
+        user_ids: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        batch_size: int = 2000
+    ) -> SkillColumns:
+        """
+        Load the answers of the test results in columnar form for the skill analytics
+        
+        Only the fields of the analytics are read, the results are streamed in batches and the
+        answers of each batch read from the ai_qa_entry collection in one query
+        
+        Args:
+            job_id: Only the results of this job if given
+            user_ids: Only the results of these users (a cohort) if given
+            start_date: Only the results created at or after this date if given
+            end_date: Only the results created before this date if given
+            batch_size: Results per cursor batch
+            
+        Returns:
+            SkillColumns: One row per answered question
+        """
+        query: Dict[str, Any] = {}
+        if job_id:
+            query["job_id"] = job_id
+        if user_ids:
+            query["user_id"] = {"$in": user_ids}
+        if start_date or end_date:
+            query["create_date"] = {}
+            if start_date:
+                query["create_date"]["$gte"] = start_date
+            if end_date:
+                query["create_date"]["$lt"] = end_date
+        # the results not migrated yet still embed their history
+        projection = {
+            "_id": 0,
+            "test_id": 1,
+            "user_id": 1,
+            "create_date": 1,
+            "qa_history.question": 1,
+            "qa_history.summary.question.knowledge_point": 1,
+            "qa_history.summary.answer.score": 1,
+            "qa_history.summary.answer.is_correct": 1
+        }
+        builder = SkillColumnsBuilder()
+        batch: List[Dict[str, Any]] = []
+        for document in TestResult._get_collection().find(query, projection, batch_size=batch_size):
+            batch.append(document)
+            if len(batch) == batch_size:
+                self._add_skill_results(builder, batch, batch_size)
+                batch = []
+        self._add_skill_results(builder, batch, batch_size)
+        return builder.build()
+    
+    @staticmethod
+    def _add_skill_results(builder: SkillColumnsBuilder, results: List[Dict[str, Any]], batch_size: int) -> None:
+        """Add a batch of results to the builder with their answers, read from the ai_qa_entry collection in one query"""
+        if not results:
+            return
+        answers: Dict[str, List[tuple]] = {}
+        for test_id, *answer in QAEntryRepository().iter_answers([r["test_id"] for r in results if not r.get("qa_history")],
+                                                                 batch_size):
+            answers.setdefault(test_id, []).append(tuple(answer))
+        for document in results:
+            create_date = document.get("create_date")
+            legacy = [TestResultRepository._skill_answer(qa) for qa in document.get("qa_history") or []]
+            builder.add_result(
+                document["test_id"],
+                document.get("user_id"),
+                create_date.replace(tzinfo=create_date.tzinfo or UTC).timestamp() if create_date else None,
+                legacy or answers.get(document["test_id"], [])
+            )
+    
+    @staticmethod
+    def _skill_answer(qa: Dict[str, Any]) -> tuple:
+        """(question, knowledge point, score, is correct) of an embedded qa_history entry, the QAResult is in its summary"""
+        qa_result = qa.get("summary") if isinstance(qa.get("summary"), dict) else {}
+        answer = qa_result.get("answer") or {}
+        return (qa.get("question", ""),
+                (qa_result.get("question") or {}).get("knowledge_point"),
+                answer.get("score") or 0,
+                bool(answer.get("is_correct")))
+    
+    @log
+    async def aggregate_usage_by_job(self, job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Sum the LLM usage of the test results by job
+        
+        Args:
+            job_id: Only this job if given
+            
+        Returns:
+            List[Dict[str, Any]]: One usage total per job, most tokens first
+        """
+        match: Dict[str, Any] = {"llm_usage": {"$exists": True}}
+        if job_id:
+            match["job_id"] = job_id
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": "$job_id",
+                "tests": {"$sum": 1},
+                **{field: {"$sum": f"$llm_usage.{field}"} for field in USAGE_FIELDS}
+            }},
+            {"$sort": {"input_tokens": -1}}
+        ]
+        return list(TestResult._get_collection().aggregate(pipeline))
+    
+    @log
+    async def aggregate_usage_by_model(self, job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Sum the LLM usage of the test results by model and workflow node
+        
+        Args:
+            job_id: Only the tests of this job if given
+            
+        Returns:
+            List[Dict[str, Any]]: One usage total per model and node, most tokens first
+        """
+        match: Dict[str, Any] = {"llm_usage": {"$exists": True}}
+        if job_id:
+            match["job_id"] = job_id
+        pipeline = [
+            {"$match": match},
+            {"$unwind": "$llm_usage.by_node"},
+            {"$group": {
+                "_id": {"model": "$llm_usage.by_node.model", "node": "$llm_usage.by_node.node"},
+                # a test has at most one entry per model and node
+                "tests": {"$sum": 1},
+                **{field: {"$sum": f"$llm_usage.by_node.{field}"} for field in USAGE_FIELDS}
+            }},
+            {"$sort": {"input_tokens": -1}}
+        ]
+        return list(TestResult._get_collection().aggregate(pipeline))
@@ -0,0 +1,151 @@
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, UTC
+from pymongo import UpdateOne
+from api.model.db.test import Test
+from api.model.db.test_result import TestResult
+from api.model.db.test_result_stats import TestResultStats
+from api.utils.log_decorator import log
+from agent.interview_stats import MAX_INTERVIEW_SCORE
+
+# Lower bounds of the score buckets, one per point of the interview score (0-MAX_INTERVIEW_SCORE),
+# the scale of the workflow and API results alike
+SCORE_BUCKETS = tuple(range(MAX_INTERVIEW_SCORE + 1))
+# Lower bounds of the elapse time buckets (minutes)
+ELAPSE_TIME_BUCKETS = (0, 5, 10, 15, 20, 30, 45, 60, 90, 120)
+
+# Fields of a rollup key
+STATS_KEY_FIELDS = ("job_id", "difficulty", "language")
+
+
+def get_bucket(value: float, buckets: Tuple[int, ...]) -> str:
+    """Lower bound of the bucket of a value, as a histogram key"""
+    lower = buckets[0]
+    for bound in buckets:
+        if value >= bound:
+            lower = bound
+    return str(lower)
+
+
+def stats_increments(score: float, question_number: int, correct_number: int, elapse_time: int,
+                     sign: int = 1) -> Dict[str, float]:
+    """
+    Contribution of one test result to its rollup document
+
+    Args:
+        score: Score of the result
+        question_number: Number of questions
+        correct_number: Number of correct answers
+        elapse_time: Elapse time (minutes)
+        sign: 1 to add the result, -1 to remove it (e.g. before an update)
+
+    Returns:
+        Dict[str, float]: $inc update of the rollup document
+    """
+    return {
+        "count": sign,
+        "score_sum": sign * score,
+        "score_sq_sum": sign * score * score,
+        "question_sum": sign * question_number,
+        "correct_sum": sign * correct_number,
+        "elapse_time_sum": sign * elapse_time,
+        "elapse_time_sq_sum": sign * elapse_time * elapse_time,
+        f"score_histogram.{get_bucket(score, SCORE_BUCKETS)}": sign,
+        f"elapse_time_histogram.{get_bucket(elapse_time, ELAPSE_TIME_BUCKETS)}": sign
+    }
+
+
+def _bucket_counts(field: str, buckets: Tuple[int, ...]) -> Dict[str, Any]:
+    """$group accumulators counting the results of each bucket of field"""
+    counts = {}
+    for i, lower in enumerate(buckets):
+        condition: List[Dict[str, Any]] = [{"$gte": [f"${field}", lower]}]
+        if i + 1 < len(buckets):
+            condition.append({"$lt": [f"${field}", buckets[i + 1]]})
+        counts[f"{field}_{lower}"] = {"$sum": {"$cond": [{"$and": condition}, 1, 0]}}
+    return counts
+
+
+def _histogram(field: str, buckets: Tuple[int, ...]) -> Dict[str, Any]:
+    """Histogram document of the bucket counts of field, empty buckets left out"""
+    return {"$arrayToObject": {"$filter": {
+        "input": [{"k": str(lower), "v": f"${field}_{lower}"} for lower in buckets],
+        "cond": {"$gt": ["$$this.v", 0]}
+    }}}
+
+
+class TestResultStatsRepository:
+    @log
+    async def apply_increments(self, changes: List[Tuple[Dict[str, Any], Dict[str, float]]]) -> None:
+        """
+        Apply the contributions of created, updated or replaced test results in one batched write
+
+        Args:
+            changes: List of (rollup key, stats_increments) pairs
+        """
+        if not changes:
+            return
+        now = datetime.now(UTC)
+        operations = [UpdateOne(key, {"$inc": increments, "$set": {"update_date": now}}, upsert=True)
+                      for key, increments in changes]
+        TestResultStats._get_collection().bulk_write(operations, ordered=False)
+
+    @log
+    async def get_stats(self, job_id: str, difficulty: Optional[str] = None,
+                        language: Optional[str] = None) -> List[TestResultStats]:
+        """Get the rollup documents of a job, one per difficulty and language"""
+        query: Dict[str, Any] = {"job_id": job_id}
+        if difficulty:
+            query["difficulty"] = difficulty
+        if language:
+            query["language"] = language
+        return list(TestResultStats.objects(**query))
+
+    @log
+    async def rebuild(self) -> int:
+        """
+        Rebuild the rollup collection from the test results with one aggregation pipeline
+
+        The difficulty and language come from the test, the job of results written before
+        the job_id field from the test as well. $out replaces the collection atomically and
+        keeps its indexes.
+
+        Returns:
+            int: Number of rollup documents
+        """
+        pipeline = [
+            {"$lookup": {"from": Test._get_collection_name(), "localField": "test_id", "foreignField": "test_id", "as": "test"}},
+            {"$unwind": {"path": "$test", "preserveNullAndEmptyArrays": True}},
+            {"$group": {
+                "_id": {
+                    "job_id": {"$ifNull": ["$job_id", "$test.job_id"]},
+                    "difficulty": "$test.difficulty",
+                    "language": "$test.language"
+                },
+                "count": {"$sum": 1},
+                "score_sum": {"$sum": "$score"},
+                "score_sq_sum": {"$sum": {"$multiply": ["$score", "$score"]}},
+                "question_sum": {"$sum": "$question_number"},
+                "correct_sum": {"$sum": "$correct_number"},
+                "elapse_time_sum": {"$sum": "$elapse_time"},
+                "elapse_time_sq_sum": {"$sum": {"$multiply": ["$elapse_time", "$elapse_time"]}},
+                **_bucket_counts("score", SCORE_BUCKETS),
+                **_bucket_counts("elapse_time", ELAPSE_TIME_BUCKETS)
+            }},
+            {"$project": {
+                "_id": 0,
+                **{field: f"$_id.{field}" for field in STATS_KEY_FIELDS},
+                "count": 1,
+                "score_sum": 1,
+                "score_sq_sum": 1,
+                "question_sum": 1,
+                "correct_sum": 1,
+                "elapse_time_sum": 1,
+                "elapse_time_sq_sum": 1,
+                "score_histogram": _histogram("score", SCORE_BUCKETS),
+                "elapse_time_histogram": _histogram("elapse_time", ELAPSE_TIME_BUCKETS),
+                "update_date": "$$NOW"
+            }},
+            {"$out": TestResultStats._get_collection_name()}
+        ]
+        TestResult._get_collection().aggregate(pipeline)
+        return TestResultStats._get_collection().count_documents({})
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Query, HTTPException
+from typing import List, Optional
+from datetime import datetime
+from api.model.api.base import Response
+from api.model.api.analytics import SkillReport, SkillHeatmap
+from api.service.skill_analytics import SkillAnalyticsService
+from api.exceptions.api_error import ValidationError
+from loguru import logger
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/skills/weak", response_model=Response[List[SkillReport]])
+async def get_weak_skills(
+    job_id: Optional[str] = Query(None, description="Job ID"),
+    user_id: Optional[List[str]] = Query(None, description="User IDs of the cohort"),
+    start_date: Optional[datetime] = Query(None, description="Results created at or after"),
+    end_date: Optional[datetime] = Query(None, description="Results created before"),
+    min_count: int = Query(5, ge=1, description="Min answers of a knowledge point"),
+    limit: int = Query(20, ge=1, le=200, description="Max knowledge points")
+):
+    """
+    Rank the knowledge points of the test results from the weakest
+    
+    - **job_id**: Only this job (optional)
+    - **user_id**: Only these users, repeatable (optional)
+    - **start_date** / **end_date**: Time window of the results (optional)
+    """
+    try:
+        service = SkillAnalyticsService()
+        skills = await service.get_weak_skills(job_id, user_id, start_date, end_date, min_count, limit)
+        return Response[List[SkillReport]](
+            code="0",
+            message="success",
+            data=skills
+        )
+    except Exception as e:
+        logger.error(f"Exception Failed to get weak skills: {e}, Job ID: {job_id}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/skills/heatmap", response_model=Response[SkillHeatmap])
+async def get_skill_heatmap(
+    group_by: str = Query("week", description="Rows: test, user or week"),
+    job_id: Optional[str] = Query(None, description="Job ID"),
+    user_id: Optional[List[str]] = Query(None, description="User IDs of the cohort"),
+    start_date: Optional[datetime] = Query(None, description="Results created at or after"),
+    end_date: Optional[datetime] = Query(None, description="Results created before"),
+    max_rows: int = Query(100, ge=1, le=1000, description="Max rows, the last ones are kept")
+):
+    """
+    Correct ratio and mean score of every knowledge point by test, user or week
+    
+    - **group_by**: test, user or week
+    - **job_id**: Only this job (optional)
+    - **user_id**: Only these users, repeatable (optional)
+    - **start_date** / **end_date**: Time window of the results (optional)
+    """
+    try:
+        service = SkillAnalyticsService()
+        heatmap = await service.get_skill_heatmap(group_by, job_id, user_id, start_date, end_date, max_rows)
+        return Response[SkillHeatmap](
+            code="0",
+            message="success",
+            data=heatmap
+        )
+    except ValidationError as e:
+        logger.warning(f"ValidationError Failed to get skill heatmap: {str(e)}")
+        return Response[SkillHeatmap](
+            code="400",
+            message=str(e),
+            data=None
+        )
+    except Exception as e:
+        logger.error(f"Exception Failed to get skill heatmap: {e}, Job ID: {job_id}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import Optional, List
 from api.model.api.base import Response
-from api.model.api.chat import StartChatRequest, AnswerRequest, ChatResponse
+from api.model.api.chat import StartChatRequest, AnswerRequest, ChangeDifficultyRequest, ChatResponse
 from api.service.chat import ChatService
 from api.utils.log_decorator import log
+from utils.llm_scheduler import LLMOverloadedError
+from utils.llm_breaker import LLMUnavailableError
+from api.utils.disconnect import cancel_on_disconnect, ClientDisconnectedError
+from api.exceptions.api_error import NotFoundError, ValidationError
+from loguru import logger
 from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import UUID, uuid4
@@ -15,15 +20,15 @@ chat_service = ChatService()
 
 @router.post("/start", response_model=Response[ChatResponse])
 @log
-async def start_chat(request: StartChatRequest):
+async def start_chat(request: StartChatRequest, http_request: Request):
     """
     Start Chat
     
     Start a new interview chat session and return the first question
     """
     try:
-        # Call service layer method
-        result = await chat_service.start_chat(
+        # Call service layer method, cancelled if the client disconnects
+        result = await cancel_on_disconnect(http_request, chat_service.start_chat(
             user_id=request.user_id,
             test_id=request.test_id,
             job_title=request.job_title,
@@ -31,7 +36,7 @@ async def start_chat(request: StartChatRequest):
             test_time=request.test_time,
             language=request.language,
             difficulty=request.difficulty
-        )
+        ))
         
         # Return success response
         return Response[ChatResponse](
@@ -39,26 +44,35 @@ async def start_chat(request: StartChatRequest):
             message="success",
             data=result
         )
+    except LLMOverloadedError as e:
+        # LLM capacity exhausted, ask the client to retry later
+        raise HTTPException(status_code=429, detail=e.message, headers={"Retry-After": str(e.retry_after)})
+    except LLMUnavailableError as e:
+        # LLM endpoints and fallbacks are down, ask the client to retry once a circuit may close
+        raise HTTPException(status_code=503, detail=e.message, headers={"Retry-After": str(e.retry_after)})
+    except ClientDisconnectedError as e:
+        # nobody reads the response, 499 (client closed request) for the logs
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         # Handle exception
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/answer", response_model=Response[ChatResponse])
 @log
-async def answer_question(request: AnswerRequest):
+async def answer_question(request: AnswerRequest, http_request: Request):
     """
     Answer Question
     
     Submit the user's answer to a question and get the next question or feedback
     """
     try:
-        # Call service layer method
-        result = await chat_service.process_answer(
+        # Call service layer method, cancelled if the client disconnects
+        result = await cancel_on_disconnect(http_request, chat_service.process_answer(
             user_id=request.user_id,
             test_id=request.test_id,
             question_id=request.question_id,
             user_answer=request.user_answer
-        )
+        ))
         
         # Return success response
         return Response[ChatResponse](
@@ -66,6 +80,53 @@ async def answer_question(request: AnswerRequest):
             message="success",
             data=result
         )
+    except LLMOverloadedError as e:
+        # LLM capacity exhausted, ask the client to retry later
+        raise HTTPException(status_code=429, detail=e.message, headers={"Retry-After": str(e.retry_after)})
+    except LLMUnavailableError as e:
+        # LLM endpoints and fallbacks are down, ask the client to retry once a circuit may close
+        raise HTTPException(status_code=503, detail=e.message, headers={"Retry-After": str(e.retry_after)})
+    except ClientDisconnectedError as e:
+        # nobody reads the response, 499 (client closed request) for the logs
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         # Handle exception
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/difficulty", response_model=Response[ChatResponse])
+@log
+async def change_difficulty(request: ChangeDifficultyRequest):
+    """
+    Change Difficulty
+
+    Change the difficulty of an interview in progress, the questions after the one
+    waiting for an answer follow it (the rest of the interview plan is regenerated)
+    """
+    try:
+        result = await chat_service.change_difficulty(
+            user_id=request.user_id,
+            test_id=request.test_id,
+            difficulty=request.difficulty
+        )
+        return Response[ChatResponse](
+            code="0",
+            message="success",
+            data=result
+        )
+    except NotFoundError as e:
+        logger.warning(f"NotFoundError Failed to change difficulty: {str(e)}, Test ID: {request.test_id}")
+        return Response[ChatResponse](
+            code="404",
+            message=str(e),
+            data=None
+        )
+    except ValidationError as e:
+        logger.warning(f"ValidationError Failed to change difficulty: {str(e)}, Test ID: {request.test_id}")
+        return Response[ChatResponse](
+            code="400",
+            message=str(e),
+            data=None
+        )
+    except Exception as e:
+        # Handle exception
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Iterator, Optional
+from datetime import datetime
+from api.model.api.base import Response
+from api.service.export import ExportService
+from api.utils.export import EXPORT_MEDIA_TYPES
+from api.exceptions.api_error import ValidationError
+from loguru import logger
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+    responses={404: {"description": "Not found"}},
+)
+
+def _streaming_response(chunks: Iterator[bytes], name: str, export_format: str, compress: bool) -> StreamingResponse:
+    """
+    Stream an export as a file download
+
+    The chunks are produced by a sync iterator over a database cursor, Starlette reads it
+    in its threadpool so the event loop is not blocked.
+    """
+    filename = f"{name}.{export_format}" + (".gz" if compress else "")
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if compress else EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/tests")
+async def export_tests(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    gzip: bool = Query(False, description="Gzip the export"),
+    job_id: Optional[str] = Query(None, description="Job ID"),
+    status: Optional[str] = Query(None, description="Test status"),
+    start_date: Optional[datetime] = Query(None, description="Tests created at or after"),
+    end_date: Optional[datetime] = Query(None, description="Tests created before")
+):
+    """
+    Export the tests as NDJSON or CSV, streamed
+
+    - **format**: ndjson or csv
+    - **gzip**: Gzip the export (optional)
+    - **job_id**: Only this job (optional)
+    - **status**: Only this status (optional)
+    - **start_date** / **end_date**: Time window of the tests (optional)
+    """
+    try:
+        service = ExportService()
+        chunks = service.export_tests(format, gzip, job_id, status, start_date, end_date)
+        return _streaming_response(chunks, "tests", format, gzip)
+    except ValidationError as e:
+        logger.warning(f"ValidationError Failed to export tests: {str(e)}")
+        return Response(
+            code="400",
+            message=str(e),
+            data=None
+        )
+    except Exception as e:
+        logger.error(f"Exception Failed to export tests: {e}, Job ID: {job_id}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/test_results")
+async def export_test_results(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    gzip: bool = Query(False, description="Gzip the export"),
+    job_id: Optional[str] = Query(None, description="Job ID"),
+    start_date: Optional[datetime] = Query(None, description="Results created at or after"),
+    end_date: Optional[datetime] = Query(None, description="Results created before")
+):
+    """
+    Export the test results (without the Q&A histories) as NDJSON or CSV, streamed
+
+    - **format**: ndjson or csv
+    - **gzip**: Gzip the export (optional)
+    - **job_id**: Only this job (optional)
+    - **start_date** / **end_date**: Time window of the results (optional)
+    """
+    try:
+        service = ExportService()
+        chunks = service.export_results(format, gzip, job_id, start_date, end_date)
+        return _streaming_response(chunks, "test_results", format, gzip)
+    except ValidationError as e:
+        logger.warning(f"ValidationError Failed to export test results: {str(e)}")
+        return Response(
+            code="400",
+            message=str(e),
+            data=None
+        )
+    except Exception as e:
+        logger.error(f"Exception Failed to export test results: {e}, Job ID: {job_id}")
+        raise HTTPException(status_code=500, detail=str(e))
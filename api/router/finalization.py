@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Query, HTTPException
+from api.model.api.base import Response, PaginationResponse
+from api.model.api.finalization import FinalizationTaskResponse
+from api.service.finalization_queue import finalization_queue
+from api.exceptions.api_error import NotFoundError, ValidationError
+from loguru import logger
+
+router = APIRouter(
+    prefix="/finalization",
+    tags=["finalization"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/failed", response_model=PaginationResponse[FinalizationTaskResponse])
+async def get_failed_tasks(
+    page: int = Query(default=1, ge=1, description="Page number (1-based indexing)"),
+    page_size: int = Query(default=20, ge=1, le=100, description="Number of tasks per page")
+):
+    """
+    Get the finalization tasks given up after their max attempts, their tests stay on-going
+    
+    - **page**: Page number
+    - **page_size**: Number of tasks per page
+    """
+    try:
+        tasks, metadata = await finalization_queue.get_failed_tasks(page, page_size)
+        return PaginationResponse(data=tasks, metadata=metadata)
+    except Exception as e:
+        logger.error(f"Exception Failed to get failed finalization tasks: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{test_id}/retry", response_model=Response[dict])
+async def retry_task(test_id: str):
+    """
+    Requeue a failed finalization task, the result is generated again and the test completed
+    
+    - **test_id**: Test ID
+    """
+    try:
+        await finalization_queue.retry_task(test_id)
+        return Response[dict](
+            code="0",
+            message="success",
+            data={"test_id": test_id}
+        )
+    except NotFoundError as e:
+        logger.warning(f"NotFoundError Failed to retry finalization: {str(e)}, Test ID: {test_id}")
+        return Response[dict](
+            code="404",
+            message=str(e),
+            data=None
+        )
+    except ValidationError as e:
+        logger.warning(f"ValidationError Failed to retry finalization: {str(e)}, Test ID: {test_id}")
+        return Response[dict](
+            code="400",
+            message=str(e),
+            data=None
+        )
+    except Exception as e:
+        logger.error(f"Exception Failed to retry finalization: {e}, Test ID: {test_id}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,4 +1,7 @@
 from fastapi import APIRouter
+from utils.metrics import metrics
+from utils.llm_breaker import circuit_breakers, CircuitState
+from utils.llm_endpoints import get_endpoint_pool
 
 router = APIRouter()
 
@@ -6,5 +9,19 @@ router = APIRouter()
 async def health_check():
     """
     Health check endpoint to verify service status
+
+    The status is degraded while the circuit of a model / LLM endpoint is not closed,
+    or an endpoint of the pool is out of rotation
+    """
+    circuits = circuit_breakers.snapshot()
+    endpoints = get_endpoint_pool().snapshot()
+    degraded = any(circuit["state"] != CircuitState.CLOSED.value for circuit in circuits) or \
+        any(endpoint["ejected"] for endpoint in endpoints)
+    return {"status": "degraded" if degraded else "ok", "llm_circuits": circuits, "llm_endpoints": endpoints}
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Snapshot of the in-process metrics (counters, gauges and histograms)
     """
-    return {"status": "ok hu rishav Bhaiya!"} 
\ No newline at end of file
+    return metrics.snapshot()
\ No newline at end of file
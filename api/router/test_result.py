@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Query, HTTPException
 from typing import List, Optional
-from api.model.api.base import Response
-from api.model.api.test_result import CreateTestResultRequest, UpdateTestResultRequest, TestResultResponse
+from api.model.api.base import Response, PaginationResponse, PaginationMetadata
+from api.model.api.test_result import CreateTestResultRequest, UpdateTestResultRequest, TestResultResponse, LLMUsageReport, \
+    ScoreStatsReport, QAEntryResponse
 from api.service.test_result import TestResultService
 from api.exceptions.api_error import NotFoundError, ValidationError
 from loguru import logger
@@ -20,7 +21,7 @@ async def create_test_result(request: CreateTestResultRequest):
     - **test_id**: Test ID
     - **user_id**: User ID
     - **summary**: Summary
-    - **score**: Score (0-100)
+    - **score**: Score (0-10, the interview score scale)
     - **question_number**: Number of questions
     - **correct_number**: Number of correct answers
     - **elapse_time**: Elapsed time (minutes)
@@ -55,7 +56,7 @@ async def create_test_result(request: CreateTestResultRequest):
 @router.get("/test/{test_id}", response_model=Response[TestResultResponse])
 async def get_test_result_by_test_id(test_id: str):
     """
-    Get test result by test ID
+    Get test result by test ID, without its Q&A history
     
     - **test_id**: Test ID
     """
@@ -78,10 +79,40 @@ async def get_test_result_by_test_id(test_id: str):
         logger.error(f"Exception Failed to get test result: {e}, Test ID: {test_id}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/test/{test_id}/qa_history", response_model=PaginationResponse[QAEntryResponse])
+async def get_qa_history(
+    test_id: str,
+    page: int = Query(default=1, ge=1, description="Page number (1-based indexing)"),
+    page_size: int = Query(default=20, ge=1, le=100, description="Number of entries per page")
+):
+    """
+    Get the Q&A history of a test result with pagination
+    
+    - **test_id**: Test ID
+    - **page**: Page number
+    - **page_size**: Number of entries per page
+    """
+    try:
+        service = TestResultService()
+        entries, metadata = await service.get_qa_history(test_id, page, page_size)
+        return PaginationResponse(data=entries, metadata=metadata)
+    except NotFoundError as e:
+        logger.warning(f"NotFoundError Failed to get Q&A history: {str(e)}, Test ID: {test_id}")
+        return PaginationResponse(
+            code="404",
+            message=str(e),
+            data=[],
+            metadata=PaginationMetadata(total_count=0, page_size=page_size, current_page=page, total_pages=0,
+                                        has_next=False, has_previous=False)
+        )
+    except Exception as e:
+        logger.error(f"Exception Failed to get Q&A history: {e}, Test ID: {test_id}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/user/{user_id}", response_model=Response[List[TestResultResponse]])
 async def get_test_results_by_user_id(user_id: str):
     """
-    Get test result list by user ID
+    Get test result list by user ID, without the Q&A histories
     
     - **user_id**: User ID
     """
@@ -95,4 +126,68 @@ async def get_test_results_by_user_id(user_id: str):
         )
     except Exception as e:
         logger.error(f"Exception Failed to get user test results: {e}, User ID: {user_id}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/usage/job", response_model=Response[List[LLMUsageReport]])
+async def get_usage_by_job(job_id: Optional[str] = Query(None, description="Job ID")):
+    """
+    Get LLM usage (tokens and latency) of the test results by job
+    
+    - **job_id**: Only this job (optional)
+    """
+    try:
+        service = TestResultService()
+        reports = await service.get_usage_by_job(job_id)
+        return Response[List[LLMUsageReport]](
+            code="0",
+            message="success",
+            data=reports
+        )
+    except Exception as e:
+        logger.error(f"Exception Failed to get LLM usage by job: {e}, Job ID: {job_id}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/usage/model", response_model=Response[List[LLMUsageReport]])
+async def get_usage_by_model(job_id: Optional[str] = Query(None, description="Job ID")):
+    """
+    Get LLM usage (tokens and latency) of the test results by model and workflow node
+    
+    - **job_id**: Only the tests of this job (optional)
+    """
+    try:
+        service = TestResultService()
+        reports = await service.get_usage_by_model(job_id)
+        return Response[List[LLMUsageReport]](
+            code="0",
+            message="success",
+            data=reports
+        )
+    except Exception as e:
+        logger.error(f"Exception Failed to get LLM usage by model: {e}, Job ID: {job_id}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stats/job/{job_id}", response_model=Response[List[ScoreStatsReport]])
+async def get_score_stats(job_id: str,
+                          difficulty: Optional[str] = Query(None, description="Difficulty"),
+                          language: Optional[str] = Query(None, description="Language")):
+    """
+    Get score statistics (mean, variance, histograms, correct ratio) of the test results of a job
+    
+    Read from the rollup collection, one report per difficulty and language
+    
+    - **job_id**: Job ID
+    - **difficulty**: Only this difficulty (optional)
+    - **language**: Only this language (optional)
+    """
+    try:
+        service = TestResultService()
+        reports = await service.get_score_stats(job_id, difficulty, language)
+        return Response[List[ScoreStatsReport]](
+            code="0",
+            message="success",
+            data=reports
+        )
+    except Exception as e:
+        logger.error(f"Exception Failed to get score statistics: {e}, Job ID: {job_id}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,17 @@
+import asyncio
+from loguru import logger
+from api.infra.mongo.connection import init_mongodb
+from api.repositories.test_result_stats_repository import TestResultStatsRepository
+
+# Rebuild the per-job score statistics from the test results, e.g. after a deployment
+# or when an incremental update failed
+# python -m api.scripts.backfill_result_stats
+
+def backfill():
+    """Rebuild the rollup collection with one aggregation pipeline"""
+    init_mongodb()
+    count = asyncio.run(TestResultStatsRepository().rebuild())
+    logger.info(f"Rebuilt {count} score statistics documents")
+
+if __name__ == "__main__":
+    backfill()
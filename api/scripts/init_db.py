@@ -1,28 +1,262 @@
+import argparse
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from typing import Any, Dict, List, Optional, Tuple, Type
 from loguru import logger
+from mongoengine import Document
 from api.infra.mongo.connection import init_mongodb
 from api.model.db.test import Test
 from api.model.db.user import User
 from api.model.db.job import Job
 from api.model.db.test_result import TestResult
+from api.model.db.test_result_stats import TestResultStats
+from api.model.db.score_sketch import ScoreSketch
+from api.model.db.qa_entry import QAEntry
 from api.model.db.question import Question
+from api.model.db.finalization_task import FinalizationTask
+
+# Create the collections and apply the index plan: the indexes declared in the meta of
+# the documents, indexes not declared anymore are dropped
+# python -m api.scripts.init_db
+#
+# Check the plan against the repository queries (explain) without changing anything,
+# exits with 1 on a collection scan, a blocking sort or a redundant index
+# python -m api.scripts.init_db --check
+
+PLAN_DOCUMENTS: List[Type[Document]] = [Test, User, Job, TestResult, TestResultStats, ScoreSketch, QAEntry, Question,
+                                        FinalizationTask]
+
+# (field, direction) pairs of an index
+IndexKey = Tuple[Tuple[str, int], ...]
+
+
+@dataclass
+class QueryShape:
+    """A repository query, with sample values, to explain against the index plan"""
+    name: str
+    document: Type[Document]
+    filter: Dict[str, Any]
+    sort: List[Tuple[str, int]] = field(default_factory=list)
+    # plan stages accepted for this query, e.g. COLLSCAN for a substring search
+    allow: Tuple[str, ...] = ()
+
+
+NOW = datetime.now(UTC)
+DATE_RANGE = {"$gte": datetime(2025, 1, 1, tzinfo=UTC), "$lt": NOW}
+
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("TestRepository.get_test_by_id", Test, {"test_id": "t"}),
+    QueryShape("TestRepository.get_test_by_activate_code", Test, {"activate_code": "12345678"}),
+    QueryShape("TestRepository.get_tests", Test, {}, [("create_date", -1)]),
+    QueryShape("TestRepository.get_tests_by_user_id", Test, {"user_id": "u"}, [("create_date", -1)]),
+    QueryShape("TestRepository.get_tests_by_job_id", Test, {"job_id": "j"}),
+    QueryShape("TestRepository.get_tests_by_status", Test, {"status": "open"}, [("expire_date", 1)]),
+    QueryShape("TestRepository.get_tests_by_type", Test, {"type": "interview"}),
+    QueryShape("TestRepository.get_stats_keys", Test, {"test_id": {"$in": ["t1", "t2"]}}),
+    QueryShape("TestRepository.claim_due_tests", Test, {"deadline_date": {"$lte": NOW}}, [("deadline_date", 1)]),
+    QueryShape("TestRepository.iter_tests", Test, {"job_id": "j", "status": "completed", "create_date": DATE_RANGE}),
+    QueryShape("TestRepository.iter_tests (dates)", Test, {"create_date": DATE_RANGE}),
+    QueryShape("TestResultRepository.get_result_by_test_id", TestResult, {"test_id": "t"}),
+    QueryShape("TestResultRepository.get_results_by_user_id", TestResult, {"user_id": "u"}, [("create_date", -1)]),
+    QueryShape("TestResultRepository.get_stats_values", TestResult, {"test_id": {"$in": ["t1", "t2"]}}),
+    QueryShape("TestResultRepository.iter_results", TestResult, {"job_id": "j", "create_date": DATE_RANGE}),
+    QueryShape("TestResultRepository.iter_results (dates)", TestResult, {"create_date": DATE_RANGE}),
+    QueryShape("TestResultRepository.load_skill_columns", TestResult,
+               {"job_id": "j", "user_id": {"$in": ["u1", "u2"]}, "create_date": DATE_RANGE}),
+    QueryShape("TestResultRepository.aggregate_usage_by_job", TestResult, {"job_id": "j", "llm_usage": {"$exists": True}}),
+    QueryShape("TestResultRepository.migrate_qa_histories", TestResult, {"qa_history": {"$exists": True}},
+               allow=("COLLSCAN",)),
+    QueryShape("TestResultStatsRepository.get_stats", TestResultStats, {"job_id": "j", "difficulty": "easy"}),
+    QueryShape("ScoreSketchRepository.get_digests", ScoreSketch, {"job_id": "j", "difficulty": "easy"}),
+    QueryShape("QAEntryRepository.get_entries", QAEntry, {"test_id": "t"}, [("index", 1)]),
+    QueryShape("QAEntryRepository.iter_answers", QAEntry, {"test_id": {"$in": ["t1", "t2"]}}, [("test_id", 1), ("index", 1)]),
+    QueryShape("UserRepository.get_user_by_id", User, {"user_id": "u"}),
+    QueryShape("UserRepository.get_user_by_email", User, {"email": "a@b.c"}),
+    QueryShape("UserRepository.get_user_by_staff_id", User, {"staff_id": "s"}),
+    QueryShape("JobRepository.get_job_by_id", Job, {"job_id": "j"}),
+    QueryShape("QuestionRepository.get_question_by_id", Question, {"question_id": "q"}),
+    QueryShape("QuestionRepository.get_questions_by_job", Question, {"job_title": "React Developer", "language": "English"}),
+    QueryShape("QuestionRepository.get_questions_by_examination_points", Question,
+               {"examination_points": {"$in": ["React", "CSS"]}}),
+    QueryShape("QuestionRepository.get_questions_by_knowledge_point", Question, {"examination_points": "React"}),
+    QueryShape("QuestionRepository.get_questions_by_difficulty", Question, {"difficulty": "easy"}),
+    QueryShape("QuestionRepository.get_questions_by_type", Question, {"type": "Essay"}),
+    # substring search, no index can serve it
+    QueryShape("QuestionRepository.search_questions", Question, {"question": {"$regex": "react", "$options": "i"}},
+               allow=("COLLSCAN",)),
+    QueryShape("FinalizationTaskRepository.get_task_by_test_id", FinalizationTask, {"test_id": "t"}),
+    # each branch of the $or has its index, the claimed batch is small
+    QueryShape("FinalizationTaskRepository.claim_tasks", FinalizationTask,
+               {"$or": [{"status": "pending", "next_run_date": {"$lte": NOW}},
+                        {"status": "running", "lease_expire_date": {"$lte": NOW}}]},
+               [("next_run_date", 1)], allow=("SORT",)),
+    # failed tasks are few, found by the status index and sorted in memory
+    QueryShape("FinalizationTaskRepository.get_failed_tasks", FinalizationTask, {"status": "failed"},
+               [("update_date", -1)], allow=("SORT",)),
+]
+
+# Plan stages reported as problems
+FLAGGED_STAGES = ("COLLSCAN", "SORT")
+
+
+def planned_indexes(document: Type[Document]) -> Dict[IndexKey, Dict[str, bool]]:
+    """
+    Indexes declared by a document: its meta indexes and the indexes of its unique fields
+
+    Args:
+      document: The document class
+
+    Returns:
+      Options (unique, sparse) by index key
+    """
+    return {tuple((name, direction) for name, direction in spec["fields"]):
+            {"unique": bool(spec.get("unique")), "sparse": bool(spec.get("sparse"))}
+            for spec in document._meta["index_specs"]}
+
+
+def live_indexes(document: Type[Document]) -> Dict[str, Tuple[IndexKey, Dict[str, bool]]]:
+    """Indexes of the collection of a document, without _id: (key, options) by index name"""
+    return {name: (tuple((field_name, int(direction)) for field_name, direction in info["key"]),
+                   {"unique": bool(info.get("unique")), "sparse": bool(info.get("sparse"))})
+            for name, info in document._get_collection().index_information().items() if name != "_id_"}
+
+
+def redundant_indexes(indexes: Dict[IndexKey, Dict[str, bool]]) -> List[Tuple[IndexKey, IndexKey]]:
+    """
+    Indexes served by another index, i.e. a prefix of its key
+
+    Unique and sparse indexes are never redundant, they are not equivalent to a prefix.
+
+    Args:
+      indexes: Options (unique, sparse) by index key
+
+    Returns:
+      (redundant index, index serving it) pairs
+    """
+    redundant = []
+    for key, options in indexes.items():
+        if options["unique"] or options["sparse"]:
+            continue
+        for other, other_options in indexes.items():
+            if other == key or other_options["sparse"]:
+                continue
+            # the direction of a single field index doesn't matter
+            prefix = other[:len(key)]
+            if prefix == key or (len(key) == 1 and prefix[0][0] == key[0][0]):
+                redundant.append((key, other))
+                break
+    return redundant
+
+
+def plan_stages(plan: Dict[str, Any]) -> List[Tuple[str, Optional[str]]]:
+    """(stage, index name) of every stage of an explained plan"""
+    stages = [(plan.get("stage"), plan.get("indexName"))]
+    for child in [plan.get("inputStage"), plan.get("queryPlan")] + plan.get("inputStages", []):
+        if child:
+            stages.extend(plan_stages(child))
+    return [stage for stage in stages if stage[0]]
+
+
+def explain_query(shape: QueryShape) -> List[Tuple[str, Optional[str]]]:
+    """Stages of the winning plan of a query"""
+    cursor = shape.document._get_collection().find(shape.filter)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    return plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
+
+
+def check_plan(documents: List[Type[Document]] = PLAN_DOCUMENTS,
+               shapes: List[QueryShape] = QUERY_SHAPES) -> List[str]:
+    """
+    Check the index plan and the live indexes against the repository queries
+
+    Args:
+      documents: The documents of the plan
+      shapes: The repository queries
+
+    Returns:
+      The problems found, empty if none
+    """
+    problems = []
+    used = set()
+    for shape in shapes:
+        stages = explain_query(shape)
+        used.update((shape.document, index) for _, index in stages if index)
+        flagged = sorted({stage for stage, _ in stages if stage in FLAGGED_STAGES and stage not in shape.allow})
+        logger.info(f"{shape.name}: {' <- '.join(stage if not index else f'{stage}({index})' for stage, index in stages)}")
+        if flagged:
+            problems.append(f"{shape.name}: {', '.join(flagged)}")
+
+    for document in documents:
+        collection = document._get_collection_name()
+        planned = planned_indexes(document)
+        for key, other in redundant_indexes(planned):
+            problems.append(f"{collection}: index {key} is redundant with {other}")
+        for name, (key, options) in live_indexes(document).items():
+            if planned.get(key) != options:
+                problems.append(f"{collection}: index {name} is not in the plan, run api.scripts.init_db")
+            elif (document, name) not in used:
+                logger.info(f"{collection}: index {name} is not used by the checked queries")
+        live_keys = {key: options for key, options in live_indexes(document).values()}
+        for key, options in planned.items():
+            if live_keys.get(key) != options:
+                problems.append(f"{collection}: index {key} is missing, run api.scripts.init_db")
+    return problems
+
+
+def apply_plan(document: Type[Document]) -> List[str]:
+    """
+    Make the indexes of a collection match the plan, idempotent
+
+    The indexes not in the plan (or with other options) are dropped, then the missing
+    ones created.
+
+    Args:
+      document: The document class
+
+    Returns:
+      The names of the dropped indexes
+    """
+    planned = planned_indexes(document)
+    dropped = []
+    for name, (key, options) in live_indexes(document).items():
+        if planned.get(key) != options:
+            document._get_collection().drop_index(name)
+            dropped.append(name)
+    document.ensure_indexes()
+    return dropped
 
 def init_collections():
     """Initialize database collections"""
     try:
         # Connect to MongoDB
         init_mongodb()
-        
+
         # Create collections and indexes
-        Test.ensure_indexes()
-        User.ensure_indexes()
-        Job.ensure_indexes()
-        TestResult.ensure_indexes()
-        Question.ensure_indexes()
-        
+        for document in PLAN_DOCUMENTS:
+            dropped = apply_plan(document)
+            if dropped:
+                logger.info(f"Dropped indexes of {document._get_collection_name()} not in the plan: {dropped}")
+
         logger.info("Database collections initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize collections: {str(e)}")
         raise
 
+def check_collections() -> int:
+    """Explain the repository queries against the live indexes, 1 if a problem is found"""
+    init_mongodb()
+    problems = check_plan()
+    for problem in problems:
+        logger.warning(problem)
+    logger.info(f"Index plan check: {len(problems)} problem(s) in {len(QUERY_SHAPES)} queries")
+    return 1 if problems else 0
+
 if __name__ == "__main__":
-    init_collections() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Apply or check the index plan")
+    parser.add_argument("--check", action="store_true", help="Only explain the queries and report the problems")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(check_collections())
+    init_collections()
@@ -0,0 +1,19 @@
+import asyncio
+from loguru import logger
+from api.infra.mongo.connection import init_mongodb
+from api.model.db.qa_entry import QAEntry
+from api.repositories.test_result_repository import TestResultRepository
+
+# Move the Q&A histories embedded in the test results by the previous versions to the
+# ai_qa_entry collection, safe to run again if interrupted
+# python -m api.scripts.migrate_qa_history
+
+def migrate():
+    """Move the embedded Q&A histories to the ai_qa_entry collection"""
+    init_mongodb()
+    QAEntry.ensure_indexes()
+    count = asyncio.run(TestResultRepository().migrate_qa_histories())
+    logger.info(f"Migrated the Q&A history of {count} test results")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,17 @@
+import asyncio
+from loguru import logger
+from api.infra.mongo.connection import init_mongodb
+from api.repositories.score_sketch_repository import ScoreSketchRepository
+
+# Rebuild the score sketches (percentile ranks) of every job and difficulty from the
+# test results, e.g. after a deployment or when an incremental update failed
+# python -m api.scripts.rebuild_score_sketches
+
+def rebuild():
+    """Rebuild the score sketches from the test results"""
+    init_mongodb()
+    count = asyncio.run(ScoreSketchRepository().rebuild())
+    logger.info(f"Rebuilt {count} score sketches")
+
+if __name__ == "__main__":
+    rebuild()
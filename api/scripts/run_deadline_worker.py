@@ -0,0 +1,22 @@
+import asyncio
+from loguru import logger
+from api.conf.config import Config
+from api.infra.mongo.connection import init_mongodb
+from api.service.deadline_scheduler import deadline_scheduler
+
+# Run the deadline scheduler outside the API process, it finalizes the abandoned
+# interviews whose session is gone (e.g. after a restart of the API process)
+# python -m api.scripts.run_deadline_worker
+
+def run_worker():
+    """Run the deadline scheduler until interrupted"""
+    config = Config.load_config()
+    init_mongodb()
+    deadline_scheduler.configure(config.deadline)
+    try:
+        asyncio.run(deadline_scheduler.run())
+    except KeyboardInterrupt:
+        logger.info("Deadline scheduler interrupted")
+
+if __name__ == "__main__":
+    run_worker()
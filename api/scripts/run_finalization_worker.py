@@ -0,0 +1,21 @@
+import asyncio
+from loguru import logger
+from api.conf.config import Config
+from api.infra.mongo.connection import init_mongodb
+from api.service.finalization_queue import finalization_queue
+
+# Run the finalization queue worker outside the API process
+# python -m api.scripts.run_finalization_worker
+
+def run_worker():
+    """Run the finalization queue worker until interrupted"""
+    config = Config.load_config()
+    init_mongodb()
+    finalization_queue.configure(config.finalization)
+    try:
+        asyncio.run(finalization_queue.run())
+    except KeyboardInterrupt:
+        logger.info("Finalization queue worker interrupted")
+
+if __name__ == "__main__":
+    run_worker()
\ No newline at end of file
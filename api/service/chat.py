@@ -1,8 +1,16 @@
-from typing import Dict, Any, Optional, List
+import asyncio
+import threading
+from typing import Dict, Any, Optional, List, Callable, Awaitable
 from datetime import datetime
-from uuid import uuid4
+from uuid import uuid4, uuid5, NAMESPACE_URL
 from api.utils.log_decorator import log
-from agent.workflow import build_graph
+from api.utils.single_flight import SingleFlight
+from agent.workflow import build_graph, generate_next_question, get_remaining_questions
+from agent.prefetch import question_prefetcher
+from agent.agent_state import KickoffMode
+from utils.llm_scheduler import Priority
+from utils.llm import resolve_route, check_route_overrides, ModelRoute
+from utils.llm_cancel import cancellations
 from langgraph.types import Command
 from langgraph.types import StateSnapshot
 from api.model.api.test_result import CreateTestResultRequest
@@ -10,6 +18,10 @@ from api.service.test_result import TestResultService
 from agent.interview_response import InterviewResult
 from loguru import logger
 from api.service.test import TestService
+from api.service.finalization_queue import finalization_queue
+from api.service.deadline_scheduler import deadline_scheduler
+from api.constants.common import TestStatus, Difficulty
+from api.exceptions.api_error import NotFoundError, ValidationError
 from langgraph.graph import START
 
 
@@ -18,9 +30,148 @@ class ChatService:
     
     def __init__(self):
         """Initialize Chat Service"""
-        self.workflow = build_graph()
-        self.model_name = "gpt-4o"
+        # compiled on first use or by warm_up, not when the API is imported
+        self._workflow = None
+        self._workflow_lock = threading.Lock()
+        # node -> model settings, see the llm.routes section of the app config
+        self.model_routes: Dict[str, Dict[str, Any]] = {"default": {"model": "gpt-4o"}}
+        # models and largest max_tokens the per-test overrides (Test.model_routes) may use
+        self.allowed_models: List[str] = ["gpt-4o", "gpt-4o-mini"]
+        self.max_tokens_cap: Optional[int] = 4096
+        # plan: questions served from the interview plan, incremental: one LLM call per question
+        self.kickoff_mode: str = KickoffMode.PLAN.value
         self.test_service = TestService()  # Add TestService instance
+        # serializes the graph runs of a thread and coalesces duplicate submissions
+        self.single_flight = SingleFlight()
+
+    @property
+    def workflow(self):
+        """The compiled workflow graph, built once on first use"""
+        if self._workflow is None:
+            with self._workflow_lock:
+                if self._workflow is None:
+                    self._workflow = build_graph()
+        return self._workflow
+
+    def warm_up(self) -> None:
+        """Build the workflow graph ahead of the first interview, e.g. in a worker thread at startup"""
+        _ = self.workflow
+
+    def configure(self, cfg: Dict[str, Any]) -> None:
+        """Apply the `llm` section of the app config"""
+        if cfg.get("kickoff_mode"):
+            self.kickoff_mode = KickoffMode(cfg["kickoff_mode"]).value
+        if cfg.get("routes"):
+            self.model_routes = {node: dict(route) for node, route in cfg["routes"].items()}
+        if cfg.get("allowed_models"):
+            self.allowed_models = list(cfg["allowed_models"])
+        if "max_tokens_cap" in cfg:
+            self.max_tokens_cap = cfg["max_tokens_cap"]
+
+    def _get_config(self, user_id: str, test_id: str) -> Dict[str, Any]:
+        """Runnable config of a graph run, the model settings are read by the nodes from configurable"""
+        return {
+            "configurable": {
+                "thread_id": test_id,
+                "user_id": user_id,
+                "kickoff_mode": self.kickoff_mode,
+                "model_routes": self.model_routes
+            }
+        }
+
+    @staticmethod
+    def _get_question_id(test_id: str, values: Dict[str, Any]) -> str:
+        """Stable ID of the question waiting for an answer, derived from the checkpoint state"""
+        # every answer (including repeated ones) appends one qa_history entry
+        turn = len(values.get("qa_history", []))
+        return str(uuid5(NAMESPACE_URL, f"{test_id}/{turn}"))
+
+    async def get_session_values(self, user_id: str, test_id: str) -> Optional[Dict[str, Any]]:
+        """Workflow state of the interview, None if this process has no session for it"""
+        snapshot: StateSnapshot = await asyncio.to_thread(self.workflow.get_state, self._get_config(user_id, test_id))
+        return snapshot.values or None
+
+    def get_summary_route(self, values: Dict[str, Any]) -> ModelRoute:
+        """Model route of the narrative summary of the interview"""
+        return resolve_route("summary", self.model_routes, values.get("model_routes"))
+
+    def _get_test_routes(self, test: Optional[Any]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Model routing overrides of a test, ignored if they break the limits of the llm config"""
+        model_routes = getattr(test, "model_routes", None)
+        problems = check_route_overrides(model_routes, self.allowed_models, self.max_tokens_cap)
+        if problems:
+            logger.warning(f"Ignoring the model routes of test {test.test_id}: {'; '.join(problems)}")
+            return None
+        return model_routes or None
+
+    async def release_session(self, test_id: str) -> None:
+        """Remove the interview from the checkpointer and drop its prefetched question"""
+        question_prefetcher.cancel(test_id)
+        await asyncio.to_thread(self._delete_thread, test_id)
+        self.single_flight.forget(test_id)
+
+    def _delete_thread(self, test_id: str) -> None:
+        """
+        Remove the checkpoints, pending writes and channel values of the thread from the MemorySaver
+
+        The pinned langgraph-checkpoint has no delete_thread, the in-memory storage is purged directly.
+        """
+        checkpointer = self.workflow.checkpointer
+        checkpointer.storage.pop(test_id, None)
+        # keys of writes: (thread_id, checkpoint_ns, checkpoint_id), of blobs: (thread_id, checkpoint_ns, channel, version)
+        for entries in (checkpointer.writes, getattr(checkpointer, "blobs", {})):
+            for key in [key for key in list(entries) if key[0] == test_id]:
+                entries.pop(key, None)
+
+    async def run_locked(self, test_id: str, call_key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn under the lock of the test, i.e. between the graph runs of its requests"""
+        return await self.single_flight.do(test_id, call_key, fn, cache=False)
+
+    async def _run_graph(self, test_id: str, run: Callable[[], Any], restore: Optional[StateSnapshot]) -> None:
+        """
+        Run the graph in a worker thread, cancellable with the request
+
+        When the request is cancelled (the client disconnected), the LLM calls of the run
+        are cancelled and, unless the run completed anyway, the thread is restored to the
+        checkpoint before the run, so the resumed session sees the whole turn or none of it.
+
+        Args:
+            test_id: Test ID (thread ID)
+            run: The graph run
+            restore: State before the run, None for the first run of the thread
+        """
+        with cancellations.scope(test_id) as token:
+            task = asyncio.ensure_future(asyncio.to_thread(run))
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                token.set()
+                # the graph run stops at its next LLM call check
+                (error,) = await asyncio.gather(task, return_exceptions=True)
+                if error is not None:
+                    logger.info(f"Graph run of {test_id} cancelled, restoring the previous checkpoint")
+                    await asyncio.to_thread(self._restore, test_id, restore)
+                raise
+
+    def _restore(self, test_id: str, snapshot: Optional[StateSnapshot]) -> None:
+        """Make the checkpoint of snapshot the latest one of the thread, or remove the thread"""
+        if snapshot is None or not snapshot.values:
+            self._delete_thread(test_id)
+        else:
+            # a copy of the checkpoint becomes the latest one, the partial turn is dropped
+            self.workflow.update_state(snapshot.config, None)
+
+    def _prefetch_next_question(self, config: Dict[str, Any], snapshot: StateSnapshot) -> None:
+        """Generate the likely next question in the background while the candidate answers"""
+        state = snapshot.values
+        if not snapshot.next or state.get("interview_plan") is not None:
+            # interview is over, or the next question is served from the interview plan
+            return
+        if get_remaining_questions(state, config) <= 1:
+            # the question waiting for an answer is the last one of the budget
+            return
+        question_prefetcher.submit(config["configurable"]["thread_id"], state,
+                                   lambda: generate_next_question(state, config, Priority.DEFERRABLE))
     
     @log
     async def start_chat(
@@ -36,6 +187,8 @@ class ChatService:
         """
         Start Chat
         
+        Concurrent starts of the same test share one graph run
+        
         Args:
             user_id: User ID
             test_id: Test ID
@@ -48,35 +201,32 @@ class ChatService:
         Returns:
             Dict: Contains information about the first question
         """
-        inputs = {
-            "start_time": datetime.now(),
-            "end_time": datetime.now(),
-            "messages": [],
-            "job_title": job_title,
-            "knowledge_points": examination_points,
-            "interview_time": test_time,
-            "language": language,
-            "difficulty": difficulty
-        }
+        return await self.single_flight.do(
+            test_id, "start",
+            lambda: self._start_chat(user_id, test_id, job_title, examination_points, test_time, language, difficulty),
+            cache=False
+        )
 
-        config = {
-            "configurable": {
-                "thread_id": test_id, 
-                "user_id": user_id
-            },
-            "model_name": self.model_name,
-            # "model_name":"claude-3-5-sonnet",
-            # "model_name": "gpt-4o",
-            # "model_name": "deepseek-v3",
-        }
+    async def _start_chat(
+        self,
+        user_id: str,
+        test_id: str,
+        job_title: str,
+        examination_points: str,
+        test_time: int,
+        language: str,
+        difficulty: str
+    ) -> Dict[str, Any]:
+        """Start Chat, runs under the lock of the test"""
+        config = self._get_config(user_id, test_id)
 
         # Check if the test exists
-        current: StateSnapshot = self.workflow.get_state(config)
+        current: StateSnapshot = await asyncio.to_thread(self.workflow.get_state, config)
         if current:
             # Workflow found
             (next,) = current.next if current.next else (None,)
             feedback = current.values["feedback"] if "feedback" in current.values.keys() else None
-            question_id = str(uuid4())
+            question_id = self._get_question_id(test_id, current.values)
             type = "question"
             if next is None:
                 if "interview_result" in current.values.keys():
@@ -109,6 +259,8 @@ class ChatService:
                 else:
                     qa_history = []
 
+                self._prefetch_next_question(config, current)
+
                 return {
                     "feedback": feedback,
                     "question_id": question_id,
@@ -120,17 +272,16 @@ class ChatService:
                 logger.info(f"Start chat, current next is {next}")
                 # Resume the workflow
                 # Load all messages from the test
-                events = self.workflow.invoke(None, config=config)
-                for event in events:
-                    pass
+                await self._run_graph(test_id, lambda: self.workflow.invoke(None, config=config), current)
 
                 # get the snapshot state (next question is in the snapshot)
-                snapshot = self.workflow.get_state(config)
+                snapshot = await asyncio.to_thread(self.workflow.get_state, config)
                 if snapshot.next:                    
                     # show the question to user
                     # wait for user answer
                     feedback = snapshot.values["feedback"]
                     is_over = False
+                    self._prefetch_next_question(config, snapshot)
                 else:
                     # workflow has no next, end
                     is_over = True
@@ -142,29 +293,56 @@ class ChatService:
 
                 return {
                     "feedback": feedback,
-                    "question_id": str(uuid4()),  # TODO: Needs to be fetched from snapshot
+                    "question_id": self._get_question_id(test_id, snapshot.values),
                     "type": "question",
                     "is_over": is_over,
                     "qa_history": qa_history
                 }
 
+        # the session of a finished interview is released by the deadline scheduler
+        try:
+            test = await self.test_service.get_test(test_id)
+        except NotFoundError:
+            test = None
+        if test and test.status == TestStatus.COMPLETED.value:
+            logger.info(f"Start chat, test {test_id} is already completed")
+            return {
+                "feedback": None,
+                "question_id": self._get_question_id(test_id, {}),
+                "type": "question",
+                "is_over": True
+            }
+
         # new workflow
+        # the model routing overrides come from the stored test, never from the client
+        inputs = {
+            "start_time": datetime.now(),
+            "end_time": datetime.now(),
+            "messages": [],
+            "job_title": job_title,
+            "knowledge_points": examination_points,
+            "interview_time": test_time,
+            "language": language,
+            "difficulty": difficulty,
+            "model_routes": self._get_test_routes(test)
+        }
+
         # start the interview, generate the first question
-        events = self.workflow.stream(inputs, config=config, stream_mode="values")
-        for event in events:
-            pass
+        await self._run_graph(test_id, lambda: list(self.workflow.stream(inputs, config=config, stream_mode="values")), None)
+        await deadline_scheduler.track(test_id, test_time)
 
-        snapshot: StateSnapshot = self.workflow.get_state(config)
+        snapshot: StateSnapshot = await asyncio.to_thread(self.workflow.get_state, config)
         if snapshot.next:                    
             # show the question to user
             feedback = snapshot.values["feedback"]
             is_over = False
+            self._prefetch_next_question(config, snapshot)
         else:
             is_over = True
 
         return {
             "feedback": feedback,
-            "question_id": str(uuid4()),  # TODO: Needs to be fetched from snapshot
+            "question_id": self._get_question_id(test_id, snapshot.values),
             "type": "question",
             "is_over": is_over
         }
@@ -180,6 +358,9 @@ class ChatService:
         """
         Process User Answer
         
+        Answers of the same test are processed one at a time, a duplicate submission
+        for the same question ID gets the result of the first one (in flight or completed)
+        
         Args:
             user_id: User ID
             test_id: Test ID
@@ -189,58 +370,125 @@ class ChatService:
         Returns:
             Dict: Contains information about the next question or feedback
         """
-        config = {
-            "configurable": {
-                "thread_id": test_id, 
-                "user_id": user_id
-            },
-            "model_name": self.model_name,
-            # "model_name": "gpt-4o",
-            # "model_name": "deepseek-v3",
-        }
+        return await self.single_flight.do(
+            test_id, question_id,
+            lambda: self._process_answer(user_id, test_id, question_id, user_answer)
+        )
+
+    async def _process_answer(
+        self,
+        user_id: str,
+        test_id: str,
+        question_id: str,
+        user_answer: str
+    ) -> Dict[str, Any]:
+        """Process User Answer, runs under the lock of the test"""
+        config = self._get_config(user_id, test_id)
+        # the narrative summary is generated by the finalization queue
+        config["configurable"]["defer_summary"] = True
+
+        # Only the question waiting for an answer can be answered, a stale submission
+        # (already answered question) returns the current state without a graph run
+        current: StateSnapshot = await asyncio.to_thread(self.workflow.get_state, config)
+        current_question_id = self._get_question_id(test_id, current.values)
+        if question_id != current_question_id or current.next != ("analyze_answer",):
+            logger.info(f"Stale answer for question {question_id}, current question is {current_question_id}")
+            return {
+                "feedback": current.values.get("feedback"),
+                "question_id": current_question_id,
+                "type": "question",
+                "is_over": not current.next
+            }
 
         # Resume the interview workflow
         # Pass user answer and get the result
         # Then generate next question
-        events = self.workflow.invoke(Command(resume="Go ahead", update={"user_answer": user_answer}), config=config)
-        for event in events:
-            pass
+        await self._run_graph(
+            test_id,
+            lambda: self.workflow.invoke(Command(resume="Go ahead", update={"user_answer": user_answer}), config=config),
+            current
+        )
 
         # Get the snapshot state (next question is in the snapshot)
-        snapshot = self.workflow.get_state(config)
+        snapshot = await asyncio.to_thread(self.workflow.get_state, config)
         feedback = snapshot.values["feedback"]
 
         # Check if the interview is over
         if "interview_result" in snapshot.values.keys():
-            # Call test result service to update interview result
-            # Async call
-            interview_result: InterviewResult = snapshot.values["interview_result"]  
-            logger.info(f"Interview is over, call test result service to update interview result {interview_result.model_dump_json(indent=2)}")
-
-            # Save test result
-            test_result_service = TestResultService()
-            request = CreateTestResultRequest(
-                test_id=test_id,
-                user_id=user_id,
-                summary=interview_result.summary,
-                score=interview_result.score,
-                question_number=interview_result.total_question_number,
-                correct_number=interview_result.correct_question_number,
-                elapse_time=interview_result.interview_time,
-                qa_history=[{"question": q, "answer": a, "summary": s} for (q, a, s) in snapshot.values["qa_history"]]
-            )
-            await test_result_service.complete_test_result(request)
-
-            # Update test status to completed
-            await self.test_service.update_test_status_to_completed(test_id)
-
+            # The finalization queue generates the narrative summary, saves the test result
+            # and completes the test, the candidate gets the final message right away
+            question_prefetcher.cancel(test_id)
+            await finalization_queue.enqueue(user_id, test_id, snapshot.values, self.get_summary_route(snapshot.values))
             is_over = True
         else:
             is_over = False
+            self._prefetch_next_question(config, snapshot)
 
         return {
             "feedback": feedback,
-            "question_id": str(uuid4()),  # TODO: Needs to be fetched from snapshot
+            "question_id": self._get_question_id(test_id, snapshot.values),
             "type": "question",
             "is_over": is_over
         }
+
+    @log
+    async def change_difficulty(
+        self,
+        user_id: str,
+        test_id: str,
+        difficulty: str
+    ) -> Dict[str, Any]:
+        """
+        Change the difficulty of an interview in progress
+
+        The question waiting for an answer is kept, the next questions follow the new
+        difficulty: the rest of the interview plan is regenerated (plan mode), or the next
+        question is generated with it (incremental mode). Runs under the lock of the test,
+        between two answers.
+
+        Args:
+            user_id: User ID
+            test_id: Test ID
+            difficulty: New difficulty
+
+        Returns:
+            Dict: The question waiting for an answer
+
+        Raises:
+            ValidationError: If the difficulty is unknown or the interview is over
+            NotFoundError: If this process has no session for the interview
+        """
+        if difficulty not in Difficulty.choices():
+            raise ValidationError(f"Invalid difficulty: {difficulty}")
+        return await self.single_flight.do(
+            test_id, f"difficulty/{difficulty}",
+            lambda: self._change_difficulty(user_id, test_id, difficulty),
+            cache=False
+        )
+
+    async def _change_difficulty(self, user_id: str, test_id: str, difficulty: str) -> Dict[str, Any]:
+        """Change the difficulty, runs under the lock of the test"""
+        config = self._get_config(user_id, test_id)
+        current: StateSnapshot = await asyncio.to_thread(self.workflow.get_state, config)
+        if not current.values:
+            raise NotFoundError(f"No interview session for test {test_id}")
+        if current.next != ("analyze_answer",):
+            raise ValidationError(f"Interview {test_id} is over")
+
+        if current.values["difficulty"] != difficulty:
+            update: Dict[str, Any] = {"difficulty": difficulty}
+            if current.values.get("interview_plan") is not None:
+                update["regenerate_plan"] = True
+            logger.info(f"Changing the difficulty of {test_id} to {difficulty}")
+            await asyncio.to_thread(self.workflow.update_state, config, update)
+            # the running prefetch was made for the previous difficulty
+            question_prefetcher.cancel(test_id)
+            current = await asyncio.to_thread(self.workflow.get_state, config)
+            self._prefetch_next_question(config, current)
+
+        return {
+            "feedback": current.values.get("feedback"),
+            "question_id": self._get_question_id(test_id, current.values),
+            "type": "question",
+            "is_over": False
+        }
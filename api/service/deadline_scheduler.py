@@ -0,0 +1,196 @@
+import asyncio
+from datetime import datetime, UTC, timedelta
+from typing import Dict, Any, List, Optional, Protocol, Callable, Awaitable
+from loguru import logger
+from agent.interview_response import InterviewResult
+from agent.interview_stats import compute_interview_statistics
+from utils.llm import ModelRoute
+from utils.metrics import metrics
+from api.constants.common import TestStatus
+from api.model.db.test import Test
+from api.repositories.test_repository import TestRepository
+from api.service.finalization_queue import finalization_queue
+
+
+# Summary of an interview abandoned before the first answer, no LLM call needed
+ABANDONED_SUMMARY = "The interview was abandoned before any question was answered."
+
+expired_interviews = metrics.counter("interview_expired_total", "Interviews finalized by the deadline scheduler, by source")
+released_sessions = metrics.counter("interview_sessions_released_total", "Interview sessions removed from the checkpointer")
+
+
+class InterviewSessions(Protocol):
+    """Access to the interview sessions held by this process, see ChatService"""
+
+    async def get_session_values(self, user_id: str, test_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    def get_summary_route(self, values: Dict[str, Any]) -> ModelRoute:
+        ...
+
+    async def release_session(self, test_id: str) -> None:
+        ...
+
+    async def run_locked(self, test_id: str, call_key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        ...
+
+
+class DeadlineScheduler:
+    """
+    Finalize interviews whose deadline passed and reclaim their session memory
+
+    The deadline (start of the interview + test_time, capped by Test.expire_date) is
+    stored on the test when the interview starts. Due tests are claimed in batches,
+    abandoned interviews are summarized from the qa_history of their session and
+    persisted through the finalization queue, then the session is removed from the
+    checkpointer. Interviews completed normally only have their session removed.
+    A session is finalized under the lock of its test, after the answer in flight (if
+    any), so the final answer is kept and the session is not removed under a request.
+
+    In the API process the sessions are attached and the tests are claimed after
+    grace_seconds. A separate worker has no sessions, it only claims the tests left
+    behind (e.g. by a restart) after orphan_grace_seconds and finalizes them with the
+    test settings and an empty qa_history.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        poll_interval: float = 30.0,
+        grace_seconds: int = 60,
+        orphan_grace_seconds: int = 600
+    ):
+        """Initialize Deadline Scheduler"""
+        self.repository = TestRepository()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.grace_seconds = grace_seconds
+        self.orphan_grace_seconds = orphan_grace_seconds
+        self.sessions: Optional[InterviewSessions] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def configure(self, cfg: Dict[str, Any]) -> None:
+        """Apply the `deadline` section of the app config"""
+        for key in ("batch_size", "poll_interval", "grace_seconds", "orphan_grace_seconds"):
+            if key in cfg:
+                setattr(self, key, cfg[key])
+
+    def attach(self, sessions: InterviewSessions) -> None:
+        """Attach the interview sessions of this process (API process only)"""
+        self.sessions = sessions
+
+    async def track(self, test_id: str, test_time: int) -> bool:
+        """
+        Track the deadline of an interview that just started
+
+        Args:
+            test_id: Test ID
+            test_time: Test time (minutes)
+
+        Returns:
+            bool: True if the test was open
+        """
+        return await self.repository.mark_started(test_id, datetime.now(UTC) + timedelta(minutes=test_time))
+
+    async def process_batch(self) -> int:
+        """
+        Claim and finalize one batch of due interviews
+
+        Returns:
+            int: Number of claimed tests
+        """
+        delay = self.grace_seconds if self.sessions is not None else self.orphan_grace_seconds
+        tests: List[Test] = await self.repository.claim_due_tests(datetime.now(UTC) - timedelta(seconds=delay),
+                                                                  self.batch_size)
+        for test in tests:
+            try:
+                if self.sessions is not None:
+                    await self.sessions.run_locked(test.test_id, "deadline", lambda test=test: self._finalize(test))
+                else:
+                    await self._finalize(test)
+            except Exception as e:
+                # claimed again on the next poll
+                logger.error(f"Deadline finalization of {test.test_id} failed: {e}")
+                await self.repository.set_deadline(test.test_id, test.deadline_date)
+        return len(tests)
+
+    async def _finalize(self, test: Test) -> None:
+        """Finalize the interview of a due test unless it is completed, then release its session"""
+        values = await self.sessions.get_session_values(test.user_id, test.test_id) if self.sessions else None
+        if values and "interview_result" in values:
+            # completed by the candidate, the chat service enqueued the finalization
+            pass
+        elif test.status == TestStatus.COMPLETED.value:
+            pass
+        elif values:
+            logger.info(f"Finalizing abandoned interview {test.test_id} with {len(values['qa_history'])} answers")
+            values = {**values,
+                      "interview_result": compute_interview_statistics(values["qa_history"],
+                                                                       values["start_time"],
+                                                                       datetime.now())}
+            await finalization_queue.enqueue(test.user_id, test.test_id, values,
+                                             self.sessions.get_summary_route(values),
+                                             summary=None if values["qa_history"] else ABANDONED_SUMMARY)
+            expired_interviews.inc(source="session")
+        else:
+            logger.info(f"Finalizing abandoned interview {test.test_id} without session")
+            await finalization_queue.enqueue(test.user_id, test.test_id, self._values_from_test(test),
+                                             ModelRoute(), summary=ABANDONED_SUMMARY)
+            expired_interviews.inc(source="orphan")
+
+        if values is not None:
+            await self.sessions.release_session(test.test_id)
+            released_sessions.inc()
+
+    @staticmethod
+    def _values_from_test(test: Test) -> Dict[str, Any]:
+        """Final workflow state of an interview whose session is gone"""
+        start_date = test.start_date.replace(tzinfo=UTC) if test.start_date.tzinfo is None else test.start_date
+        elapsed_minutes = max(0, int((datetime.now(UTC) - start_date).total_seconds() // 60))
+        return {
+            "job_title": test.job_title or "",
+            "knowledge_points": ", ".join(test.examination_points or []),
+            "interview_time": test.test_time,
+            "language": test.language,
+            "interview_result": InterviewResult(summary="",
+                                                total_question_number=0,
+                                                correct_question_number=0,
+                                                score=0,
+                                                interview_time=min(elapsed_minutes, test.test_time)),
+            "qa_history": []
+        }
+
+    async def run(self) -> None:
+        """Process due interviews until cancelled"""
+        logger.info("Deadline scheduler started")
+        while True:
+            try:
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Deadline scheduler error: {e}")
+                processed = 0
+
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        """Start the scheduler in the running event loop (API process)"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the scheduler, due tests not claimed yet are picked up on the next start"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            logger.info("Deadline scheduler stopped")
+
+
+# Shared by the chat service and the API process worker
+deadline_scheduler = DeadlineScheduler()
@@ -0,0 +1,83 @@
+from typing import Iterator, Optional
+from datetime import datetime
+from api.constants.common import TestStatus
+from api.repositories.test_repository import TestRepository
+from api.repositories.test_result_repository import TestResultRepository
+from api.utils.export import EXPORT_MEDIA_TYPES, export_stream
+from api.exceptions.api_error import ValidationError
+
+# Exported fields, in column order
+TEST_EXPORT_FIELDS = ["test_id", "user_id", "user_name", "job_id", "job_title", "type", "language", "difficulty",
+                      "test_time", "status", "create_date", "start_date", "expire_date", "close_date"]
+RESULT_EXPORT_FIELDS = ["test_id", "user_id", "job_id", "score", "question_number", "correct_number", "elapse_time",
+                        "summary", "create_date"]
+
+class ExportService:
+    """Streaming export of the tests and the test results"""
+
+    def __init__(self, batch_size: int = 1000):
+        """
+        Initialize Export Service
+
+        Args:
+            batch_size: Documents per cursor batch
+        """
+        self.batch_size = batch_size
+        self.test_repository = TestRepository()
+        self.result_repository = TestResultRepository()
+
+    def export_tests(self, export_format: str, compress: bool = False, job_id: Optional[str] = None,
+                     status: Optional[str] = None, start_date: Optional[datetime] = None,
+                     end_date: Optional[datetime] = None) -> Iterator[bytes]:
+        """
+        Export the tests, encoded while the cursor is read
+
+        Args:
+            export_format: ndjson or csv
+            compress: Gzip the export
+            job_id: Only the tests of this job if given
+            status: Only the tests with this status if given
+            start_date: Only the tests created at or after this date if given
+            end_date: Only the tests created before this date if given
+
+        Returns:
+            Iterator[bytes]: The encoded chunks
+
+        Raises:
+            ValidationError: If the format or the status is unknown
+        """
+        self._validate(export_format, start_date, end_date)
+        if status and status not in TestStatus.choices():
+            raise ValidationError(f"Unknown status: {status}, expected one of {TestStatus.choices()}")
+        rows = self.test_repository.iter_tests(TEST_EXPORT_FIELDS, job_id, status, start_date, end_date, self.batch_size)
+        return export_stream(rows, TEST_EXPORT_FIELDS, "tests", export_format, compress)
+
+    def export_results(self, export_format: str, compress: bool = False, job_id: Optional[str] = None,
+                       start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Iterator[bytes]:
+        """
+        Export the test results without their Q&A history, encoded while the cursor is read
+
+        Args:
+            export_format: ndjson or csv
+            compress: Gzip the export
+            job_id: Only the results of this job if given
+            start_date: Only the results created at or after this date if given
+            end_date: Only the results created before this date if given
+
+        Returns:
+            Iterator[bytes]: The encoded chunks
+
+        Raises:
+            ValidationError: If the format is unknown
+        """
+        self._validate(export_format, start_date, end_date)
+        rows = self.result_repository.iter_results(RESULT_EXPORT_FIELDS, job_id, start_date, end_date, self.batch_size)
+        return export_stream(rows, RESULT_EXPORT_FIELDS, "test_results", export_format, compress)
+
+    @staticmethod
+    def _validate(export_format: str, start_date: Optional[datetime], end_date: Optional[datetime]) -> None:
+        """Check the format and the date range of an export before it starts streaming"""
+        if export_format not in EXPORT_MEDIA_TYPES:
+            raise ValidationError(f"Unknown export format: {export_format}, expected one of {list(EXPORT_MEDIA_TYPES)}")
+        if start_date and end_date and start_date >= end_date:
+            raise ValidationError("start_date must be before end_date")
@@ -0,0 +1,278 @@
+import asyncio
+import random
+from dataclasses import asdict
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, UTC, timedelta
+from loguru import logger
+from agent.agent_state import get_qa_history
+from agent.interview_response import InterviewResult
+from agent.workflow import generate_interview_summary
+from utils.llm import ModelRoute, summarize_usage
+from api.model.api.test_result import CreateTestResultRequest
+from api.model.api.finalization import FinalizationTaskResponse
+from api.model.api.base import PaginationMetadata
+from api.model.db.finalization_task import FinalizationTask
+from api.repositories.finalization_task_repository import FinalizationTaskRepository
+from api.service.test_result import TestResultService
+from api.service.test import TestService
+from api.exceptions.api_error import NotFoundError, ValidationError
+from api.constants.common import TaskStatus
+from utils.metrics import metrics
+
+
+failed_finalizations = metrics.counter("finalization_failed_total", "Finalization tasks given up after max_attempts")
+retried_finalizations = metrics.counter("finalization_retried_total", "Failed finalization tasks requeued by an operator")
+
+
+class FinalizationQueue:
+    """
+    Durable MongoDB backed queue that summarizes and persists completed interviews
+
+    Tasks are keyed by test ID (enqueueing twice is a no-op), leased to a worker while
+    processed and retried with exponential backoff, a task whose lease expires is picked
+    up again (at-least-once). The summaries of a batch are generated concurrently (at
+    most summary_concurrency LLM calls), results and test status are written in batches.
+
+    A task given up after max_attempts is marked failed, its test stays on-going until an
+    operator requeues it, see get_failed_tasks and retry_task.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 20,
+        poll_interval: float = 1.0,
+        lease_seconds: int = 120,
+        max_attempts: int = 5,
+        retry_base_delay: float = 5.0,
+        summary_concurrency: int = 5
+    ):
+        """Initialize Finalization Queue"""
+        self.repository = FinalizationTaskRepository()
+        self.test_result_service = TestResultService()
+        self.test_service = TestService()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.summary_concurrency = summary_concurrency
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    def configure(self, cfg: Dict[str, Any]) -> None:
+        """Apply the `finalization` section of the app config"""
+        for key in ("batch_size", "poll_interval", "lease_seconds", "max_attempts", "retry_base_delay",
+                    "summary_concurrency"):
+            if key in cfg:
+                setattr(self, key, cfg[key])
+
+    @staticmethod
+    def build_payload(values: Dict[str, Any], route: ModelRoute) -> Dict[str, Any]:
+        """Extract what is needed to finalize the interview from the final workflow state"""
+        interview_result: InterviewResult = values["interview_result"]
+        return {
+            "job_title": values["job_title"],
+            "knowledge_points": values["knowledge_points"],
+            "interview_time": values["interview_time"],
+            "language": values["language"],
+            "model_route": asdict(route),
+            "interview_result": interview_result.model_dump(mode="json"),
+            "qa_history_text": get_qa_history(values["qa_history"]),
+            "llm_usage": list(values.get("llm_usage") or []),
+            "qa_history": [{"question": q, "answer": a, "summary": s.model_dump(mode="json")} for (q, a, s) in values["qa_history"]]
+        }
+
+    async def enqueue(self, user_id: str, test_id: str, values: Dict[str, Any], route: ModelRoute,
+                      summary: Optional[str] = None) -> bool:
+        """
+        Enqueue the finalization of a completed interview
+
+        Args:
+            user_id: User ID
+            test_id: Test ID
+            values: Final workflow state
+            route: Model route of the narrative summary
+            summary: Narrative summary, generated by the queue if not given
+
+        Returns:
+            bool: True if enqueued, False if the test was already enqueued
+        """
+        created = await self.repository.enqueue_task(test_id, user_id, self.build_payload(values, route), summary)
+        if not created:
+            logger.info(f"Finalization task already exists: {test_id}")
+        self._wakeup.set()
+        return created
+
+    async def process_batch(self) -> int:
+        """
+        Claim and process one batch of due tasks
+
+        Returns:
+            int: Number of claimed tasks
+        """
+        tasks = await self.repository.claim_tasks(self.batch_size, self.lease_seconds)
+        if not tasks:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.summary_concurrency)
+
+        async def prepare(task: FinalizationTask) -> CreateTestResultRequest:
+            async with semaphore:
+                summary = task.summary or await self._generate_summary(task)
+            return self._to_request(task, summary)
+
+        ready: List[FinalizationTask] = []
+        requests: List[CreateTestResultRequest] = []
+        prepared = await asyncio.gather(*[prepare(task) for task in tasks], return_exceptions=True)
+        for task, result in zip(tasks, prepared):
+            if isinstance(result, BaseException):
+                await self._retry(task, result)
+            else:
+                requests.append(result)
+                ready.append(task)
+
+        if requests:
+            test_ids = [request.test_id for request in requests]
+            try:
+                await self.test_result_service.complete_test_results(requests)
+                await self.test_service.update_tests_status_to_completed(test_ids)
+                await self.repository.mark_done(test_ids)
+                logger.info(f"Finalized {len(test_ids)} interviews")
+            except Exception as e:
+                for task in ready:
+                    await self._retry(task, e)
+
+        return len(tasks)
+
+    async def _generate_summary(self, task: FinalizationTask) -> str:
+        """Generate the narrative summary and save it on the task"""
+        payload = task.payload
+        # tasks enqueued before the routing table only have the model name
+        route = ModelRoute(**payload["model_route"]) if "model_route" in payload \
+            else ModelRoute(model=payload.get("model_name", "gpt-4o"))
+        llm_usage: List[Dict[str, Any]] = []
+        summary = await asyncio.to_thread(
+            generate_interview_summary,
+            job_title=payload["job_title"],
+            knowledge_points=payload["knowledge_points"],
+            interview_time=payload["interview_time"],
+            language=payload["language"],
+            qa_history=payload["qa_history_text"],
+            statistics=InterviewResult(**payload["interview_result"]),
+            route=route,
+            thread_id=task.test_id,
+            llm_usage=llm_usage
+        )
+        await self.repository.save_summary(task.test_id, summary, llm_usage)
+        payload.setdefault("llm_usage", []).extend(llm_usage)
+        return summary
+
+    def _to_request(self, task: FinalizationTask, summary: str) -> CreateTestResultRequest:
+        interview_result = task.payload["interview_result"]
+        return CreateTestResultRequest(
+            test_id=task.test_id,
+            user_id=task.user_id,
+            summary=summary,
+            score=interview_result["score"],
+            question_number=interview_result["total_question_number"],
+            correct_number=interview_result["correct_question_number"],
+            elapse_time=interview_result["interview_time"],
+            qa_history=task.payload["qa_history"],
+            llm_usage=summarize_usage(task.payload.get("llm_usage", []))
+        )
+
+    async def _retry(self, task: FinalizationTask, error: Exception) -> None:
+        """Reschedule the task with jittered exponential backoff, or give up after max_attempts"""
+        if task.attempts >= self.max_attempts:
+            logger.error(f"Finalization of {task.test_id} failed after {task.attempts} attempts, "
+                         f"the test stays on-going until the task is retried: {error}")
+            await self.repository.reschedule_task(task.test_id, str(error), None)
+            failed_finalizations.inc()
+            return
+
+        delay = self.retry_base_delay * 2 ** (task.attempts - 1) * random.uniform(0.5, 1.5)
+        logger.warning(f"Finalization of {task.test_id} failed (attempt {task.attempts}), retry in {delay:.1f}s: {error}")
+        await self.repository.reschedule_task(task.test_id, str(error), datetime.now(UTC) + timedelta(seconds=delay))
+
+    async def get_failed_tasks(self, page: int = 1,
+                               page_size: int = 20) -> Tuple[List[FinalizationTaskResponse], PaginationMetadata]:
+        """
+        Get one page of the tasks given up after max_attempts, most recently failed first
+
+        Args:
+            page: Page number (1-based)
+            page_size: Number of tasks per page
+
+        Returns:
+            Tuple of (list of finalization task responses, pagination metadata)
+        """
+        tasks, total_count = await self.repository.get_failed_tasks((page - 1) * page_size, page_size)
+        total_pages = (total_count + page_size - 1) // page_size  # Ceiling division
+        metadata = PaginationMetadata(
+            total_count=total_count,
+            page_size=page_size,
+            current_page=page,
+            total_pages=total_pages,
+            has_next=page < total_pages,
+            has_previous=page > 1
+        )
+        return [FinalizationTaskResponse(**task.to_mongo().to_dict()) for task in tasks], metadata
+
+    async def retry_task(self, test_id: str) -> None:
+        """
+        Requeue a failed task, its attempts start again from zero
+
+        Args:
+            test_id: Test ID
+
+        Raises:
+            NotFoundError: If the test has no finalization task
+            ValidationError: If the task is not failed
+        """
+        task = await self.repository.get_task_by_test_id(test_id)
+        if task is None:
+            raise NotFoundError(f"No finalization task for test {test_id}")
+        if task.status != TaskStatus.FAILED.value or not await self.repository.requeue_failed_task(test_id):
+            raise ValidationError(f"Finalization task of test {test_id} is {task.status}, only failed tasks can be retried")
+        logger.info(f"Finalization of {test_id} requeued")
+        retried_finalizations.inc()
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        """Process tasks until cancelled"""
+        logger.info("Finalization queue worker started")
+        while True:
+            try:
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Finalization queue worker error: {e}")
+                processed = 0
+
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def start(self) -> None:
+        """Start the worker in the running event loop (API process)"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the worker, leased tasks are picked up again once their lease expires"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            logger.info("Finalization queue worker stopped")
+
+
+# Shared by the chat service and the API process worker
+finalization_queue = FinalizationQueue()
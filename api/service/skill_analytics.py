@@ -0,0 +1,129 @@
+from typing import List, Optional, Tuple
+from datetime import datetime, UTC
+import numpy as np
+from api.model.api.analytics import SkillReport, SkillHeatmap
+from api.repositories.test_result_repository import TestResultRepository
+from api.utils.skill_matrix import SkillColumns, skill_matrices, rank_weak_skills
+from api.utils.log_decorator import log
+from api.exceptions.api_error import ValidationError
+
+# Row groupings of the heatmap
+HEATMAP_GROUPS = ("test", "user", "week")
+
+# Seconds per week, weeks start on Monday (the POSIX epoch is a Thursday)
+WEEK_SECONDS = 7 * 24 * 3600
+EPOCH_TO_MONDAY = 3 * 24 * 3600
+
+class SkillAnalyticsService:
+    """Skill gap analytics over the qa_history of the test results"""
+    
+    def __init__(self):
+        """Initialize Skill Analytics Service"""
+        self.repository = TestResultRepository()
+    
+    @log
+    async def get_weak_skills(
+        self,
+        job_id: Optional[str] = None,
+        user_ids: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_count: int = 5,
+        limit: int = 20
+    ) -> List[SkillReport]:
+        """
+        Rank the knowledge points of the test results from the weakest
+        
+        Args:
+            job_id: Only the results of this job if given
+            user_ids: Only the results of these users if given
+            start_date: Only the results created at or after this date if given
+            end_date: Only the results created before this date if given
+            min_count: Knowledge points with fewer answers are left out
+            limit: Max number of knowledge points
+            
+        Returns:
+            List[SkillReport]: Weakest knowledge point first
+        """
+        columns = await self.repository.load_skill_columns(job_id, user_ids, start_date, end_date)
+        return [SkillReport(**skill) for skill in rank_weak_skills(columns, min_count)[:limit]]
+    
+    @log
+    async def get_skill_heatmap(
+        self,
+        group_by: str = "week",
+        job_id: Optional[str] = None,
+        user_ids: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        max_rows: int = 100
+    ) -> SkillHeatmap:
+        """
+        Correct ratio and mean score of every knowledge point by test, user or week
+        
+        Args:
+            group_by: test, user or week
+            job_id: Only the results of this job if given
+            user_ids: Only the results of these users if given
+            start_date: Only the results created at or after this date if given
+            end_date: Only the results created before this date if given
+            max_rows: Max number of rows, the last rows (most recent weeks) are kept
+            
+        Returns:
+            SkillHeatmap: Rows x knowledge points matrices
+            
+        Raises:
+            ValidationError: If group_by is not supported
+        """
+        if group_by not in HEATMAP_GROUPS:
+            raise ValidationError(f"group_by must be one of {', '.join(HEATMAP_GROUPS)}")
+        
+        columns = await self.repository.load_skill_columns(job_id, user_ids, start_date, end_date)
+        labels, result_rows = self._group_results(columns, group_by)
+        matrices = skill_matrices(columns, result_rows[columns.result_index], len(labels))
+        
+        keep = slice(max(0, len(labels) - max_rows), len(labels))
+        return SkillHeatmap(
+            group_by=group_by,
+            rows=labels[keep],
+            total_rows=len(labels),
+            knowledge_points=columns.skills,
+            count=matrices["count"][keep].tolist(),
+            correct_ratio=self._to_cells(matrices["correct_ratio"][keep]),
+            mean_score=self._to_cells(matrices["mean_score"][keep])
+        )
+    
+    @staticmethod
+    def _group_results(columns: SkillColumns, group_by: str) -> Tuple[List[str], np.ndarray]:
+        """
+        Row labels and row of every result
+        
+        Args:
+            columns: The answers
+            group_by: test, user or week
+            
+        Returns:
+            Tuple[List[str], np.ndarray]: Sorted row labels, row index of each result
+        """
+        if group_by == "test":
+            keys = np.array(columns.result_ids, dtype=object)
+        elif group_by == "user":
+            keys = np.array([user_id or "" for user_id in columns.user_ids], dtype=object)
+        else:
+            # results without create date (written before it was recorded) go to week -1
+            dates = columns.create_dates
+            keys = np.where(np.isnan(dates), -1, (np.nan_to_num(dates) + EPOCH_TO_MONDAY) // WEEK_SECONDS).astype(np.int64)
+        if len(keys) == 0:
+            return [], np.zeros(0, dtype=np.int64)
+        
+        unique, rows = np.unique(keys, return_inverse=True)
+        if group_by != "week":
+            return [str(key) for key in unique], rows
+        labels = [datetime.fromtimestamp(week * WEEK_SECONDS - EPOCH_TO_MONDAY, UTC).date().isoformat()
+                  if week >= 0 else "unknown" for week in unique]
+        return labels, rows
+    
+    @staticmethod
+    def _to_cells(matrix: np.ndarray) -> List[List[Optional[float]]]:
+        """Rounded matrix cells, None for the empty ones"""
+        return [[None if np.isnan(cell) else round(float(cell), 4) for cell in row] for row in matrix]
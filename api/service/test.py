@@ -1,7 +1,7 @@
 import uuid
 import random
 import string
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Dict, Any
 from datetime import datetime, UTC, timedelta
 from api.model.api.test import CreateTestRequest, UpdateTestRequest, TestResponse
 from api.model.db.test import Test
@@ -13,6 +13,8 @@ from api.utils.log_decorator import log
 from api.exceptions.api_error import NotFoundError, DuplicateError, ValidationError
 from api.constants.common import TestStatus, TestType, Language, Difficulty
 from api.model.api.base import PaginationMetadata
+from api.conf.config import Config
+from utils.llm import check_route_overrides
 from loguru import logger
 
 class TestService:
@@ -31,6 +33,14 @@ class TestService:
         test = await self.repository.get_test_by_activate_code(code)
         return test is None
     
+    @staticmethod
+    def _validate_model_routes(model_routes: Optional[Dict[str, Dict[str, Any]]]) -> None:
+        """Check the model routing overrides of a test against the limits of the llm config"""
+        llm_config = Config.load_config().llm
+        problems = check_route_overrides(model_routes, list(llm_config.allowed_models), llm_config.max_tokens_cap)
+        if problems:
+            raise ValidationError(f"Invalid model routes: {'; '.join(problems)}")
+
     async def _generate_unique_activate_code(self, length=4) -> str:
         """Generate a unique activation code, starting with a default length of 4."""
         max_attempts = 10  # Maximum number of attempts
@@ -56,6 +66,9 @@ class TestService:
         # Validate difficulty
         if request.difficulty not in Difficulty.choices():
             raise ValidationError(f"Invalid difficulty: {request.difficulty}")
+
+        # Validate model routing overrides
+        self._validate_model_routes(request.model_routes)
         
         # Generate unique ID
         test_id = str(uuid.uuid4())
@@ -105,6 +118,7 @@ class TestService:
             question_ids=question_ids,
             examination_points=request.examination_points or [],
             test_time=request.test_time or 60,  # Default 60 minutes
+            model_routes=request.model_routes or {},
             create_date=datetime.now(UTC),
             start_date=datetime.now(UTC),
             expire_date=datetime.now(UTC) + timedelta(days=7),  # Default expiration after 7 days
@@ -157,6 +171,9 @@ class TestService:
             test.examination_points = request.examination_points
         if request.test_time is not None:
             test.test_time = request.test_time
+        if request.model_routes is not None:
+            self._validate_model_routes(request.model_routes)
+            test.model_routes = request.model_routes
         
         # Update timestamp
         test.update_date = datetime.now(UTC)
@@ -259,6 +276,19 @@ class TestService:
             logger.error(f"Failed to update test status: {str(e)}")
             raise
     
+    @log
+    async def update_tests_status_to_completed(self, test_ids: List[str]) -> int:
+        """
+        Update the status of several tests to completed in one write.
+        
+        Args:
+            test_ids: Test IDs
+            
+        Returns:
+            int: Number of updated tests
+        """
+        return await self.repository.bulk_update_status(test_ids, TestStatus.COMPLETED)
+    
     @log
     async def get_paginated_tests(self, page: int = 1, page_size: int = 10) -> Tuple[List[TestResponse], PaginationMetadata]:
         """
@@ -303,6 +333,7 @@ class TestService:
             question_ids=test.question_ids,
             examination_points=test.examination_points,
             test_time=test.test_time,
+            model_routes=test.model_routes or None,
             create_date=test.create_date,
             start_date=test.start_date,
             expire_date=test.expire_date,
@@ -1,13 +1,20 @@
 import uuid
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, UTC
 from api.model.db.test_result import TestResult
-from api.model.api.test_result import TestResultResponse, CreateTestResultRequest
+from api.model.api.test_result import TestResultResponse, CreateTestResultRequest, LLMUsageReport, ScoreStatsReport, \
+    QAEntryResponse
+from api.model.api.base import PaginationMetadata
+from api.model.db.test_result_stats import TestResultStats
 from api.repositories.test_result_repository import TestResultRepository
+from api.repositories.qa_entry_repository import QAEntryRepository, qa_entry_fields
+from api.repositories.test_result_stats_repository import TestResultStatsRepository, stats_increments
+from api.repositories.score_sketch_repository import ScoreSketchRepository
 from api.repositories.test_repository import TestRepository
 from api.repositories.user_repository import UserRepository
 from api.utils.log_decorator import log
 from api.exceptions.api_error import NotFoundError, ValidationError
+from agent.interview_stats import MAX_INTERVIEW_SCORE
 from loguru import logger
 
 class TestResultService:
@@ -16,6 +23,9 @@ class TestResultService:
     def __init__(self):
         """Initialize Test Result Service"""
         self.repository = TestResultRepository()
+        self.qa_entry_repository = QAEntryRepository()
+        self.stats_repository = TestResultStatsRepository()
+        self.sketch_repository = ScoreSketchRepository()
         self.test_repository = TestRepository()
         self.user_repository = UserRepository()
     
@@ -32,9 +42,12 @@ class TestResultService:
         """        
         # Check if the result for the test already exists
         existing_result = await self.repository.get_result_by_test_id(request.test_id)        
+        # the difficulty and language of the score statistics
+        test = await self.test_repository.get_test_by_id(request.test_id)
         if existing_result:
             # If the result exists, update it
             logger.info(f"Test result already exists, updating: {existing_result.test_id}")
+            previous = self._stats_values(existing_result)
             
             # Update fields
             existing_result.summary = request.summary
@@ -42,13 +55,20 @@ class TestResultService:
             existing_result.question_number = request.question_number
             existing_result.correct_number = request.correct_number
             existing_result.elapse_time = request.elapse_time
-            existing_result.qa_history = request.qa_history
+            # the history is in the ai_qa_entry collection, a history embedded by a previous version is removed
+            existing_result.qa_history = []
+            if request.job_id:
+                existing_result.job_id = request.job_id
+            if request.llm_usage is not None:
+                existing_result.llm_usage = request.llm_usage
             
             # Save the update
+            await self.qa_entry_repository.replace_entries({request.test_id: request.qa_history})
             updated_result = await self.repository.create_result(existing_result)
             logger.info(f"Test result update completed: {existing_result.test_id}")
+            await self._update_stats(test, previous, self._stats_values(updated_result))
             
-            return self._to_response(updated_result)
+            return await self._to_saved_response(updated_result, request)
         else:
             # If the result does not exist, create a new one
             test_result = TestResult(
@@ -59,15 +79,54 @@ class TestResultService:
                 question_number=request.question_number,
                 correct_number=request.correct_number,
                 elapse_time=request.elapse_time,
-                qa_history=request.qa_history
+                job_id=request.job_id,
+                llm_usage=request.llm_usage
             )
             
             # Save to the database
+            await self.qa_entry_repository.replace_entries({request.test_id: request.qa_history})
             created_result = await self.repository.create_result(test_result)
             logger.info(f"Created new test result: {request.test_id}")
+            await self._update_stats(test, None, self._stats_values(created_result))
+            
+            return await self._to_saved_response(created_result, request)
+
+
+    @log
+    async def complete_test_results(self, requests: List[CreateTestResultRequest]) -> int:
+        """
+        Create or update several test results in one batched write
+        
+        Args:
+            requests: Create test result requests
             
-            return self._to_response(created_result)
+        Returns:
+            int: Number of created or updated results
+        """
+        test_ids = [r.test_id for r in requests]
+        # the job, difficulty and language of the test, for the per-job reports and score statistics
+        keys = await self.test_repository.get_stats_keys(test_ids)
+        previous = await self.repository.get_stats_values(test_ids)
+        results = []
+        histories = {}
+        for request in requests:
+            result = request.model_dump(exclude_none=True)
+            histories[request.test_id] = result.pop("qa_history")
+            if not request.job_id and request.test_id in keys:
+                result["job_id"] = keys[request.test_id].get("job_id")
+            results.append(result)
+        await self.qa_entry_repository.replace_entries(histories)
+        count = await self.repository.bulk_upsert_results(results)
+        logger.info(f"Completed {count} test results")
 
+        changes = []
+        for result in results:
+            test = keys.get(result["test_id"], {})
+            if result["test_id"] in previous:
+                changes.append(self._stats_change(test, previous[result["test_id"]], sign=-1))
+            changes.append(self._stats_change(test, result))
+        await self._apply_stats(changes)
+        return count
 
     @log
     async def create_test_result(self, request: CreateTestResultRequest) -> TestResultResponse:
@@ -93,12 +152,16 @@ class TestResultService:
         if not user:
             raise NotFoundError(f"User does not exist: {request.user_id}")
         
+        if not request.job_id:
+            request.job_id = test.job_id
+        
         # Check if the result for the test already exists
         existing_result = await self.repository.get_result_by_test_id(request.test_id)
         
         # Validate data
-        if request.score < 0 or request.score > 100:
-            raise ValidationError("Score must be between 0 and 100")
+        # the interview scale of the workflow results, the score statistics are bucketed on it
+        if request.score < 0 or request.score > MAX_INTERVIEW_SCORE:
+            raise ValidationError(f"Score must be between 0 and {MAX_INTERVIEW_SCORE}")
         
         if request.question_number < 0:
             raise ValidationError("Number of questions cannot be negative")
@@ -115,6 +178,7 @@ class TestResultService:
         if existing_result:
             # If the result exists, update it
             logger.info(f"Test result already exists, updating: {existing_result.test_id}")
+            previous = self._stats_values(existing_result)
             
             # Update fields
             existing_result.summary = request.summary
@@ -122,13 +186,20 @@ class TestResultService:
             existing_result.question_number = request.question_number
             existing_result.correct_number = request.correct_number
             existing_result.elapse_time = request.elapse_time
-            existing_result.qa_history = request.qa_history
+            # the history is in the ai_qa_entry collection, a history embedded by a previous version is removed
+            existing_result.qa_history = []
+            if request.job_id:
+                existing_result.job_id = request.job_id
+            if request.llm_usage is not None:
+                existing_result.llm_usage = request.llm_usage
             
             # Save the update
+            await self.qa_entry_repository.replace_entries({request.test_id: request.qa_history})
             updated_result = await self.repository.create_result(existing_result)
             logger.info(f"Test result update completed: {existing_result.test_id}")
+            await self._update_stats(test, previous, self._stats_values(updated_result))
             
-            return self._to_response(updated_result)
+            return await self._to_saved_response(updated_result, request)
         else:
             # If the result does not exist, create a new one
             test_result = TestResult(
@@ -139,14 +210,17 @@ class TestResultService:
                 question_number=request.question_number,
                 correct_number=request.correct_number,
                 elapse_time=request.elapse_time,
-                qa_history=request.qa_history
+                job_id=request.job_id,
+                llm_usage=request.llm_usage
             )
             
             # Save to the database
+            await self.qa_entry_repository.replace_entries({request.test_id: request.qa_history})
             created_result = await self.repository.create_result(test_result)
             logger.info(f"Created new test result: {request.test_id}")
+            await self._update_stats(test, None, self._stats_values(created_result))
             
-            return self._to_response(created_result)
+            return await self._to_saved_response(created_result, request)
     
     @log
     async def get_test_result_by_test_id(self, test_id: str) -> TestResultResponse:
@@ -166,7 +240,7 @@ class TestResultService:
         if not test_result:
             raise NotFoundError(f"No result found for the test: {test_id}")
         
-        return self._to_response(test_result)
+        return (await self._to_responses([test_result]))[0]
     
     @log
     async def get_test_results_by_user_id(self, user_id: str) -> List[TestResultResponse]:
@@ -180,14 +254,260 @@ class TestResultService:
             List[TestResultResponse]: List of test result responses
         """
         test_results = await self.repository.get_results_by_user_id(user_id)
-        return [self._to_response(result) for result in test_results]
+        return await self._to_responses(list(test_results))
+    
+    @log
+    async def get_qa_history(self, test_id: str, page: int = 1,
+                             page_size: int = 20) -> Tuple[List[QAEntryResponse], PaginationMetadata]:
+        """
+        Get one page of the Q&A history of a test result
+        
+        Args:
+            test_id: Test ID
+            page: Page number (1-based)
+            page_size: Number of entries per page
+            
+        Returns:
+            Tuple of (list of Q&A entry responses, pagination metadata)
+            
+        Raises:
+            NotFoundError: If the test result does not exist
+        """
+        entries, total_count = await self.qa_entry_repository.get_entries(test_id, (page - 1) * page_size, page_size)
+        if entries or total_count:
+            responses = [QAEntryResponse(**entry.to_mongo().to_dict()) for entry in entries]
+        else:
+            # no entry: an empty history, a result not migrated yet, or no result
+            if not await self.repository.get_result_by_test_id(test_id):
+                raise NotFoundError(f"No result found for the test: {test_id}")
+            qa_history = await self.repository.get_embedded_qa_history(test_id)
+            total_count = len(qa_history)
+            start = (page - 1) * page_size
+            responses = [QAEntryResponse(**qa_entry_fields(test_id, index, qa))
+                         for index, qa in enumerate(qa_history[start:start + page_size], start)]
+        
+        total_pages = (total_count + page_size - 1) // page_size  # Ceiling division
+        metadata = PaginationMetadata(
+            total_count=total_count,
+            page_size=page_size,
+            current_page=page,
+            total_pages=total_pages,
+            has_next=page < total_pages,
+            has_previous=page > 1
+        )
+        return responses, metadata
+    
+    @log
+    async def get_usage_by_job(self, job_id: Optional[str] = None) -> List[LLMUsageReport]:
+        """
+        Get the LLM usage of the test results by job
+        
+        Args:
+            job_id: Only this job if given
+            
+        Returns:
+            List[LLMUsageReport]: One usage report per job
+        """
+        totals = await self.repository.aggregate_usage_by_job(job_id)
+        return [self._to_usage_report(total, key=total["_id"]) for total in totals]
+    
+    @log
+    async def get_usage_by_model(self, job_id: Optional[str] = None) -> List[LLMUsageReport]:
+        """
+        Get the LLM usage of the test results by model and workflow node
+        
+        Args:
+            job_id: Only the tests of this job if given
+            
+        Returns:
+            List[LLMUsageReport]: One usage report per model and node
+        """
+        totals = await self.repository.aggregate_usage_by_model(job_id)
+        return [self._to_usage_report(total, key=total["_id"].get("model"), node=total["_id"].get("node"))
+                for total in totals]
+    
+    @log
+    async def get_score_stats(self, job_id: str, difficulty: Optional[str] = None,
+                              language: Optional[str] = None) -> List[ScoreStatsReport]:
+        """
+        Get the score statistics of a job from the rollup collection
+        
+        Args:
+            job_id: Job ID
+            difficulty: Only this difficulty if given
+            language: Only this language if given
+            
+        Returns:
+            List[ScoreStatsReport]: One report per difficulty and language
+        """
+        stats = await self.stats_repository.get_stats(job_id, difficulty, language)
+        return [self._to_stats_report(s) for s in stats if s.count > 0]
+    
+    @staticmethod
+    def _stats_values(test_result: TestResult) -> Dict[str, Any]:
+        """Fields of a test result counted in the score statistics"""
+        return {
+            "job_id": test_result.job_id,
+            "score": test_result.score,
+            "question_number": test_result.question_number,
+            "correct_number": test_result.correct_number,
+            "elapse_time": test_result.elapse_time
+        }
+    
+    @staticmethod
+    def _stats_change(test: Dict[str, Any], values: Dict[str, Any], sign: int = 1) -> tuple:
+        """Rollup key, values and sign (1 added, -1 removed) of a test result"""
+        key = {
+            "job_id": values.get("job_id") or test.get("job_id"),
+            "difficulty": test.get("difficulty"),
+            "language": test.get("language")
+        }
+        return key, values, sign
+    
+    async def _update_stats(self, test, previous: Optional[Dict[str, Any]], values: Dict[str, Any]) -> None:
+        """
+        Replace the previous values of a test result by the new ones in the score statistics
+        
+        Args:
+            test: Test document of the result, None if unknown
+            previous: Previous values of an updated result, None for a new result
+            values: New values of the result
+        """
+        test_key = {"job_id": test.job_id, "difficulty": test.difficulty, "language": test.language} if test else {}
+        changes = [self._stats_change(test_key, previous, sign=-1)] if previous else []
+        changes.append(self._stats_change(test_key, values))
+        await self._apply_stats(changes)
+    
+    async def _apply_stats(self, changes: List[tuple]) -> None:
+        """
+        Apply result changes to the score statistics and the score sketches
+        
+        The result is already saved: a failure is logged and repaired by the rebuild scripts
+        
+        Args:
+            changes: (key, values, sign) of the results, see _stats_change
+        """
+        try:
+            await self.stats_repository.apply_increments([
+                (key, stats_increments(values["score"], values["question_number"], values["correct_number"],
+                                       values["elapse_time"], sign))
+                for key, values, sign in changes
+            ])
+        except Exception as e:
+            logger.error(f"Failed to update the score statistics, run api.scripts.backfill_result_stats: {e}")
+        
+        # (added, removed) scores by job and difficulty, the unchanged score of an updated result is left alone
+        scores: Dict[tuple, tuple] = {}
+        for key, values, sign in changes:
+            added, removed = scores.setdefault((key["job_id"], key["difficulty"]), ([], []))
+            if sign < 0:
+                removed.append(values["score"])
+            elif values["score"] in removed:
+                removed.remove(values["score"])
+            else:
+                added.append(values["score"])
+        try:
+            await self.sketch_repository.add_scores({key: change for key, change in scores.items() if any(change)})
+        except Exception as e:
+            logger.error(f"Failed to update the score sketches, run api.scripts.rebuild_score_sketches: {e}")
+    
+    async def _to_responses(self, test_results: List[TestResult]) -> List[TestResultResponse]:
+        """
+        Convert TestResult documents to TestResultResponse with their percentile rank
+        
+        The rank is read from the score sketch of the job and difficulty of each result,
+        it is left out if the sketches can't be read
+        
+        Args:
+            test_results: Test result documents
+            
+        Returns:
+            List[TestResultResponse]: Test result responses
+        """
+        ranks: Dict[str, float] = {}
+        try:
+            tests = await self.test_repository.get_stats_keys([r.test_id for r in test_results])
+            keys = {r.test_id: (r.job_id or tests.get(r.test_id, {}).get("job_id"),
+                                tests.get(r.test_id, {}).get("difficulty"))
+                    for r in test_results}
+            digests = await self.sketch_repository.get_digests(list(keys.values()))
+            for result in test_results:
+                digest = digests.get(keys[result.test_id])
+                rank = digest.cdf(result.score) if digest else None
+                if rank is not None:
+                    ranks[result.test_id] = round(rank * 100, 1)
+        except Exception as e:
+            logger.error(f"Failed to read the score sketches: {e}")
+        return [self._to_response(result, ranks.get(result.test_id)) for result in test_results]
+    
+    async def _to_saved_response(self, test_result: TestResult, request: CreateTestResultRequest) -> TestResultResponse:
+        """Response of a created or updated test result, the saved Q&A history is returned as sent"""
+        response = (await self._to_responses([test_result]))[0]
+        response.qa_history = request.qa_history
+        return response
+    
+    def _to_stats_report(self, stats: TestResultStats) -> ScoreStatsReport:
+        """
+        Convert a rollup document to ScoreStatsReport
+        
+        Args:
+            stats: Rollup document
+            
+        Returns:
+            ScoreStatsReport: Score statistics report
+        """
+        mean_score = stats.score_sum / stats.count
+        mean_elapse_time = stats.elapse_time_sum / stats.count
+        return ScoreStatsReport(
+            job_id=stats.job_id,
+            difficulty=stats.difficulty,
+            language=stats.language,
+            count=stats.count,
+            mean_score=round(mean_score, 2),
+            # population variance, clamped against the rounding of the sums
+            score_variance=round(max(0.0, stats.score_sq_sum / stats.count - mean_score ** 2), 2),
+            correct_ratio=round(stats.correct_sum / stats.question_sum, 4) if stats.question_sum else 0,
+            score_histogram={k: v for k, v in (stats.score_histogram or {}).items() if v > 0},
+            mean_elapse_time=round(mean_elapse_time, 2),
+            elapse_time_variance=round(max(0.0, stats.elapse_time_sq_sum / stats.count - mean_elapse_time ** 2), 2),
+            elapse_time_histogram={k: v for k, v in (stats.elapse_time_histogram or {}).items() if v > 0}
+        )
+    
+    def _to_usage_report(self, total: Dict[str, Any], key: Optional[str], node: Optional[str] = None) -> LLMUsageReport:
+        """
+        Convert an aggregated usage total to LLMUsageReport
+        
+        Args:
+            total: Aggregated usage total
+            key: Job ID or model
+            node: Workflow node
+            
+        Returns:
+            LLMUsageReport: Usage report
+        """
+        tests = total.get("tests", 0)
+        tokens = total.get("input_tokens", 0) + total.get("output_tokens", 0)
+        return LLMUsageReport(
+            key=key,
+            node=node,
+            tests=tests,
+            calls=total.get("calls", 0),
+            input_tokens=total.get("input_tokens", 0),
+            output_tokens=total.get("output_tokens", 0),
+            cached_tokens=total.get("cached_tokens", 0),
+            latency=round(total.get("latency", 0), 3),
+            wall_time=round(total.get("wall_time", 0), 3),
+            avg_tokens_per_test=round(tokens / tests, 1) if tests else 0,
+            avg_wall_time_per_test=round(total.get("wall_time", 0) / tests, 3) if tests else 0
+        )
     
-    def _to_response(self, test_result: TestResult) -> TestResultResponse:
+    def _to_response(self, test_result: TestResult, percentile_rank: Optional[float] = None) -> TestResultResponse:
         """
         Convert TestResult document to TestResultResponse
         
         Args:
             test_result: Test result document
+            percentile_rank: Percentile rank of the score in its job and difficulty
             
         Returns:
             TestResultResponse: Test result response
@@ -200,5 +520,7 @@ class TestResultService:
             question_number=test_result.question_number,
             correct_number=test_result.correct_number,
             elapse_time=test_result.elapse_time,
-            qa_history=test_result.qa_history
+            job_id=test_result.job_id,
+            llm_usage=test_result.llm_usage or None,
+            percentile_rank=percentile_rank
         )
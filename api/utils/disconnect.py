@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable
+from fastapi import Request
+from utils.metrics import metrics
+
+client_disconnects = metrics.counter("client_disconnects_total", "Requests cancelled because the client disconnected, by path")
+
+
+class ClientDisconnectedError(Exception):
+    """The client disconnected before the response was ready"""
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[Any], poll_interval: float = 0.5) -> Any:
+    """
+    Await the request work, cancel it as soon as the client disconnects
+
+    Args:
+        request: The HTTP request
+        awaitable: The request work, e.g. a service call
+        poll_interval: Seconds between two disconnect checks
+
+    Returns:
+        Any: Result of the work
+
+    Raises:
+        ClientDisconnectedError: If the client disconnected, the work is cancelled
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                client_disconnects.inc(path=request.url.path)
+                task.cancel()
+                # the work stops at its next cancellation point
+                await asyncio.gather(task, return_exceptions=True)
+                raise ClientDisconnectedError(f"Client disconnected from {request.url.path}")
+    finally:
+        if not task.done():
+            # this request itself is cancelled (e.g. server shutdown)
+            task.cancel()
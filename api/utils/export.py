@@ -0,0 +1,146 @@
+import csv
+import io
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Sequence
+import orjson
+from loguru import logger
+from utils.metrics import metrics
+
+# Export formats and their media types
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+# Encoded rows are sent in chunks of about this size (bytes)
+CHUNK_SIZE = 64 * 1024
+
+export_rows_total = metrics.counter("export_rows_total", "Rows written by the streaming exports, by kind and format")
+export_seconds = metrics.histogram("export_seconds", "Duration of the streaming exports, by kind",
+                                   buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900))
+
+
+def _csv_value(value: Any) -> Any:
+    """CSV cell of a value, the nested values as JSON"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value, default=str).decode()
+    return value
+
+
+def encode_ndjson(rows: Iterable[Dict[str, Any]], fields: Sequence[str]) -> Iterator[bytes]:
+    """
+    Encode rows as NDJSON, one JSON object per line
+
+    Args:
+      rows: The rows
+      fields: The exported fields, in order, missing values are null
+
+    Returns:
+      Iterator of chunks of about CHUNK_SIZE bytes
+    """
+    chunk = bytearray()
+    for row in rows:
+        chunk += orjson.dumps({field: row.get(field) for field in fields}, default=str,
+                              option=orjson.OPT_APPEND_NEWLINE)
+        if len(chunk) >= CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+def encode_csv(rows: Iterable[Dict[str, Any]], fields: Sequence[str]) -> Iterator[bytes]:
+    """
+    Encode rows as CSV with a header line
+
+    Args:
+      rows: The rows
+      fields: The exported fields, in order, missing values are empty
+
+    Returns:
+      Iterator of chunks of about CHUNK_SIZE bytes
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_csv_value(row.get(field)) for field in fields])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+ENCODERS = {
+    "ndjson": encode_ndjson,
+    "csv": encode_csv
+}
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Compress a stream of chunks as one gzip member
+
+    Args:
+      chunks: The uncompressed chunks
+      level: Compression level (1 fastest - 9 smallest)
+
+    Returns:
+      Iterator of the compressed chunks
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def measure_rows(rows: Iterable[Dict[str, Any]], kind: str, export_format: str) -> Iterator[Dict[str, Any]]:
+    """
+    Pass the rows through, then record the row count and the throughput of the export
+
+    Args:
+      rows: The exported rows
+      kind: The exported collection, e.g. 'tests'
+      export_format: The export format, e.g. 'csv'
+    """
+    start = time.perf_counter()
+    count = 0
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    finally:
+        elapsed = time.perf_counter() - start
+        export_rows_total.inc(count, kind=kind, format=export_format)
+        export_seconds.observe(elapsed, kind=kind)
+        logger.info(f"Exported {count} {kind} as {export_format} in {elapsed:.2f}s "
+                    f"({count / elapsed if elapsed > 0 else 0:.0f} rows/s)")
+
+
+def export_stream(rows: Iterable[Dict[str, Any]], fields: Sequence[str], kind: str, export_format: str,
+                  compress: bool = False) -> Iterator[bytes]:
+    """
+    Encode rows incrementally, the memory doesn't grow with the number of rows
+
+    Args:
+      rows: The rows, e.g. a database cursor
+      fields: The exported fields, in order
+      kind: The exported collection, for the metrics
+      export_format: ndjson or csv
+      compress: Gzip the stream
+
+    Returns:
+      Iterator of the encoded chunks
+    """
+    chunks = ENCODERS[export_format](measure_rows(rows, kind, export_format), fields)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,116 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from utils.metrics import metrics
+
+coalesced_calls = metrics.counter("single_flight_coalesced_total", "Duplicate calls served from an in-flight or completed call")
+
+
+class SingleFlight:
+    """
+    Serialize calls per key (e.g. per interview thread) and coalesce duplicates
+
+    Calls with the same key run one at a time. A call with the same (key, call_key)
+    as one in flight attaches to its result instead of running again, and the last
+    completed result of each key is kept so a late retry gets the same response.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._last_results: OrderedDict[str, Tuple[str, Any]] = OrderedDict()
+
+    async def do(self, key: str, call_key: str, fn: Callable[[], Awaitable[Any]], cache: bool = True) -> Any:
+        """
+        Run fn under the lock of key, or share the result of the same call
+
+        Args:
+            key: Serialization key, e.g. test ID
+            call_key: Call identity within the key, e.g. question ID
+            fn: Coroutine function to run
+            cache: Keep the result for late duplicates
+
+        Returns:
+            Any: Result of fn
+        """
+        last = self._last_results.get(key)
+        if cache and last and last[0] == call_key:
+            coalesced_calls.inc()
+            return last[1]
+
+        flight_key = (key, call_key)
+        future = self._in_flight.get(flight_key)
+        if future is not None:
+            coalesced_calls.inc()
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    # this caller is cancelled
+                    raise
+                # the call was cancelled (its client went away), run it for this caller
+                return await self.do(key, call_key, fn, cache)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[flight_key] = future
+        try:
+            async with self._acquire(key):
+                result = await fn()
+            if cache:
+                self._remember(key, call_key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved, waiters (if any) get it through the shield
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(flight_key, None)
+
+    def forget(self, key: str) -> None:
+        """Drop the cached result of a key, e.g. when its session is reclaimed"""
+        self._last_results.pop(key, None)
+
+    def _remember(self, key: str, call_key: str, result: Any) -> None:
+        self._last_results[key] = (call_key, result)
+        self._last_results.move_to_end(key)
+        while len(self._last_results) > self.max_keys:
+            self._last_results.popitem(last=False)
+
+    def _acquire(self, key: str) -> "_KeyLock":
+        return _KeyLock(self, key)
+
+
+class _KeyLock:
+    """Per-key lock that is dropped once nobody uses it"""
+
+    def __init__(self, owner: SingleFlight, key: str):
+        self.owner = owner
+        self.key = key
+
+    async def __aenter__(self):
+        owner = self.owner
+        self.lock = owner._locks.setdefault(self.key, asyncio.Lock())
+        owner._lock_users[self.key] = owner._lock_users.get(self.key, 0) + 1
+        try:
+            await self.lock.acquire()
+        except BaseException:
+            self._release_user()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.lock.release()
+        self._release_user()
+
+    def _release_user(self):
+        owner = self.owner
+        owner._lock_users[self.key] -= 1
+        if owner._lock_users[self.key] == 0:
+            del owner._lock_users[self.key]
+            owner._locks.pop(self.key, None)
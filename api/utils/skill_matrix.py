@@ -0,0 +1,144 @@
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+
+@dataclass
+class SkillColumns:
+    """Answers of a set of test results in columnar form, one row per answered question"""
+    # index of the result of the answer in result_ids
+    result_index: np.ndarray
+    # index of the knowledge point of the answer in skills
+    skill_index: np.ndarray
+    score: np.ndarray
+    correct: np.ndarray
+    # per result: test id, user id and create date (POSIX timestamp, NaN if unknown)
+    result_ids: List[str]
+    user_ids: List[str]
+    create_dates: np.ndarray
+    skills: List[str]
+
+    @property
+    def size(self) -> int:
+        return len(self.score)
+
+
+class SkillColumnsBuilder:
+    """
+    Build SkillColumns result by result while the results are streamed
+
+    The answers are appended to typed arrays, the memory grows with the number of
+    answers (13 bytes each), not with the size of the result documents.
+    """
+
+    def __init__(self):
+        self._result = array("i")
+        self._skill = array("i")
+        self._score = array("f")
+        self._correct = array("b")
+        self._create_dates = array("d")
+        self._skills: Dict[str, int] = {}
+        self.result_ids: List[str] = []
+        self.user_ids: List[str] = []
+
+    def add_result(self, result_id: str, user_id: str, create_date: float | None,
+                   answers: Iterable[Tuple[str, str, float, bool]]) -> None:
+        """
+        Append the answers of one result
+
+        Args:
+            result_id: Test ID
+            user_id: User ID
+            create_date: Create date of the result (POSIX timestamp), None if unknown
+            answers: (question, knowledge point, score, is correct), repeated answers of a question
+                (follow-ups, retries) are merged and the last one counts
+        """
+        last: Dict[str, Tuple[str, float, bool]] = {}
+        for question, skill, score, correct in answers:
+            if skill:
+                last[question] = (skill, score, correct)
+        index = len(self.result_ids)
+        self.result_ids.append(result_id)
+        self.user_ids.append(user_id)
+        self._create_dates.append(create_date if create_date is not None else np.nan)
+        for skill, score, correct in last.values():
+            self._result.append(index)
+            self._skill.append(self._skills.setdefault(skill, len(self._skills)))
+            self._score.append(score)
+            self._correct.append(bool(correct))
+
+    def build(self) -> SkillColumns:
+        return SkillColumns(result_index=np.frombuffer(self._result, dtype=np.int32),
+                            skill_index=np.frombuffer(self._skill, dtype=np.int32),
+                            score=np.frombuffer(self._score, dtype=np.float32),
+                            correct=np.frombuffer(self._correct, dtype=np.int8).astype(bool),
+                            result_ids=self.result_ids,
+                            user_ids=self.user_ids,
+                            create_dates=np.frombuffer(self._create_dates, dtype=np.float64),
+                            skills=list(self._skills))
+
+
+def skill_matrices(columns: SkillColumns, row_index: np.ndarray, rows: int) -> Dict[str, np.ndarray]:
+    """
+    Count, correct ratio and mean score of every (row, knowledge point) cell in one pass
+
+    Args:
+        columns: The answers
+        row_index: Row of each answer, e.g. the week or the candidate of its result
+        rows: Number of rows
+
+    Returns:
+        Dict[str, np.ndarray]: count, correct_ratio and mean_score matrices (rows x knowledge points),
+        NaN ratios and scores for the empty cells
+    """
+    skills = len(columns.skills)
+    cells = row_index.astype(np.int64) * skills + columns.skill_index
+    shape = (rows, skills)
+    count = np.bincount(cells, minlength=rows * skills).reshape(shape)
+    correct = np.bincount(cells, weights=columns.correct, minlength=rows * skills).reshape(shape)
+    score = np.bincount(cells, weights=columns.score, minlength=rows * skills).reshape(shape)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "count": count,
+            "correct_ratio": np.where(count > 0, correct / count, np.nan),
+            "mean_score": np.where(count > 0, score / count, np.nan)
+        }
+
+
+def rank_weak_skills(columns: SkillColumns, min_count: int = 5, prior: float = 10) -> List[Dict]:
+    """
+    Rank the knowledge points from the weakest
+
+    The correct ratios are smoothed towards the overall ratio with prior pseudo-answers,
+    so that a knowledge point asked twice doesn't top the ranking by chance.
+
+    Args:
+        columns: The answers
+        min_count: Knowledge points with fewer answers are left out
+        prior: Weight of the overall correct ratio in the smoothed ratio
+
+    Returns:
+        List[Dict]: knowledge_point, count, correct_ratio, smoothed_correct_ratio and mean_score,
+        lowest smoothed correct ratio first
+    """
+    if columns.size == 0:
+        return []
+    totals = skill_matrices(columns, np.zeros(columns.size, dtype=np.int32), 1)
+    count = totals["count"][0]
+    correct_ratio = totals["correct_ratio"][0]
+    overall = columns.correct.mean()
+    smoothed = (np.nan_to_num(correct_ratio) * count + prior * overall) / (count + prior)
+
+    ranking = []
+    for i in np.argsort(smoothed, kind="stable"):
+        if count[i] < min_count:
+            continue
+        ranking.append({
+            "knowledge_point": columns.skills[i],
+            "count": int(count[i]),
+            "correct_ratio": float(correct_ratio[i]),
+            "smoothed_correct_ratio": float(smoothed[i]),
+            "mean_score": float(totals["mean_score"][0][i])
+        })
+    return ranking
@@ -0,0 +1,153 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Tuple
+
+
+class TDigest:
+    """
+    Merging t-digest, a mergeable quantile sketch
+
+    Values are buffered and merged into at most ~compression centroids, sized by the
+    k1 scale function so that the centroids near the tails stay small. Ranks are exact
+    for repeated values kept in their own centroid (e.g. integer scores), and within
+    about 1/compression of the true rank otherwise.
+
+    Args:
+        compression: Accuracy / size trade-off, the number of centroids is bounded by ~compression
+    """
+
+    def __init__(self, compression: float = 100):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: List[Tuple[float, float]] = []
+
+    @property
+    def count(self) -> float:
+        return sum(self.weights) + sum(w for _, w in self._buffer)
+
+    def add(self, value: float, weight: float = 1) -> None:
+        """Add a value, or weight occurrences of it"""
+        self._buffer.append((float(value), float(weight)))
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) > 5 * self.compression:
+            self._compress()
+
+    def update(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def remove(self, value: float) -> None:
+        """Remove one occurrence of a value, from the centroid closest to it (approximate)"""
+        self._compress()
+        if not self.means:
+            return
+        i = bisect_left(self.means, value)
+        if i == len(self.means) or (i > 0 and value - self.means[i - 1] <= self.means[i] - value):
+            i -= 1
+        self.weights[i] -= 1
+        if self.weights[i] <= 0:
+            del self.means[i]
+            del self.weights[i]
+        if not self.means:
+            self.min, self.max = math.inf, -math.inf
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Merge another digest into this one"""
+        other._compress()
+        self._buffer.extend(zip(other.means, other.weights))
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+
+        means, weights = [items[0][0]], [items[0][1]]
+        # weight of the centroids before the current one
+        cumulative = 0.0
+        k_left = self._k(0)
+        for mean, weight in items[1:]:
+            # equal values always share a centroid, they keep an exact rank
+            if mean == means[-1] or \
+                    self._k((cumulative + weights[-1] + weight) / total) - k_left <= 1:
+                weights[-1] += weight
+                means[-1] += (mean - means[-1]) * weight / weights[-1]
+            else:
+                cumulative += weights[-1]
+                k_left = self._k(cumulative / total)
+                means.append(mean)
+                weights.append(weight)
+
+        self.means, self.weights = means, weights
+
+    def cdf(self, value: float) -> float | None:
+        """
+        Fraction of the values lower than value, values equal to it count half
+
+        Args:
+            value: The value to rank
+
+        Returns:
+            The mid-rank in [0, 1], None if the digest is empty
+        """
+        self._compress()
+        if not self.means:
+            return None
+        total = sum(self.weights)
+        if value < self.min:
+            return 0.0
+        if value > self.max:
+            return 1.0
+
+        lo, hi = bisect_left(self.means, value), bisect_right(self.means, value)
+        below = sum(self.weights[:lo])
+        if lo < hi:
+            # centroids at exactly this value
+            return (below + sum(self.weights[lo:hi]) / 2) / total
+
+        # interpolate between the centers of the neighbouring centroids (or the min / max),
+        # half of the weight of a centroid is below its mean
+        if lo == 0:
+            left_x, left_rank = self.min, 0.0
+        else:
+            left_x, left_rank = self.means[lo - 1], below - self.weights[lo - 1] / 2
+        if lo == len(self.means):
+            right_x, right_rank = self.max, total
+        else:
+            right_x, right_rank = self.means[lo], below + self.weights[lo] / 2
+        if right_x == left_x:
+            return (left_rank + right_rank) / 2 / total
+        return (left_rank + (right_rank - left_rank) * (value - left_x) / (right_x - left_x)) / total
+
+    def to_bytes(self) -> bytes:
+        """Compact serialization: min, max, then the (mean, weight) pairs as doubles"""
+        self._compress()
+        values = array("d", [self.min, self.max])
+        for mean, weight in zip(self.means, self.weights):
+            values.append(mean)
+            values.append(weight)
+        return values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes | None, compression: float = 100) -> "TDigest":
+        digest = cls(compression)
+        if data:
+            values = array("d")
+            values.frombytes(data)
+            digest.min, digest.max = values[0], values[1]
+            digest.means = list(values[2::2])
+            digest.weights = list(values[3::2])
+        return digest
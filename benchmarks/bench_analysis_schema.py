@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import statistics
+import time
+from typing import Dict, List
+from agent.qa_analyzer import run_analysis
+from utils.llm import ModelRoute
+from utils.log_utils import logger
+
+
+# Benchmark the compact AnswerAnalysis schema against the full QAResult schema
+# python benchmarks/bench_analysis_schema.py --runs 5 --model gpt-4o
+
+CASES = [
+    ("Q2. What is the capital of France?", "adfadsfdasf"),
+    ("Q2. What is the capital of France?\nA. Paris\nB. London\nC. Rome\nD. Madrid", "A"),
+    ("Q3. Which hook should be used to run a side effect after render in React?\n"
+     "A. useMemo\n\nB. useEffect\n\nC. useRef\n\nD. useContext",
+     "B, useEffect runs after the render is committed, e.g. to fetch data or subscribe to events"),
+    ("Q4. Explain the difference between `let` and `var` in JavaScript.", "scope"),
+]
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def bench_schema(compact: bool, runs: int, model_name: str, language: str) -> Dict[str, float]:
+    latencies: List[float] = []
+    output_tokens: List[int] = []
+    for _ in range(runs):
+        for question, answer in CASES:
+            start = time.perf_counter()
+            _, raw = run_analysis(answer, question, language, ModelRoute(model=model_name), compact=compact, elapsed_time=1.5)
+            latencies.append(time.perf_counter() - start)
+            usage = raw.usage_metadata or {}
+            output_tokens.append(usage.get("output_tokens", 0))
+
+    return {
+        "calls": len(latencies),
+        "output_tokens_mean": statistics.mean(output_tokens),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_mean": statistics.mean(latencies),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare output tokens and latency of the analysis schemas")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--language", default="English")
+    args = parser.parse_args()
+
+    results = {
+        "full (QAResult)": bench_schema(False, args.runs, args.model, args.language),
+        "compact (AnswerAnalysis)": bench_schema(True, args.runs, args.model, args.language),
+    }
+
+    print(f"{'schema':<26}{'calls':>7}{'out tokens':>12}{'p50 (s)':>10}{'p95 (s)':>10}{'mean (s)':>10}")
+    for name, r in results.items():
+        print(f"{name:<26}{r['calls']:>7}{r['output_tokens_mean']:>12.1f}"
+              f"{r['latency_p50']:>10.2f}{r['latency_p95']:>10.2f}{r['latency_mean']:>10.2f}")
+
+    full, compact = results["full (QAResult)"], results["compact (AnswerAnalysis)"]
+    if full["output_tokens_mean"]:
+        logger.info(f"Output tokens saved: {1 - compact['output_tokens_mean'] / full['output_tokens_mean']:.0%}, "
+                    f"mean latency saved: {1 - compact['latency_mean'] / full['latency_mean']:.0%}")
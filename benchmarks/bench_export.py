@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, UTC
+from api.utils.export import export_stream
+from api.service.export import RESULT_EXPORT_FIELDS
+from utils.log_utils import logger
+
+
+# Measure the throughput (rows/s) and the peak memory of the streaming export encoders on
+# synthetic test results, without the database. The peak memory should not grow with --rows.
+# python benchmarks/bench_export.py --rows 200000 --format csv --gzip [--memory]
+
+def make_rows(rows: int):
+    rng = random.Random(0)
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    for i in range(rows):
+        yield {"test_id": f"test-{i}", "user_id": f"user-{i % 5000}", "job_id": f"job-{i % 20}",
+               "score": round(rng.uniform(0, 100), 1), "question_number": 10, "correct_number": rng.randint(0, 10),
+               "elapse_time": rng.randint(5, 60), "summary": "The candidate answered most questions. " * 4,
+               "create_date": start + timedelta(minutes=i)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the streaming export encoders")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--memory", action="store_true", help="Trace the peak memory (slows the export down)")
+    args = parser.parse_args()
+
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    size = 0
+    for chunk in export_stream(make_rows(args.rows), RESULT_EXPORT_FIELDS, "bench", args.format, args.gzip):
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+
+    logger.info(f"{args.rows} rows as {args.format}{' (gzip)' if args.gzip else ''}: {size / 2 ** 20:.1f} MB "
+                f"in {elapsed:.2f}s, {args.rows / elapsed:.0f} rows/s")
+    if args.memory:
+        _, peak = tracemalloc.get_traced_memory()
+        logger.info(f"Peak memory: {peak / 2 ** 20:.2f} MB")
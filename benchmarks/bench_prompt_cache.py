@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import statistics
+import time
+from typing import Dict, List
+from agent.workflow import get_interview_context
+from utils.llm import ModelRoute, invoke_model, get_usage, get_cached_tokens
+from utils.prompt_utils import build_layered_prompt
+from utils.log_utils import logger
+
+
+# Measure the provider-side prefix cache on the next question prompt: the interview turns
+# share the static instructions and the per-test context, only the per-turn context changes
+# python benchmarks/bench_prompt_cache.py --turns 8 --model gpt-4o
+
+STATE = {
+    "job_title": "Senior Python Developer",
+    "knowledge_points": "Python, asyncio, FastAPI, MongoDB",
+    "interview_time": 30,
+    "language": "English",
+    "difficulty": "Medium",
+}
+
+
+def bench_turns(turns: int, model_name: str) -> List[Dict[str, float]]:
+    results = []
+    history: List[str] = []
+    for turn in range(turns):
+        qa_history = "\n".join(history) if history else "None"
+        messages = build_layered_prompt('prompts/kickoff_interview_system.txt',
+                                        'prompts/interview_context.txt',
+                                        'prompts/kickoff_interview_turn.txt',
+                                        context=get_interview_context(STATE),
+                                        turn={"remaining_time": STATE["interview_time"] - 2 * turn,
+                                              "qa_history": qa_history})
+
+        start = time.perf_counter()
+        response = invoke_model(ModelRoute(model=model_name), messages, node="next_question", thread_id="bench-prompt-cache")
+        latency = time.perf_counter() - start
+
+        usage = get_usage(response) or {}
+        results.append({
+            "latency": latency,
+            "input_tokens": usage.get("input_tokens", 0),
+            "cached_tokens": get_cached_tokens(usage),
+        })
+        history.append(f"Q{turn + 1} : {response.content[:80]} B Score:3 Correct")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure prefix cache hits and latency of the next question prompt")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--model", default="gpt-4o")
+    args = parser.parse_args()
+
+    results = bench_turns(args.turns, args.model)
+
+    print(f"{'turn':>5}{'input tokens':>14}{'cached':>10}{'latency (s)':>13}")
+    for i, r in enumerate(results, start=1):
+        print(f"{i:>5}{r['input_tokens']:>14}{r['cached_tokens']:>10}{r['latency']:>13.2f}")
+
+    hits = [r["latency"] for r in results if r["cached_tokens"]]
+    misses = [r["latency"] for r in results if not r["cached_tokens"]]
+    total_input = sum(r["input_tokens"] for r in results)
+    if total_input:
+        logger.info(f"Cached prompt tokens: {sum(r['cached_tokens'] for r in results) / total_input:.0%}")
+    if hits and misses:
+        logger.info(f"Mean latency with cache hit: {statistics.mean(hits):.2f}s, "
+                    f"without: {statistics.mean(misses):.2f}s")
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+import numpy as np
+from api.utils.skill_matrix import SkillColumnsBuilder, skill_matrices, rank_weak_skills
+from utils.log_utils import logger
+
+
+# Measure the skill analytics on synthetic results, without the database: columnar build,
+# weak skill ranking and a heatmap by candidate
+# python benchmarks/bench_skill_analytics.py --results 100000 --questions 8 --skills 40
+
+def make_answers(rng: random.Random, questions: int, skills: list) -> list:
+    return [(f"Q{i}", rng.choice(skills), rng.randint(0, 5), rng.random() < 0.6) for i in range(questions)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the skill analytics on synthetic results")
+    parser.add_argument("--results", type=int, default=100000)
+    parser.add_argument("--questions", type=int, default=8)
+    parser.add_argument("--skills", type=int, default=40)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    skills = [f"skill-{i}" for i in range(args.skills)]
+    results = [make_answers(rng, args.questions, skills) for _ in range(args.results)]
+
+    start = time.perf_counter()
+    builder = SkillColumnsBuilder()
+    for i, answers in enumerate(results):
+        builder.add_result(f"test-{i}", f"user-{i}", None, answers)
+    columns = builder.build()
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ranking = rank_weak_skills(columns)
+    rank_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrices = skill_matrices(columns, columns.result_index, len(columns.result_ids))
+    heatmap_time = time.perf_counter() - start
+
+    column_bytes = sum(a.nbytes for a in (columns.result_index, columns.skill_index, columns.score, columns.correct))
+    logger.info(f"{columns.size} answers of {args.results} results, columns: {column_bytes / 2 ** 20:.1f} MB")
+    logger.info(f"Build: {build_time:.2f}s, weak skills: {rank_time:.3f}s, "
+                f"heatmap {matrices['count'].shape}: {heatmap_time:.3f}s")
+    logger.info(f"Weakest skill: {ranking[0]['knowledge_point']} ({ranking[0]['correct_ratio']:.1%})")
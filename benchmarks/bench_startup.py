@@ -0,0 +1,85 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import socket
+import subprocess
+import time
+import urllib.request
+from collections import defaultdict
+from utils.log_utils import logger
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Measure the cold start of the API: import time of api.main by top-level package
+# (python -X importtime) and time from the process start to the first answered request
+# python benchmarks/bench_startup.py --runs 3 --top 15
+
+
+def import_profile(module: str) -> tuple:
+    """Total import time of module and self import time by top-level package (seconds)"""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             cwd=ROOT, capture_output=True, text=True)
+    by_package = defaultdict(float)
+    total = 0.0
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        by_package[name.strip().split(".")[0]] += int(self_us) / 1e6
+        if name.strip() == module:
+            total = int(cumulative_us) / 1e6
+    if process.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {process.stderr.splitlines()[-1:]}")
+    return total, dict(by_package)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(path: str, timeout: float) -> float:
+    """Seconds from starting uvicorn to the first successful response of path"""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port)],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"No response from {path} after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold start of the API")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Packages shown in the import breakdown")
+    parser.add_argument("--path", default="/api/v1/health")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    totals, packages = [], defaultdict(float)
+    for _ in range(args.runs):
+        total, by_package = import_profile("api.main")
+        totals.append(total)
+        for name, seconds in by_package.items():
+            packages[name] += seconds / args.runs
+    logger.info(f"import api.main: {min(totals):.3f}s (best of {args.runs})")
+    for name, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        logger.info(f"  {name:<24} {seconds:.3f}s")
+
+    ttfr = [time_to_first_request(args.path, args.timeout) for _ in range(args.runs)]
+    logger.info(f"Time to first request ({args.path}): {min(ttfr):.3f}s best, {max(ttfr):.3f}s worst of {args.runs}")
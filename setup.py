@@ -13,7 +13,6 @@ setup(
         "pytest>=7.4.3",
         "httpx>=0.25.0",
         "python-multipart>=0.0.6",
-        "hydra-core>=1.3.2",
         "omegaconf>=2.3.0",
         "mongoengine>=0.26.0",
         "pymongo>=4.5.0",
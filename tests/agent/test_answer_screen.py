@@ -0,0 +1,108 @@
+from agent.answer_screen import screen_answer, build_screened_result, is_gibberish, truncate_answer, \
+    MAX_ANSWER_LENGTH, MAX_ATTEMPTS_PER_QUESTION
+from agent.interview_response import QAResult, Question, QuestionType, Answer, AnswerAnalysis
+from agent.qa_analyzer import build_qa_result, settle_last_attempt
+
+
+QUESTION = "Q2. What is the capital of France?"
+
+
+def make_qa(question: str, number: int):
+    qa_result = QAResult(question=Question(question=question,
+                                           question_number=number,
+                                           question_type=QuestionType.SINGLE_CHOICE,
+                                           knowledge_point="Geography",
+                                           answer="A"),
+                         answer=Answer(is_valid=False,
+                                       giveup=False,
+                                       suggest_more_details=False,
+                                       follow_up_question="",
+                                       feedback="",
+                                       is_correct=False,
+                                       analysis="",
+                                       score=0),
+                         is_interview_over=False,
+                         summary=f"Q{number}")
+    return (question, "A", qa_result)
+
+
+def test_gibberish():
+    """Keyboard mash and symbols are screened, short choices and other scripts are not"""
+    assert is_gibberish("adfadsfdasf")
+    assert is_gibberish("sdfghjkl")
+    assert is_gibberish("asdfasdfasdf")
+    assert is_gibberish("?!?!...")
+    assert not is_gibberish("A")
+    assert not is_gibberish("B, C")
+    assert not is_gibberish("42")
+    assert not is_gibberish("Paris is the capital of France")
+    assert not is_gibberish("typewriter")
+    # correct one-word answers: identifiers and dictionary words
+    for answer in ("TypeError", "typeerror", "TypeError!", "territory", "repertoire", "assess", "pepper"):
+        assert not is_gibberish(answer), answer
+    assert not is_gibberish("巴黎")
+
+
+def test_screen_answer():
+    """Only answers that plausibly need grading are sent to the model"""
+    assert screen_answer("Paris", QUESTION, []) is None
+    assert screen_answer("   ", QUESTION, []) == "empty"
+    assert screen_answer("adfadsfdasf", QUESTION, []) == "gibberish"
+
+    # the same answer again, case and whitespace aside
+    history = [make_qa(QUESTION, 2)]
+    assert screen_answer(" a ", QUESTION, history) == "duplicate"
+    assert screen_answer("B", QUESTION, history) is None
+    assert screen_answer("A", "Q3. Another question", history) is None
+
+
+def make_analysis(is_valid: bool, suggest_more_details: bool = False, score: int = 0) -> AnswerAnalysis:
+    return AnswerAnalysis(knowledge_point="Geography",
+                          question_type=QuestionType.SHORT_ANSWER,
+                          is_valid=is_valid,
+                          giveup=False,
+                          suggest_more_details=suggest_more_details,
+                          follow_up_question="Which river flows through it?" if suggest_more_details else "",
+                          feedback="Please try again.",
+                          is_correct=is_valid,
+                          score=score,
+                          is_interview_over=False)
+
+
+def test_retry_budget():
+    """The last attempt of a question is graded as given, then the question is given up"""
+    # the last answer is still sent to the model
+    history = [make_qa(QUESTION, 2)] * (MAX_ATTEMPTS_PER_QUESTION - 1)
+    assert screen_answer("Paris", QUESTION, history) is None
+
+    # a valid last answer keeps its score, a request for more details is dropped
+    valid = build_qa_result(make_analysis(True, suggest_more_details=True, score=4), QUESTION, "Paris")
+    result = settle_last_attempt(valid, "English")
+    assert result.answer.is_valid and not result.answer.giveup
+    assert not result.answer.suggest_more_details
+    assert result.answer.score == 4
+
+    # an invalid last answer gives the question up
+    invalid = build_qa_result(make_analysis(False), QUESTION, "Rome")
+    result = settle_last_attempt(invalid, "English")
+    assert result.answer.giveup and not result.answer.is_valid
+    assert result.answer.feedback == "No valid answer was given to this question, moving on to the next one."
+    assert result.question.question_number == 2
+
+    # a screened last attempt moves on as well
+    result = build_screened_result("gibberish", QUESTION, "adfadsfdasf", "Chinese", last_attempt=True)
+    assert result.answer.giveup
+    assert result.answer.score == 0
+
+
+def test_screened_result_is_repeated():
+    """A screened answer is invalid, the question is repeated with local feedback"""
+    result = build_screened_result("duplicate", QUESTION, "A", "Chinese")
+
+    assert not result.answer.is_valid and not result.answer.giveup
+    assert result.answer.feedback == "您的回答与上次相同，请补充更多细节或换一种方式回答。"
+
+
+def test_truncate_answer():
+    assert truncate_answer("Paris") == "Paris"
+    assert len(truncate_answer("x" * (MAX_ANSWER_LENGTH * 10))) == MAX_ANSWER_LENGTH
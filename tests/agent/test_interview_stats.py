@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from agent.interview_response import QAResult, Question, QuestionType, Answer
+from agent.interview_stats import compute_interview_statistics
+
+
+def make_qa(question: str, number: int, score: int, is_correct: bool, is_valid: bool = True):
+    qa_result = QAResult(question=Question(question=question,
+                                           question_number=number,
+                                           question_type=QuestionType.SINGLE_CHOICE,
+                                           knowledge_point="Python",
+                                           answer="A"),
+                         answer=Answer(is_valid=is_valid,
+                                       giveup=False,
+                                       suggest_more_details=False,
+                                       follow_up_question="",
+                                       feedback="",
+                                       is_correct=is_correct,
+                                       analysis="",
+                                       score=score),
+                         is_interview_over=False,
+                         summary=f"Q{number}")
+    return (question, "answer", qa_result)
+
+
+def test_compute_interview_statistics():
+    """Repeated answers of a question are merged, the last answer counts"""
+    start_time = datetime(2025, 1, 1, 10, 0, 0)
+    qa_history = [
+        make_qa("Q1", 1, 0, False, is_valid=False),
+        make_qa("Q1", 1, 5, True),
+        make_qa("Q2", 2, 3, False),
+        make_qa("Q3", 3, 4, True),
+    ]
+
+    result = compute_interview_statistics(qa_history, start_time, start_time + timedelta(minutes=7, seconds=10))
+
+    assert result.total_question_number == 3
+    assert result.correct_question_number == 2
+    assert result.score == 8  # (5 + 3 + 4) / 15 * 10
+    assert result.interview_time == 8
+    assert result.summary == ""
+
+
+def test_compute_interview_statistics_empty_history():
+    start_time = datetime(2025, 1, 1, 10, 0, 0)
+
+    result = compute_interview_statistics([], start_time, start_time)
+
+    assert result.total_question_number == 0
+    assert result.correct_question_number == 0
+    assert result.score == 0
+    assert result.interview_time == 0
@@ -0,0 +1,53 @@
+from agent.interview_response import AnswerAnalysis, Question, QuestionType
+from agent.qa_analyzer import build_qa_result, get_question_number
+
+
+def make_analysis(**kwargs) -> AnswerAnalysis:
+    values = dict(knowledge_point="Geography",
+                  question_type=QuestionType.SHORT_ANSWER,
+                  is_valid=True,
+                  giveup=False,
+                  suggest_more_details=False,
+                  follow_up_question="",
+                  feedback="Good answer",
+                  is_correct=True,
+                  score=5,
+                  is_interview_over=False)
+    values.update(kwargs)
+    return AnswerAnalysis(**values)
+
+
+def test_build_qa_result_with_question_meta():
+    """Question metadata from the interview plan is used as is"""
+    question = Question(question="Q3. Which hook runs after render?",
+                        question_number=3,
+                        question_type=QuestionType.SINGLE_CHOICE,
+                        knowledge_point="React Hooks",
+                        answer="B")
+
+    result = build_qa_result(make_analysis(), question.question, "B", question)
+
+    assert result.question == question
+    assert result.answer.score == 5
+    assert result.answer.is_correct
+    assert result.is_interview_over is False
+    assert result.summary.startswith("Q3 : ")
+    assert "Score:5" in result.summary
+
+
+def test_build_qa_result_without_question_meta():
+    """Question number from the question text, knowledge point and type named by the model"""
+    result = build_qa_result(make_analysis(is_valid=False, is_correct=False, score=0, feedback="Invalid"),
+                             "Q2. What is the capital of France?",
+                             "adfadsfdasf")
+
+    assert result.question.question_number == 2
+    assert result.question.knowledge_point == "Geography"
+    assert result.question.question_type == QuestionType.SHORT_ANSWER
+    assert result.answer.is_valid is False
+    assert result.answer.analysis == ""
+
+
+def test_get_question_number():
+    assert get_question_number("Q12. Explain closures") == 12
+    assert get_question_number("Explain closures") == 0
@@ -0,0 +1,68 @@
+import time
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from agent.tool_node import ToolNode
+
+calls = []
+
+
+@tool
+def get_job(job_id: str) -> dict:
+    """Get the job details"""
+    calls.append(job_id)
+    time.sleep(0.2)
+    return {"job_id": job_id, "title": "Python Developer"}
+
+
+@tool
+def slow_lookup(query: str) -> str:
+    """A lookup slower than its timeout"""
+    time.sleep(1)
+    return query
+
+
+def make_state(*tool_calls):
+    message = AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call-{i}"}
+                                                for i, (name, args) in enumerate(tool_calls)])
+    return {"messages": [message]}
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_run_concurrently_in_order():
+    """Independent tool calls overlap, the tool messages keep the order of the calls"""
+    node = ToolNode([get_job], max_concurrency=4)
+
+    start = time.monotonic()
+    result = await node.aprocess_tool_calls(make_state(*[("get_job", {"job_id": f"job-{i}"}) for i in range(4)]))
+
+    assert time.monotonic() - start < 0.6
+    assert [m.tool_call_id for m in result["messages"]] == ["call-0", "call-1", "call-2", "call-3"]
+    assert result["messages"][2].content == '{"job_id":"job-2","title":"Python Developer"}'
+
+
+@pytest.mark.asyncio
+async def test_tool_timeout():
+    """A slow tool gets an error message, the other results are kept"""
+    node = ToolNode([get_job, slow_lookup], timeouts={"slow_lookup": 0.1})
+
+    result = await node.aprocess_tool_calls(make_state(("slow_lookup", {"query": "x"}),
+                                                       ("get_job", {"job_id": "job-1"})))
+
+    assert result["messages"][0].status == "error"
+    assert "timed out" in result["messages"][0].content
+    assert result["messages"][1].status == "success"
+
+
+@pytest.mark.asyncio
+async def test_pure_tool_is_memoized():
+    """Calls of a pure tool with the same args run once"""
+    calls.clear()
+    node = ToolNode([get_job], pure_tools=["get_job"])
+
+    await node.aprocess_tool_calls(make_state(("get_job", {"job_id": "job-1"})))
+    result = await node.aprocess_tool_calls(make_state(("get_job", {"job_id": "job-1"})))
+    node.process_tool_calls(make_state(("get_job", {"job_id": "job-1"})))
+
+    assert calls == ["job-1"]
+    assert result["messages"][0].content == '{"job_id":"job-1","title":"Python Developer"}'
@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from langchain_core.messages import AIMessage
+from agent.interview_response import QAResult, Question, QuestionType, Answer
+from agent.workflow import check_analyze_answer_response_condition, is_over_condition, get_end_reason, \
+    kickoff_interview, send_next_question
+
+
+def make_qa(question: str, number: int):
+    qa_result = QAResult(question=Question(question=question,
+                                           question_number=number,
+                                           question_type=QuestionType.SINGLE_CHOICE,
+                                           knowledge_point="Python",
+                                           answer="A"),
+                         answer=Answer(is_valid=True,
+                                       giveup=False,
+                                       suggest_more_details=False,
+                                       follow_up_question="",
+                                       feedback="",
+                                       is_correct=True,
+                                       analysis="",
+                                       score=5),
+                         is_interview_over=False,
+                         summary=f"Q{number}")
+    return (question, "A", qa_result)
+
+
+def make_state(answered: int, elapsed_minutes: int = 1, interview_time: int = 10, **values):
+    qa_history = [make_qa(f"Q{i}", i) for i in range(1, answered + 1)]
+    return {
+        "start_time": datetime.now() - timedelta(minutes=elapsed_minutes),
+        "interview_time": interview_time,
+        "difficulty": "Medium",
+        "qa_history": qa_history,
+        "question": f"Q{answered}",
+        "analyze_answer_response": qa_history[-1][2] if qa_history else None,
+        **values
+    }
+
+
+def make_plan(count: int, first: int = 1, difficulty: str = "Medium"):
+    return [Question(question=f"Q{number}. {difficulty} question {number}",
+                     question_number=number,
+                     question_type=QuestionType.SINGLE_CHOICE,
+                     knowledge_point="Python",
+                     answer="A") for number in range(first, first + count)]
+
+
+CONFIG = {"configurable": {"thread_id": "test"}}
+INCREMENTAL_CONFIG = {"configurable": {"thread_id": "test", "kickoff_mode": "incremental"}}
+INTERVIEW_CONTEXT = {"job_title": "Python Developer", "knowledge_points": "Python", "language": "English"}
+
+
+def test_next_question_within_budget():
+    """Another question is asked while time and questions are left"""
+    state = make_state(answered=2)
+
+    assert get_end_reason(state, CONFIG) is None
+    assert check_analyze_answer_response_condition(state, CONFIG) == "send_next_question"
+
+
+def test_summarize_when_time_is_up():
+    """The interview ends without generating another question once the time is up"""
+    state = make_state(answered=2, elapsed_minutes=11)
+
+    assert get_end_reason(state, CONFIG) == "time_up"
+    assert check_analyze_answer_response_condition(state, CONFIG) == "summarize_interview"
+
+
+def test_summarize_when_question_budget_is_exhausted():
+    """One question per MINUTES_PER_QUESTION by default, max_questions in the config wins"""
+    assert get_end_reason(make_state(answered=5), CONFIG) == "question_budget"
+
+    config = {"configurable": {"thread_id": "test", "max_questions": 3}}
+    assert check_analyze_answer_response_condition(make_state(answered=3), config) == "summarize_interview"
+
+    # repeated answers of the same question count once
+    state = make_state(answered=2)
+    state["qa_history"] = state["qa_history"] + [state["qa_history"][-1]]
+    assert get_end_reason(state, config) is None
+
+
+def test_summarize_when_plan_is_finished():
+    """The interview ends after the last planned question, unless the plan is regenerated"""
+    plan = [make_qa("Q1", 1)[2].question, make_qa("Q2", 2)[2].question]
+    state = make_state(answered=2, interview_plan=plan, plan_index=2, plan_difficulty="Medium")
+
+    assert get_end_reason(state, CONFIG) == "plan_finished"
+    assert get_end_reason({**state, "regenerate_plan": True}, CONFIG) is None
+
+
+def test_is_over_condition():
+    """No string matching, the interview is over when no question is left"""
+    assert is_over_condition({"question": None}, CONFIG) == "summarize_interview"
+    assert is_over_condition({"question": "Interview Over? Q3. What is a decorator?"}, CONFIG) == "analyze_answer"
+
+
+def test_no_repeated_question_when_time_is_up():
+    """An invalid answer given after the time is up ends the interview"""
+    state = make_state(answered=2, elapsed_minutes=11)
+    state["analyze_answer_response"] = state["analyze_answer_response"].model_copy(
+        update={"answer": state["analyze_answer_response"].answer.model_copy(update={"is_valid": False})})
+
+    assert check_analyze_answer_response_condition(state, CONFIG) == "summarize_interview"
+
+
+@patch("agent.workflow.invoke_model")
+@patch("agent.workflow.generate_interview_plan")
+def test_kickoff_in_plan_mode(mock_plan, mock_invoke):
+    """The first question is served from the plan generated at kickoff"""
+    plan = make_plan(3)
+    mock_plan.return_value = plan
+
+    result = kickoff_interview(make_state(answered=0, **INTERVIEW_CONTEXT), CONFIG)
+
+    assert result["question"] == plan[0].question
+    assert result["interview_plan"] == plan
+    assert result["plan_index"] == 1
+    assert result["plan_difficulty"] == "Medium"
+    mock_invoke.assert_not_called()
+
+
+@patch("agent.workflow.invoke_model")
+@patch("agent.workflow.generate_interview_plan")
+def test_kickoff_in_incremental_mode(mock_plan, mock_invoke):
+    """kickoff_mode=incremental generates the first question alone, without a plan"""
+    mock_invoke.return_value = AIMessage(content="Q1. What is a decorator?")
+
+    result = kickoff_interview(make_state(answered=0, **INTERVIEW_CONTEXT), INCREMENTAL_CONFIG)
+
+    assert result["question"] == "Q1. What is a decorator?"
+    assert "interview_plan" not in result
+    mock_plan.assert_not_called()
+
+
+@patch("agent.workflow.invoke_model")
+@patch("agent.workflow.generate_interview_plan")
+def test_next_question_served_from_plan(mock_plan, mock_invoke):
+    """The next questions come from the plan without any LLM call"""
+    plan = make_plan(3)
+    state = make_state(answered=1, interview_plan=plan, plan_index=1, plan_difficulty="Medium",
+                       current_question=plan[0])
+
+    result = send_next_question(state, CONFIG)
+
+    assert result["question"] == plan[1].question
+    assert result["current_question"] == plan[1]
+    assert result["plan_index"] == 2
+    mock_plan.assert_not_called()
+    mock_invoke.assert_not_called()
+
+
+@patch("agent.workflow.generate_interview_plan")
+def test_plan_runs_out(mock_plan):
+    """Once the planned questions are served, the interview is summarized"""
+    plan = make_plan(2)
+    state = make_state(answered=2, interview_plan=plan, plan_index=2, plan_difficulty="Medium",
+                       current_question=plan[1])
+
+    assert check_analyze_answer_response_condition(state, CONFIG) == "summarize_interview"
+
+    # also when the plan is exhausted on the way to the next question
+    result = send_next_question(state, CONFIG)
+    assert result["question"] is None
+    assert is_over_condition({**state, **result}, CONFIG) == "summarize_interview"
+    mock_plan.assert_not_called()
+
+
+@patch("agent.workflow.generate_interview_plan")
+def test_plan_regenerated_on_difficulty_change(mock_plan):
+    """The rest of the plan is regenerated with the new difficulty, numbered after the current question"""
+    plan = make_plan(3)
+    regenerated = make_plan(2, first=2, difficulty="Hard")
+    mock_plan.return_value = regenerated
+    state = make_state(answered=1, interview_plan=plan, plan_index=1, plan_difficulty="Medium",
+                       current_question=plan[0], difficulty="Hard", regenerate_plan=True)
+
+    assert check_analyze_answer_response_condition(state, CONFIG) == "send_next_question"
+    result = send_next_question(state, CONFIG)
+
+    assert mock_plan.call_args.kwargs["start_number"] == 2
+    assert result["interview_plan"] == regenerated
+    assert result["plan_difficulty"] == "Hard"
+    assert result["regenerate_plan"] is False
+    assert result["question"] == regenerated[0].question
+    assert result["plan_index"] == 1
@@ -13,6 +13,7 @@ from agent.interview_response import QAResult
 from agent.interview_response import Question
 from agent.interview_response import QuestionType
 from agent.interview_response import Answer
+from api.exceptions.api_error import ValidationError
 
 client = TestClient(app)
 
@@ -68,6 +69,42 @@ class TestChatAPI:
         assert kwargs["language"] == "Chinese"
         assert kwargs["difficulty"] == "medium"
 
+    @patch("api.service.chat.ChatService.change_difficulty")
+    def test_change_difficulty(self, mock_change_difficulty):
+        """测试修改面试难度"""
+        test_id = str(uuid.uuid4())
+        user_id = str(uuid.uuid4())
+        mock_change_difficulty.return_value = {
+            "feedback": "Q2. 什么是装饰器？",
+            "question_id": str(uuid.uuid4()),
+            "type": "question",
+            "is_over": False
+        }
+
+        response = client.post(
+            "/api/v1/chat/difficulty",
+            json={"user_id": user_id, "test_id": test_id, "difficulty": "hard"}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["code"] == "0"
+        assert data["data"]["feedback"] == "Q2. 什么是装饰器？"
+        mock_change_difficulty.assert_called_once_with(user_id=user_id, test_id=test_id, difficulty="hard")
+
+    @patch("api.service.chat.ChatService.change_difficulty")
+    def test_change_difficulty_of_finished_interview(self, mock_change_difficulty):
+        """测试修改已结束面试的难度"""
+        mock_change_difficulty.side_effect = ValidationError("Interview is over")
+
+        response = client.post(
+            "/api/v1/chat/difficulty",
+            json={"user_id": str(uuid.uuid4()), "test_id": str(uuid.uuid4()), "difficulty": "hard"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["code"] == "400"
+
     @patch("api.service.chat.build_graph")
     def test_answer_question_when_interview_is_over(self, mock_build_graph):
         """测试面试结束场景的问题回答接口"""
@@ -0,0 +1,299 @@
+import asyncio
+import re
+import threading
+import uuid
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from langchain_core.messages import AIMessage
+from agent.interview_response import InterviewPlan, QAResult, Question, QuestionType, Answer
+from api.exceptions.api_error import NotFoundError, ValidationError
+from api.service.chat import ChatService
+from api.service.deadline_scheduler import DeadlineScheduler
+from agent.prefetch import QuestionPrefetcher, prefetch_hits, prefetch_misses
+from agent.qa_analyzer import settle_last_attempt
+from agent.answer_screen import MAX_ATTEMPTS_PER_QUESTION
+from utils.llm_cancel import cancellations, LLMCancelledError
+
+# Interview sessions run on the real workflow graph, the LLM calls are replaced by
+# fake_invoke_model and fake_analyze
+
+
+def get_difficulty(messages) -> str:
+    """Difficulty of the interview context in the prompt"""
+    return re.search(r"Difficulty: (\w+)", "\n".join(str(message.content) for message in messages)).group(1)
+
+
+def fake_invoke_model(route, messages, priority=None, output_tokens=None, node="default", schema=None, thread_id=None):
+    """Plan of 3 questions, other questions named after their node, difficulty and priority"""
+    difficulty = get_difficulty(messages)
+    if node == "plan":
+        start = int(re.search(r"numbered starting from (\d+)", messages[-1].content).group(1))
+        questions = [Question(question=f"Q{number}. {difficulty} planned question",
+                              question_number=number,
+                              question_type=QuestionType.SHORT_ANSWER,
+                              knowledge_point="Python",
+                              answer="") for number in range(start, start + 3)]
+        return {"parsed": InterviewPlan(questions=questions), "parsing_error": None, "raw": AIMessage(content="")}
+    return AIMessage(content=f"{node} {difficulty} {priority.name.lower()} question")
+
+
+def fake_analyze(answer, question, language, **kwargs) -> QAResult:
+    """Every answer is valid and correct"""
+    return QAResult(question=Question(question=question,
+                                      question_number=1,
+                                      question_type=QuestionType.SHORT_ANSWER,
+                                      knowledge_point="Python",
+                                      answer=""),
+                    answer=Answer(is_valid=True,
+                                  giveup=False,
+                                  suggest_more_details=False,
+                                  follow_up_question="",
+                                  feedback="Good",
+                                  is_correct=True,
+                                  analysis="",
+                                  score=8),
+                    is_interview_over=False,
+                    summary=f"{question} : {answer}")
+
+
+@pytest.fixture
+def llm():
+    """The fake LLM calls of the workflow"""
+    with patch("agent.workflow.invoke_model", side_effect=fake_invoke_model) as invoke_model, \
+            patch("agent.workflow.analyze_question_answer", side_effect=fake_analyze):
+        yield invoke_model
+
+
+def make_service(kickoff_mode: str) -> ChatService:
+    service = ChatService()
+    service.configure({"kickoff_mode": kickoff_mode})
+    # no stored test, the interview is started from the request
+    service.test_service = MagicMock(get_test=AsyncMock(side_effect=NotFoundError("Test not found")))
+    return service
+
+
+async def start(service: ChatService, test_id: str, difficulty: str = "medium") -> dict:
+    with patch("api.service.chat.deadline_scheduler.track", AsyncMock(return_value=True)):
+        return await service.start_chat(user_id="user-1", test_id=test_id, job_title="Python Developer",
+                                        examination_points="Python", test_time=10, language="English",
+                                        difficulty=difficulty)
+
+
+def calls_of(invoke_model, node: str) -> list:
+    return [call for call in invoke_model.call_args_list if call.kwargs.get("node") == node]
+
+
+@pytest.mark.asyncio
+async def test_plan_session_regenerates_plan_on_difficulty_change(llm):
+    """Questions are served from the plan, a difficulty change regenerates the rest of it"""
+    service = make_service("plan")
+    test_id = str(uuid.uuid4())
+
+    first = await start(service, test_id)
+    assert first["feedback"] == "Q1. medium planned question"
+
+    second = await service.process_answer("user-1", test_id, first["question_id"], "A decorator wraps a function")
+    assert second["feedback"] == "Q2. medium planned question"
+    assert len(calls_of(llm, "plan")) == 1
+    assert calls_of(llm, "next_question") == []
+
+    changed = await service.change_difficulty("user-1", test_id, "hard")
+    # the question waiting for an answer is kept
+    assert changed["question_id"] == second["question_id"]
+    assert changed["feedback"] == second["feedback"]
+
+    third = await service.process_answer("user-1", test_id, second["question_id"], "Generators yield values lazily")
+    assert len(calls_of(llm, "plan")) == 2
+    assert third["feedback"].endswith("hard planned question")
+    values = await service.get_session_values("user-1", test_id)
+    assert values["plan_difficulty"] == "hard"
+    assert values["regenerate_plan"] is False
+
+
+@pytest.mark.asyncio
+async def test_change_difficulty_validation(llm):
+    """Unknown difficulties and unknown sessions are rejected"""
+    service = make_service("plan")
+
+    with pytest.raises(ValidationError):
+        await service.change_difficulty("user-1", str(uuid.uuid4()), "extreme")
+    with pytest.raises(NotFoundError):
+        await service.change_difficulty("user-1", str(uuid.uuid4()), "hard")
+
+
+@pytest.mark.asyncio
+async def test_incremental_session_uses_prefetched_question(llm):
+    """The next question generated while the candidate answers is served"""
+    service = make_service("incremental")
+    test_id = str(uuid.uuid4())
+    hits = prefetch_hits.total()
+
+    first = await start(service, test_id)
+    assert first["feedback"] == "kickoff medium interactive question"
+
+    second = await service.process_answer("user-1", test_id, first["question_id"], "A decorator wraps a function")
+
+    # the prefetch runs with the deferrable priority, an inline generation would be interactive
+    assert second["feedback"] == "next_question medium deferrable question"
+    assert prefetch_hits.total() == hits + 1
+    assert all(call.args[2].name == "DEFERRABLE" for call in calls_of(llm, "next_question"))
+    assert calls_of(llm, "plan") == []
+
+
+@pytest.mark.asyncio
+async def test_incremental_session_discards_stale_prefetch(llm):
+    """A prefetch made for the previous difficulty is discarded, never served"""
+    service = make_service("incremental")
+    test_id = str(uuid.uuid4())
+    cancelled = prefetch_misses.value(reason="cancelled")
+
+    first = await start(service, test_id)
+    await service.change_difficulty("user-1", test_id, "hard")
+    second = await service.process_answer("user-1", test_id, first["question_id"], "A decorator wraps a function")
+
+    assert prefetch_misses.value(reason="cancelled") == cancelled + 1
+    assert second["feedback"] == "next_question hard deferrable question"
+
+
+def test_stale_prefetch_is_not_taken():
+    """take discards a prefetch whose question or difficulty no longer matches the state"""
+    prefetcher = QuestionPrefetcher(max_workers=1)
+    state = {"question": "Q1", "difficulty": "medium", "analyze_answer_response": fake_analyze("A", "Q1", "English")}
+    difficulty_changed = prefetch_misses.value(reason="difficulty_changed")
+    question_changed = prefetch_misses.value(reason="question_changed")
+
+    prefetcher.submit("thread-1", state, lambda: AIMessage(content="Q2"))
+    assert prefetcher.take("thread-1", {**state, "difficulty": "hard"}, remaining_time=5) is None
+
+    prefetcher.submit("thread-1", state, lambda: AIMessage(content="Q2"))
+    assert prefetcher.take("thread-1", {**state, "question": "Q1, repeated differently"}, remaining_time=5) is None
+
+    prefetcher.submit("thread-1", state, lambda: AIMessage(content="Q2"))
+    assert prefetcher.take("thread-1", state, remaining_time=5).content == "Q2"
+
+    assert prefetch_misses.value(reason="difficulty_changed") == difficulty_changed + 1
+    assert prefetch_misses.value(reason="question_changed") == question_changed + 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_last_attempt_gives_up_question(llm):
+    """The question is repeated after an invalid answer, until its last attempt is graded and given up"""
+    service = make_service("plan")
+    test_id = str(uuid.uuid4())
+    last_attempts = []
+
+    def invalid_analyze(answer, question, language, last_attempt=False, **kwargs):
+        last_attempts.append(last_attempt)
+        result = fake_analyze(answer, question, language)
+        result = result.model_copy(update={"answer": result.answer.model_copy(update={
+            "is_valid": False, "is_correct": False, "feedback": "Please try again", "score": 0})})
+        return settle_last_attempt(result, language) if last_attempt else result
+
+    response = await start(service, test_id)
+    with patch("agent.workflow.analyze_question_answer", side_effect=invalid_analyze):
+        for attempt in range(MAX_ATTEMPTS_PER_QUESTION):
+            assert response["feedback"] == ("Q1. medium planned question" if attempt == 0 else "Please try again")
+            response = await service.process_answer("user-1", test_id, response["question_id"], f"Answer {attempt}")
+
+    assert last_attempts == [False] * (MAX_ATTEMPTS_PER_QUESTION - 1) + [True]
+    assert response["feedback"] == "Q2. medium planned question"
+    values = await service.get_session_values("user-1", test_id)
+    assert [given for _, given, _ in values["qa_history"]] == [f"Answer {n}" for n in range(MAX_ATTEMPTS_PER_QUESTION)]
+    assert values["qa_history"][-1][2].answer.giveup
+
+
+@pytest.mark.asyncio
+async def test_model_routes_come_from_the_test(llm):
+    """The overrides stored on the test are applied, unless they break the limits of the llm config"""
+    service = make_service("plan")
+    service.configure({"allowed_models": ["gpt-4o", "gpt-4o-mini"], "max_tokens_cap": 2048})
+
+    allowed = MagicMock(test_id=str(uuid.uuid4()), status="on-going",
+                        model_routes={"plan": {"model": "gpt-4o-mini", "max_tokens": 2048}})
+    service.test_service = MagicMock(get_test=AsyncMock(return_value=allowed))
+    await start(service, allowed.test_id)
+    assert calls_of(llm, "plan")[-1].args[0].model == "gpt-4o-mini"
+
+    forbidden = MagicMock(test_id=str(uuid.uuid4()), status="on-going",
+                          model_routes={"plan": {"model": "o1-pro", "max_tokens": 100000}})
+    service.test_service = MagicMock(get_test=AsyncMock(return_value=forbidden))
+    await start(service, forbidden.test_id)
+    assert calls_of(llm, "plan")[-1].args[0].model == "gpt-4o"
+    # a None input is not written to the state
+    assert (await service.get_session_values("user-1", forbidden.test_id)).get("model_routes") is None
+
+
+@pytest.mark.asyncio
+async def test_deadline_waits_for_answer_in_flight(llm):
+    """The deadline scheduler finalizes the session after the answer in flight, the answer is kept"""
+    service = make_service("plan")
+    test_id = str(uuid.uuid4())
+    first = await start(service, test_id)
+
+    entered = threading.Event()
+    gate = threading.Event()
+
+    def slow_analyze(answer, question, language, **kwargs):
+        entered.set()
+        gate.wait(5)
+        return fake_analyze(answer, question, language)
+
+    test = MagicMock(test_id=test_id, user_id="user-1", status="on-going")
+    with patch("agent.workflow.analyze_question_answer", side_effect=slow_analyze), \
+            patch("api.repositories.test_repository.TestRepository.claim_due_tests", new=AsyncMock(return_value=[test])), \
+            patch("api.service.finalization_queue.FinalizationQueue.enqueue", new=AsyncMock()) as mock_enqueue:
+        answer = asyncio.create_task(
+            service.process_answer("user-1", test_id, first["question_id"], "A decorator wraps a function"))
+        await asyncio.to_thread(entered.wait, 5)
+
+        scheduler = DeadlineScheduler()
+        scheduler.attach(service)
+        batch = asyncio.create_task(scheduler.process_batch())
+        await asyncio.sleep(0.1)
+        # the session is not read nor released while the answer is analyzed
+        assert not batch.done()
+        mock_enqueue.assert_not_called()
+
+        gate.set()
+        result = await answer
+        assert await batch == 1
+
+    assert result["feedback"] == "Q2. medium planned question"
+    # the finalized session has the answer given before the deadline
+    values = mock_enqueue.call_args.args[2]
+    assert [given for _, given, _ in values["qa_history"]] == ["A decorator wraps a function"]
+    assert await service.get_session_values("user-1", test_id) is None
+    # nothing of the thread is left in the checkpointer
+    checkpointer = service.workflow.checkpointer
+    assert not any(checkpointer.storage.get(test_id, {}).values())
+    assert not [key for key in checkpointer.writes if key[0] == test_id]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_first_run_leaves_no_session(llm):
+    """A client gone during the kickoff leaves no partial session, the next start runs the whole kickoff"""
+    service = make_service("plan")
+    test_id = str(uuid.uuid4())
+    entered = threading.Event()
+    gate = threading.Event()
+
+    def slow_invoke_model(*args, **kwargs):
+        entered.set()
+        gate.wait(5)
+        # the real invoke_model checks the cancellation token of the thread
+        if cancellations.get(kwargs.get("thread_id")).is_set():
+            raise LLMCancelledError()
+        return fake_invoke_model(*args, **kwargs)
+
+    with patch("agent.workflow.invoke_model", side_effect=slow_invoke_model):
+        first = asyncio.create_task(start(service, test_id))
+        await asyncio.to_thread(entered.wait, 5)
+        first.cancel()
+        await asyncio.sleep(0.1)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    assert await service.get_session_values("user-1", test_id) is None
+    restarted = await start(service, test_id)
+    assert restarted["feedback"] == "Q1. medium planned question"
@@ -0,0 +1,127 @@
+import pytest
+import uuid
+from datetime import datetime, UTC, timedelta
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from api.model.db.test import Test
+from api.service.deadline_scheduler import DeadlineScheduler, ABANDONED_SUMMARY
+from agent.interview_response import QAResult, Question, QuestionType, Answer
+
+
+def make_test(status: str = "on-going") -> Test:
+    return Test(
+        test_id=str(uuid.uuid4()),
+        activate_code="1234",
+        user_id=str(uuid.uuid4()),
+        job_id=str(uuid.uuid4()),
+        job_title="Python Developer",
+        type="interview",
+        language="English",
+        difficulty="medium",
+        test_time=10,
+        examination_points=["Python", "asyncio"],
+        status=status,
+        start_date=datetime.now(UTC) - timedelta(minutes=12),
+        deadline_date=datetime.now(UTC) - timedelta(minutes=2)
+    )
+
+
+def make_qa(question: str) -> tuple:
+    qa_result = QAResult(question=Question(question=question,
+                                           question_number=1,
+                                           question_type=QuestionType.SINGLE_CHOICE,
+                                           knowledge_point="Python",
+                                           answer="A"),
+                         answer=Answer(is_valid=True, giveup=False, suggest_more_details=False,
+                                       follow_up_question="", feedback="", is_correct=True,
+                                       analysis="", score=4),
+                         is_interview_over=False,
+                         summary="Q1")
+    return (question, "A", qa_result)
+
+
+def make_sessions(values):
+    sessions = MagicMock()
+    sessions.get_session_values = AsyncMock(return_value=values)
+    sessions.release_session = AsyncMock()
+
+    async def run_locked(test_id, call_key, fn):
+        return await fn()
+
+    sessions.run_locked = AsyncMock(side_effect=run_locked)
+    return sessions
+
+
+@pytest.mark.asyncio
+async def test_abandoned_interview_is_finalized_from_session():
+    """The qa_history of the session is summarized and persisted, then the session is released"""
+    test = make_test()
+    values = {"start_time": datetime.now() - timedelta(minutes=12), "qa_history": [make_qa("Q1")],
+              "job_title": "Python Developer", "knowledge_points": "Python", "interview_time": 10,
+              "language": "English"}
+    sessions = make_sessions(values)
+
+    with patch('api.repositories.test_repository.TestRepository.claim_due_tests', new=AsyncMock(return_value=[test])), \
+         patch('api.service.finalization_queue.FinalizationQueue.enqueue', new=AsyncMock()) as mock_enqueue:
+
+        scheduler = DeadlineScheduler()
+        scheduler.attach(sessions)
+        processed = await scheduler.process_batch()
+
+        assert processed == 1
+        args, kwargs = mock_enqueue.call_args
+        assert args[:2] == (test.user_id, test.test_id)
+        assert args[2]["interview_result"].total_question_number == 1
+        assert kwargs["summary"] is None
+        sessions.release_session.assert_called_once_with(test.test_id)
+
+
+@pytest.mark.asyncio
+async def test_completed_interview_only_releases_session():
+    """An interview completed by the candidate is not finalized again"""
+    test = make_test(status="completed")
+    sessions = make_sessions({"qa_history": [], "interview_result": MagicMock()})
+
+    with patch('api.repositories.test_repository.TestRepository.claim_due_tests', new=AsyncMock(return_value=[test])), \
+         patch('api.service.finalization_queue.FinalizationQueue.enqueue', new=AsyncMock()) as mock_enqueue:
+
+        scheduler = DeadlineScheduler()
+        scheduler.attach(sessions)
+        await scheduler.process_batch()
+
+        mock_enqueue.assert_not_called()
+        sessions.release_session.assert_called_once_with(test.test_id)
+
+
+@pytest.mark.asyncio
+async def test_orphan_interview_is_finalized_without_llm_call():
+    """A separate worker finalizes the tests whose session is gone, after the orphan grace period"""
+    test = make_test()
+
+    with patch('api.repositories.test_repository.TestRepository.claim_due_tests', new=AsyncMock(return_value=[test])) as mock_claim, \
+         patch('api.service.finalization_queue.FinalizationQueue.enqueue', new=AsyncMock()) as mock_enqueue:
+
+        scheduler = DeadlineScheduler(grace_seconds=60, orphan_grace_seconds=600)
+        await scheduler.process_batch()
+
+        before = mock_claim.call_args.args[0]
+        assert datetime.now(UTC) - before >= timedelta(seconds=600)
+        args, kwargs = mock_enqueue.call_args
+        assert args[2]["qa_history"] == []
+        assert args[2]["interview_result"].interview_time == 10
+        assert kwargs["summary"] == ABANDONED_SUMMARY
+
+
+@pytest.mark.asyncio
+async def test_failed_finalization_is_claimed_again():
+    """The deadline is restored when the finalization fails"""
+    test = make_test()
+
+    with patch('api.repositories.test_repository.TestRepository.claim_due_tests', new=AsyncMock(return_value=[test])), \
+         patch('api.repositories.test_repository.TestRepository.set_deadline', new=AsyncMock()) as mock_set_deadline, \
+         patch('api.service.finalization_queue.FinalizationQueue.enqueue', new=AsyncMock(side_effect=Exception("db down"))):
+
+        scheduler = DeadlineScheduler()
+        await scheduler.process_batch()
+
+        mock_set_deadline.assert_called_once_with(test.test_id, test.deadline_date)
@@ -0,0 +1,74 @@
+import csv
+import gzip
+import io
+import pytest
+import orjson
+from datetime import datetime, UTC
+from unittest.mock import patch
+
+from api.utils.export import encode_ndjson, encode_csv, gzip_chunks, export_stream, export_rows_total, CHUNK_SIZE
+from api.service.export import ExportService, TEST_EXPORT_FIELDS
+from api.exceptions.api_error import ValidationError
+
+ROWS = [
+    {"test_id": "t1", "score": 80.5, "create_date": datetime(2025, 1, 1, 10, tzinfo=UTC), "summary": 'Said "hi", left'},
+    {"test_id": "t2", "score": None, "llm_usage": {"calls": 3}},
+]
+
+def test_encode_ndjson():
+    """One JSON object per row with the exported fields only"""
+    lines = b"".join(encode_ndjson(iter(ROWS), ["test_id", "score", "create_date"])).splitlines()
+    assert [orjson.loads(line) for line in lines] == [
+        {"test_id": "t1", "score": 80.5, "create_date": "2025-01-01T10:00:00+00:00"},
+        {"test_id": "t2", "score": None, "create_date": None}
+    ]
+
+def test_encode_csv():
+    """A header, quoted text and the nested values as JSON"""
+    text = b"".join(encode_csv(iter(ROWS), ["test_id", "summary", "llm_usage"])).decode()
+    assert list(csv.reader(io.StringIO(text))) == [
+        ["test_id", "summary", "llm_usage"],
+        ["t1", 'Said "hi", left', ""],
+        ["t2", "", '{"calls":3}']
+    ]
+
+def test_encoders_stream_in_chunks():
+    """Large exports are sent in bounded chunks, not built in memory"""
+    rows = ({"test_id": f"t{i}", "summary": "x" * 100} for i in range(5000))
+    chunks = list(encode_csv(rows, ["test_id", "summary"]))
+    assert len(chunks) > 5
+    assert max(len(chunk) for chunk in chunks) < CHUNK_SIZE + 1024
+
+def test_gzip_chunks():
+    """The compressed stream is one valid gzip file"""
+    chunks = [b"a" * 1000, b"b" * 1000, b""]
+    assert gzip.decompress(b"".join(gzip_chunks(chunks))) == b"".join(chunks)
+
+def test_export_stream_counts_rows():
+    """The exported rows are counted once the stream is consumed"""
+    before = export_rows_total.value(kind="unit", format="ndjson")
+    data = b"".join(export_stream(iter(ROWS), ["test_id"], "unit", "ndjson", compress=True))
+    assert gzip.decompress(data).count(b"\n") == 2
+    assert export_rows_total.value(kind="unit", format="ndjson") == before + 2
+
+def test_export_tests():
+    """The filters are passed to the cursor, only the exported fields are read"""
+    with patch('api.repositories.test_repository.TestRepository.iter_tests', return_value=iter(ROWS)) as mock_iter:
+        service = ExportService(batch_size=500)
+        data = b"".join(service.export_tests("csv", job_id="job-1", status="completed"))
+
+        assert data.decode().splitlines()[0] == ",".join(TEST_EXPORT_FIELDS)
+        assert len(data.decode().splitlines()) == 3
+        mock_iter.assert_called_once_with(TEST_EXPORT_FIELDS, "job-1", "completed", None, None, 500)
+
+@pytest.mark.parametrize("kwargs", [
+    {"export_format": "xml"},
+    {"export_format": "csv", "status": "unknown"},
+    {"export_format": "csv", "start_date": datetime(2025, 2, 1), "end_date": datetime(2025, 1, 1)},
+])
+def test_export_tests_invalid(kwargs):
+    """Invalid exports are rejected before streaming starts"""
+    with patch('api.repositories.test_repository.TestRepository.iter_tests') as mock_iter:
+        with pytest.raises(ValidationError):
+            ExportService().export_tests(**kwargs)
+        mock_iter.assert_not_called()
@@ -0,0 +1,137 @@
+import pytest
+import threading
+import time
+import uuid
+from unittest.mock import patch, AsyncMock
+
+from api.constants.common import TaskStatus
+from api.exceptions.api_error import ValidationError
+from api.model.db.finalization_task import FinalizationTask
+from api.service.finalization_queue import FinalizationQueue
+
+
+def make_task(test_id: str, summary: str = None, attempts: int = 1) -> FinalizationTask:
+    return FinalizationTask(
+        test_id=test_id,
+        user_id=str(uuid.uuid4()),
+        summary=summary,
+        attempts=attempts,
+        payload={
+            "job_title": "Python Developer",
+            "knowledge_points": "Python",
+            "interview_time": 10,
+            "language": "English",
+            "model_route": {"model": "gpt-4o", "temperature": 0.5, "max_tokens": None},
+            "interview_result": {
+                "summary": "",
+                "total_question_number": 2,
+                "correct_question_number": 1,
+                "score": 6,
+                "interview_time": 8
+            },
+            "qa_history_text": "Q1 : ...",
+            "qa_history": [{"question": "Q1", "answer": "A", "summary": {}}]
+        }
+    )
+
+@pytest.mark.asyncio
+async def test_process_batch_writes_results_in_batch():
+    """Claimed tasks are summarized and persisted with batched writes"""
+    tasks = [make_task(str(uuid.uuid4()), summary="Good"), make_task(str(uuid.uuid4()))]
+
+    with patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.claim_tasks', new=AsyncMock(return_value=tasks)), \
+         patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.save_summary', new=AsyncMock()) as mock_save_summary, \
+         patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.mark_done', new=AsyncMock()) as mock_mark_done, \
+         patch('api.service.test_result.TestResultService.complete_test_results', new=AsyncMock()) as mock_complete, \
+         patch('api.service.test.TestService.update_tests_status_to_completed', new=AsyncMock()) as mock_update_status, \
+         patch('api.service.finalization_queue.generate_interview_summary', return_value="Generated") as mock_generate:
+
+        queue = FinalizationQueue()
+        processed = await queue.process_batch()
+
+        assert processed == 2
+        # the summary is only generated for the task without one
+        mock_generate.assert_called_once()
+        mock_save_summary.assert_called_once_with(tasks[1].test_id, "Generated", [])
+
+        requests = mock_complete.call_args.args[0]
+        assert [r.summary for r in requests] == ["Good", "Generated"]
+        assert requests[0].score == 6
+        assert requests[0].question_number == 2
+
+        test_ids = [task.test_id for task in tasks]
+        mock_update_status.assert_called_once_with(test_ids)
+        mock_mark_done.assert_called_once_with(test_ids)
+
+@pytest.mark.asyncio
+async def test_process_batch_retries_failed_task():
+    """A failed task is rescheduled, and given up after max_attempts"""
+    tasks = [make_task(str(uuid.uuid4()), attempts=1), make_task(str(uuid.uuid4()), attempts=5)]
+
+    with patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.claim_tasks', new=AsyncMock(return_value=tasks)), \
+         patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.reschedule_task', new=AsyncMock()) as mock_reschedule, \
+         patch('api.service.test_result.TestResultService.complete_test_results', new=AsyncMock()) as mock_complete, \
+         patch('api.service.finalization_queue.generate_interview_summary', side_effect=Exception("LLM error")):
+
+        queue = FinalizationQueue(max_attempts=5)
+        await queue.process_batch()
+
+        mock_complete.assert_not_called()
+        (retry_args, _), (give_up_args, _) = mock_reschedule.call_args_list
+        assert retry_args[0] == tasks[0].test_id and retry_args[2] is not None
+        assert give_up_args[0] == tasks[1].test_id and give_up_args[2] is None
+
+@pytest.mark.asyncio
+async def test_process_batch_generates_summaries_concurrently():
+    """The summaries of a batch are generated at the same time, at most summary_concurrency"""
+    tasks = [make_task(str(uuid.uuid4())) for _ in range(6)]
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def generate(**kwargs):
+        with lock:
+            running.append(kwargs["thread_id"])
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(kwargs["thread_id"])
+        return "Generated"
+
+    with patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.claim_tasks', new=AsyncMock(return_value=tasks)), \
+         patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.save_summary', new=AsyncMock()), \
+         patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.mark_done', new=AsyncMock()), \
+         patch('api.service.test_result.TestResultService.complete_test_results', new=AsyncMock()) as mock_complete, \
+         patch('api.service.test.TestService.update_tests_status_to_completed', new=AsyncMock()), \
+         patch('api.service.finalization_queue.generate_interview_summary', side_effect=generate):
+
+        queue = FinalizationQueue(summary_concurrency=3)
+        await queue.process_batch()
+
+        assert max(peak) == 3
+        # the batch is written in task order
+        assert [r.test_id for r in mock_complete.call_args.args[0]] == [task.test_id for task in tasks]
+
+@pytest.mark.asyncio
+async def test_failed_task_can_be_retried():
+    """A task given up after max_attempts is listed and can be requeued, other tasks can't"""
+    failed = make_task(str(uuid.uuid4()), attempts=5)
+    failed.status = TaskStatus.FAILED.value
+    done = make_task(str(uuid.uuid4()))
+    done.status = TaskStatus.DONE.value
+
+    with patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.get_failed_tasks', new=AsyncMock(return_value=([failed], 1))), \
+         patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.get_task_by_test_id', new=AsyncMock(side_effect=[failed, done])), \
+         patch('api.repositories.finalization_task_repository.FinalizationTaskRepository.requeue_failed_task', new=AsyncMock(return_value=True)) as mock_requeue:
+
+        queue = FinalizationQueue()
+        tasks, metadata = await queue.get_failed_tasks(page=1, page_size=20)
+        assert [task.test_id for task in tasks] == [failed.test_id]
+        assert tasks[0].attempts == 5
+        assert metadata.total_count == 1
+
+        await queue.retry_task(failed.test_id)
+        mock_requeue.assert_called_once_with(failed.test_id)
+
+        with pytest.raises(ValidationError):
+            await queue.retry_task(done.test_id)
@@ -7,4 +7,5 @@ def test_health_check(client):
     """Test health check endpoint"""
     response = client.get("/api/v1/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "ok"} 
\ No newline at end of file
+    assert response.json()["status"] == "ok"
+    assert isinstance(response.json()["llm_circuits"], list) 
\ No newline at end of file
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+
+from api.utils.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_duplicate_calls_share_one_run():
+    """Duplicate calls in flight and late retries get the result of the first call"""
+    single_flight = SingleFlight()
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"question_id": "q2"}
+
+    results = await asyncio.gather(*[single_flight.do("test-1", "q1", answer) for _ in range(5)])
+    late = await single_flight.do("test-1", "q1", answer)
+
+    assert len(calls) == 1
+    assert all(result == {"question_id": "q2"} for result in results)
+    assert late == {"question_id": "q2"}
+
+@pytest.mark.asyncio
+async def test_calls_of_same_key_are_serialized():
+    """Different calls of the same key never overlap"""
+    single_flight = SingleFlight()
+    running = []
+    overlaps = []
+
+    async def answer(name):
+        if running:
+            overlaps.append(name)
+        running.append(name)
+        await asyncio.sleep(0.01)
+        running.remove(name)
+        return name
+
+    await asyncio.gather(*[single_flight.do("test-1", f"q{i}", lambda i=i: answer(i)) for i in range(5)])
+
+    assert overlaps == []
+
+@pytest.mark.asyncio
+async def test_failed_call_is_not_cached():
+    """A failed call raises for every waiter and can be retried"""
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("workflow error")
+
+    async def succeed():
+        return "ok"
+
+    results = await asyncio.gather(single_flight.do("test-1", "q1", fail),
+                                   single_flight.do("test-1", "q1", fail),
+                                   return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert await single_flight.do("test-1", "q1", succeed) == "ok"
+
+@pytest.mark.asyncio
+async def test_cancelled_call_runs_again_for_waiters():
+    """A duplicate call waiting on a call whose client went away runs it itself"""
+    single_flight = SingleFlight()
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"question_id": "q2"}
+
+    first = asyncio.create_task(single_flight.do("test-1", "q1", answer))
+    await asyncio.sleep(0.01)
+    retry = asyncio.create_task(single_flight.do("test-1", "q1", answer))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await retry == {"question_id": "q2"}
+    assert len(calls) == 2
@@ -0,0 +1,50 @@
+import pytest
+from datetime import datetime, UTC
+from unittest.mock import patch
+
+from api.service.skill_analytics import SkillAnalyticsService
+from api.utils.skill_matrix import SkillColumnsBuilder
+from api.exceptions.api_error import ValidationError
+
+
+def make_columns():
+    builder = SkillColumnsBuilder()
+    # Monday 2025-03-03 and Wednesday 2025-03-12
+    builder.add_result("test-1", "user-1", datetime(2025, 3, 3, 9, tzinfo=UTC).timestamp(),
+                       [("Q1", "Python", 5, True), ("Q2", "asyncio", 1, False)])
+    builder.add_result("test-2", "user-2", datetime(2025, 3, 12, 18, tzinfo=UTC).timestamp(),
+                       [("Q1", "Python", 2, False), ("Q2", "asyncio", 4, True)])
+    builder.add_result("test-3", "user-1", None, [("Q1", "Python", 4, True)])
+    return builder.build()
+
+
+@pytest.mark.asyncio
+async def test_skill_heatmap_by_week():
+    """Rows are the weeks (Monday) of the results, unknown dates first"""
+    with patch('api.repositories.test_result_repository.TestResultRepository.load_skill_columns', return_value=make_columns()) as mock_load:
+        service = SkillAnalyticsService()
+        heatmap = await service.get_skill_heatmap("week", job_id="job-1")
+
+        assert heatmap.rows == ["unknown", "2025-03-03", "2025-03-10"]
+        assert heatmap.knowledge_points == ["Python", "asyncio"]
+        assert heatmap.count == [[1, 0], [1, 1], [1, 1]]
+        assert heatmap.correct_ratio == [[1.0, None], [1.0, 0.0], [0.0, 1.0]]
+        mock_load.assert_called_once_with("job-1", None, None, None)
+
+
+@pytest.mark.asyncio
+async def test_skill_heatmap_by_user():
+    with patch('api.repositories.test_result_repository.TestResultRepository.load_skill_columns', return_value=make_columns()):
+        service = SkillAnalyticsService()
+        heatmap = await service.get_skill_heatmap("user", max_rows=1)
+
+        assert heatmap.rows == ["user-2"]
+        assert heatmap.total_rows == 2
+        assert heatmap.mean_score == [[2.0, 4.0]]
+
+
+@pytest.mark.asyncio
+async def test_skill_heatmap_invalid_group():
+    service = SkillAnalyticsService()
+    with pytest.raises(ValidationError):
+        await service.get_skill_heatmap("month")
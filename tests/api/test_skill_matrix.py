@@ -0,0 +1,59 @@
+import numpy as np
+from api.utils.skill_matrix import SkillColumnsBuilder, skill_matrices, rank_weak_skills
+
+
+def build_columns():
+    builder = SkillColumnsBuilder()
+    builder.add_result("test-1", "user-1", 0.0, [
+        ("Q1", "Python", 5, True),
+        ("Q2", "asyncio", 1, False),
+        # follow-up answer of Q2, the last answer counts
+        ("Q2", "asyncio", 3, True),
+        ("Q3", "", 0, False),
+    ])
+    builder.add_result("test-2", "user-2", None, [
+        ("Q1", "Python", 4, True),
+        ("Q2", "asyncio", 0, False),
+        ("Q3", "MongoDB", 0, False),
+    ])
+    return builder.build()
+
+
+def test_columns():
+    """One row per answered question, unknown knowledge points are left out"""
+    columns = build_columns()
+
+    assert columns.size == 5
+    assert columns.skills == ["Python", "asyncio", "MongoDB"]
+    assert columns.result_index.tolist() == [0, 0, 1, 1, 1]
+    assert columns.correct.tolist() == [True, True, True, False, False]
+    assert np.isnan(columns.create_dates[1])
+
+
+def test_skill_matrices():
+    """Count, correct ratio and mean score of every result and knowledge point"""
+    columns = build_columns()
+    matrices = skill_matrices(columns, columns.result_index, 2)
+
+    assert matrices["count"].tolist() == [[1, 1, 0], [1, 1, 1]]
+    assert matrices["correct_ratio"][0].tolist()[:2] == [1.0, 1.0]
+    assert np.isnan(matrices["correct_ratio"][0][2])
+    assert matrices["mean_score"][1].tolist() == [4.0, 0.0, 0.0]
+
+
+def test_rank_weak_skills():
+    """The weakest knowledge point first, rare ones are left out"""
+    builder = SkillColumnsBuilder()
+    for i in range(20):
+        builder.add_result(f"test-{i}", f"user-{i}", None, [
+            ("Q1", "Python", 4, True),
+            ("Q2", "asyncio", 1, i % 4 == 0),
+            ("Q3", "MongoDB", 3, i % 2 == 0),
+        ] + ([("Q4", "Rust", 0, False)] if i < 2 else []))
+
+    ranking = rank_weak_skills(builder.build(), min_count=5)
+
+    assert [skill["knowledge_point"] for skill in ranking] == ["asyncio", "MongoDB", "Python"]
+    assert ranking[0]["correct_ratio"] == 0.25
+    assert ranking[0]["smoothed_correct_ratio"] > 0.25
+    assert rank_weak_skills(SkillColumnsBuilder().build()) == []
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+from api.conf.config import Config
+from api.service.chat import ChatService
+
+def test_workflow_built_lazily_once():
+    """The workflow graph is compiled on first use, once even with concurrent first uses"""
+    with patch("api.service.chat.build_graph", return_value=MagicMock()) as mock_build_graph:
+        service = ChatService()
+        mock_build_graph.assert_not_called()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            graphs = list(pool.map(lambda _: service.workflow, range(8)))
+
+        mock_build_graph.assert_called_once()
+        assert all(graph is mock_build_graph.return_value for graph in graphs)
+
+def test_warm_up_builds_workflow():
+    """warm_up compiles the graph ahead of the first interview"""
+    with patch("api.service.chat.build_graph", return_value=MagicMock()) as mock_build_graph:
+        service = ChatService()
+        service.warm_up()
+        assert service.workflow is mock_build_graph.return_value
+        mock_build_graph.assert_called_once()
+
+def test_config_loaded_once():
+    """The config file is read once per process"""
+    config = Config.load_config()
+    assert Config.load_config() is config
+    assert config.app.api_v1_str == "/api/v1"
+    assert config.llm.routes.analysis.model
+
+# Imports the app in a fresh interpreter, where no MongoDB connection is defined yet, then runs
+# its lifespan against an address nothing listens on (MongoEngine connects on the first query)
+STARTUP_SCRIPT = """
+import asyncio
+from unittest.mock import patch
+from mongoengine.connection import get_connection, ConnectionFailure
+import api.main
+
+try:
+    get_connection()
+    raise SystemExit("connected at import time")
+except ConnectionFailure:
+    pass
+
+async def run_lifespan():
+    with patch.object(api.main.finalization_queue, "start"), \\
+            patch.object(api.main.deadline_scheduler, "start"), \\
+            patch("api.service.chat.build_graph"):
+        async with api.main.lifespan(api.main.app):
+            get_connection()
+
+asyncio.run(run_lifespan())
+"""
+
+def test_app_starts_without_a_connection():
+    """api.main imports before MongoDB is connected, the lifespan connects it"""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = {**os.environ, "MONGODB_URI": "mongodb://localhost:1/startup_test"}
+    result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=root, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,64 @@
+import random
+import pytest
+from api.utils.tdigest import TDigest
+
+
+def exact_rank(values, x):
+    """Fraction of the values lower than x, equal values count half"""
+    return (sum(v < x for v in values) + sum(v == x for v in values) / 2) / len(values)
+
+
+DISTRIBUTIONS = {
+    "normal": lambda rng: min(100.0, max(0.0, rng.gauss(65, 15))),
+    "integer": lambda rng: min(100, max(0, round(rng.gauss(65, 15)))),
+    "tens": lambda rng: 10 * rng.randint(0, 10),
+    "skewed": lambda rng: 100 * rng.random() ** 3,
+}
+
+
+@pytest.mark.parametrize("distribution", DISTRIBUTIONS)
+def test_rank_accuracy(distribution):
+    """The sketch ranks are within 1% of the exact ranks"""
+    rng = random.Random(7)
+    values = [DISTRIBUTIONS[distribution](rng) for _ in range(5000)]
+    digest = TDigest()
+    digest.update(values)
+
+    for x in [rng.choice(values) for _ in range(100)] + [0, 50, 100]:
+        assert abs(digest.cdf(x) - exact_rank(values, x)) < 0.01
+
+
+def test_repeated_scores_are_exact():
+    """Scores on a coarse scale keep their own centroid and an exact rank"""
+    values = [10 * (i % 11) for i in range(1000)]
+    digest = TDigest()
+    digest.update(values)
+
+    for x in range(0, 101, 10):
+        assert digest.cdf(x) == pytest.approx(exact_rank(values, x))
+
+
+def test_merge_and_serialization():
+    """Merged digests rank like the digest of all the values, and survive a round trip"""
+    rng = random.Random(11)
+    values = [rng.uniform(0, 100) for _ in range(4000)]
+    left, right = TDigest(), TDigest()
+    left.update(values[:1500])
+    right.update(values[1500:])
+    merged = left.merge(right)
+
+    restored = TDigest.from_bytes(merged.to_bytes())
+    assert len(merged.to_bytes()) <= 16 * (2 + 2 * merged.compression)
+    assert restored.count == 4000
+    for x in (5, 25, 50, 75, 95):
+        assert abs(restored.cdf(x) - exact_rank(values, x)) < 0.01
+
+
+def test_remove_and_empty():
+    digest = TDigest()
+    assert digest.cdf(50) is None
+
+    digest.update([40, 60, 80])
+    digest.remove(80)
+    assert digest.count == 2
+    assert digest.cdf(60) == pytest.approx(0.75)
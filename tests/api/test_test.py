@@ -27,6 +27,7 @@ def mock_test():
     # Remove question_ids field
     test.examination_points = ["React Basics", "Advanced JavaScript Features"]
     test.test_time = 60  # 60 minutes
+    test.model_routes = {}
     now = datetime.now(UTC)
     test.create_date = now
     test.start_date = now + timedelta(days=1)
@@ -305,6 +306,23 @@ class TestTestAPI:
         # Validate mock call
         mock_get_test_by_id.assert_called_once_with("nonexistent")
 
+@patch("api.repositories.test_repository.TestRepository.create_test")
+def test_create_test_with_model_routes(mock_create_test, mock_test):
+    """Model routes are stored on the test, within the allowed models and the max_tokens cap"""
+    mock_test.model_routes = {"analysis": {"model": "gpt-4o", "temperature": 0}}
+    mock_create_test.return_value = mock_test
+    test_data = {"type": "coding", "language": "Chinese", "difficulty": "medium",
+                 "model_routes": {"analysis": {"model": "gpt-4o", "temperature": 0}}}
+
+    response = client.post("/api/v1/test", json=test_data)
+    assert response.status_code == 200
+    assert mock_create_test.call_args.args[0].model_routes == {"analysis": {"model": "gpt-4o", "temperature": 0}}
+
+    # a model outside the whitelist or an unbounded max_tokens is rejected
+    for model_routes in ({"analysis": {"model": "o1-pro"}}, {"summary": {"max_tokens": 100000}}):
+        response = client.post("/api/v1/test", json={**test_data, "model_routes": model_routes})
+        assert response.status_code == 400
+
 def test_create_test_invalid_params(client):
     """Test validation error handling"""
     test_data = {
@@ -4,9 +4,13 @@ from unittest.mock import patch, MagicMock
 from datetime import datetime, UTC
 
 from api.model.db.test_result import TestResult
+from api.model.db.test_result_stats import TestResultStats
+from api.model.db.qa_entry import QAEntry
 from api.model.api.test_result import CreateTestResultRequest
 from api.service.test_result import TestResultService
 from api.exceptions.api_error import NotFoundError, ValidationError
+from pydantic import ValidationError as RequestValidationError
+from api.utils.tdigest import TDigest
 
 @pytest.mark.asyncio
 async def test_create_test_result_new():
@@ -19,7 +23,7 @@ async def test_create_test_result_new():
         test_id=test_id,
         user_id=user_id,
         summary="Test summary",
-        score=85.5,
+        score=8.5,
         question_number=10,
         correct_number=8,
         elapse_time=30,
@@ -45,7 +49,7 @@ async def test_create_test_result_new():
             test_id=test_id,
             user_id=user_id,
             summary="Test summary",
-            score=85.5,
+            score=8.5,
             question_number=10,
             correct_number=8,
             elapse_time=30,
@@ -64,7 +68,7 @@ async def test_create_test_result_new():
         assert result.test_id == test_id
         assert result.user_id == user_id
         assert result.summary == "Test summary"
-        assert result.score == 85.5
+        assert result.score == 8.5
         assert result.question_number == 10
         assert result.correct_number == 8
         assert result.elapse_time == 30
@@ -87,7 +91,7 @@ async def test_create_test_result_update_existing():
         test_id=test_id,
         user_id=user_id,
         summary="Updated summary",
-        score=90.0,
+        score=9.0,
         question_number=10,
         correct_number=9,
         elapse_time=25,
@@ -112,7 +116,7 @@ async def test_create_test_result_update_existing():
             test_id=test_id,
             user_id=user_id,
             summary="Original summary",
-            score=85.0,
+            score=8.0,
             question_number=10,
             correct_number=7,
             elapse_time=30,
@@ -125,7 +129,7 @@ async def test_create_test_result_update_existing():
             test_id=test_id,
             user_id=user_id,
             summary="Updated summary",
-            score=90.0,
+            score=9.0,
             question_number=10,
             correct_number=9,
             elapse_time=25,
@@ -143,7 +147,7 @@ async def test_create_test_result_update_existing():
         # Validate the result
         assert result.test_id == test_id
         assert result.summary == "Updated summary"
-        assert result.score == 90.0
+        assert result.score == 9.0
         assert result.question_number == 10
         assert result.correct_number == 9
         assert result.elapse_time == 25
@@ -153,6 +157,14 @@ async def test_create_test_result_update_existing():
         mock_get_result.assert_called_once_with(test_id)
         mock_update.assert_called_once()
 
+def test_create_test_result_score_scale():
+    """Scores are on the interview scale (0-10), the scale of the workflow results and the statistics"""
+    values = dict(test_id=str(uuid.uuid4()), user_id=str(uuid.uuid4()), summary="", question_number=10,
+                  correct_number=8, elapse_time=30, qa_history=[])
+    assert CreateTestResultRequest(score=10, **values).score == 10
+    with pytest.raises(RequestValidationError):
+        CreateTestResultRequest(score=85.5, **values)
+
 @pytest.mark.asyncio
 async def test_get_test_result_by_test_id():
     """Test getting a test result by test ID"""
@@ -166,7 +178,7 @@ async def test_get_test_result_by_test_id():
             test_id=test_id,
             user_id=user_id,
             summary="Test summary",
-            score=85.5,
+            score=8.5,
             question_number=10,
             correct_number=8,
             elapse_time=30,
@@ -182,7 +194,7 @@ async def test_get_test_result_by_test_id():
         assert result.test_id == test_id
         assert result.user_id == user_id
         assert result.summary == "Test summary"
-        assert result.score == 85.5
+        assert result.score == 8.5
         assert result.question_number == 10
         assert result.correct_number == 8
         assert result.elapse_time == 30
@@ -224,7 +236,7 @@ async def test_get_test_results_by_user_id():
                 test_id=str(uuid.uuid4()),
                 user_id=user_id,
                 summary="Test summary 1",
-                score=85.5,
+                score=8.5,
                 question_number=10,
                 correct_number=8,
                 elapse_time=30,
@@ -234,7 +246,7 @@ async def test_get_test_results_by_user_id():
                 test_id=str(uuid.uuid4()),
                 user_id=user_id,
                 summary="Test summary 2",
-                score=90.0,
+                score=9.0,
                 question_number=10,
                 correct_number=9,
                 elapse_time=25,
@@ -255,3 +267,177 @@ async def test_get_test_results_by_user_id():
         
         # Validate method call
         mock_get.assert_called_once_with(user_id)
+
+@pytest.mark.asyncio
+async def test_get_usage_by_job():
+    """Test the per-job LLM usage report"""
+    with patch('api.repositories.test_result_repository.TestResultRepository.aggregate_usage_by_job') as mock_aggregate:
+        mock_aggregate.return_value = [
+            {"_id": "job-1", "tests": 2, "calls": 20, "input_tokens": 30000, "output_tokens": 4000,
+             "cached_tokens": 12000, "latency": 40.0, "wall_time": 48.5}
+        ]
+        
+        service = TestResultService()
+        reports = await service.get_usage_by_job("job-1")
+        
+        assert len(reports) == 1
+        assert reports[0].key == "job-1"
+        assert reports[0].cached_tokens == 12000
+        assert reports[0].avg_tokens_per_test == 17000
+        assert reports[0].avg_wall_time_per_test == 24.25
+        mock_aggregate.assert_called_once_with("job-1")
+
+@pytest.mark.asyncio
+async def test_get_usage_by_model():
+    """Test the per-model LLM usage report"""
+    with patch('api.repositories.test_result_repository.TestResultRepository.aggregate_usage_by_model') as mock_aggregate:
+        mock_aggregate.return_value = [
+            {"_id": {"model": "gpt-4o-mini", "node": "analysis"}, "tests": 3, "calls": 15, "input_tokens": 9000,
+             "output_tokens": 900, "cached_tokens": 0, "latency": 12.0, "wall_time": 13.0}
+        ]
+        
+        service = TestResultService()
+        reports = await service.get_usage_by_model()
+        
+        assert reports[0].key == "gpt-4o-mini"
+        assert reports[0].node == "analysis"
+        assert reports[0].tests == 3
+        mock_aggregate.assert_called_once_with(None)
+
+@pytest.mark.asyncio
+async def test_update_result_replaces_its_score_statistics():
+    """An updated result is removed from the rollup with its previous values and added with the new ones"""
+    test_id = str(uuid.uuid4())
+    user_id = str(uuid.uuid4())
+    request = CreateTestResultRequest(test_id=test_id, user_id=user_id, summary="Updated", score=9.0,
+                                      question_number=10, correct_number=9, elapse_time=25, qa_history=[],
+                                      job_id="job-1")
+    existing_result = TestResult(test_id=test_id, user_id=user_id, summary="Original", score=4.0,
+                                 question_number=10, correct_number=4, elapse_time=12, qa_history=[], job_id="job-1")
+    test = MagicMock(job_id="job-1", difficulty="medium", language="English")
+
+    with patch('api.repositories.test_repository.TestRepository.get_test_by_id', return_value=test), \
+         patch('api.repositories.test_result_repository.TestResultRepository.get_result_by_test_id', return_value=existing_result), \
+         patch('api.repositories.test_result_repository.TestResultRepository.create_result', side_effect=lambda result: result), \
+         patch('api.repositories.test_result_stats_repository.TestResultStatsRepository.apply_increments') as mock_apply:
+
+        service = TestResultService()
+        await service.complete_test_result(request)
+
+        (removed_key, removed), (added_key, added) = mock_apply.call_args.args[0]
+        assert removed_key == added_key == {"job_id": "job-1", "difficulty": "medium", "language": "English"}
+        assert removed["count"] == -1 and removed["score_sum"] == -4.0
+        assert removed["score_histogram.4"] == -1 and removed["elapse_time_histogram.10"] == -1
+        assert added["count"] == 1 and added["correct_sum"] == 9
+        assert added["score_histogram.9"] == 1 and added["elapse_time_histogram.20"] == 1
+
+@pytest.mark.asyncio
+async def test_get_score_stats():
+    """Test the per-job score statistics read from the rollup"""
+    stats = TestResultStats(job_id="job-1", difficulty="medium", language="English", count=4,
+                            score_sum=28.0, score_sq_sum=206.0, question_sum=40, correct_sum=30,
+                            elapse_time_sum=60, elapse_time_sq_sum=1000,
+                            score_histogram={"5": 1, "7": 2, "9": 1, "6": 0},
+                            elapse_time_histogram={"10": 2, "20": 2})
+
+    with patch('api.repositories.test_result_stats_repository.TestResultStatsRepository.get_stats') as mock_get_stats:
+        mock_get_stats.return_value = [stats]
+
+        service = TestResultService()
+        reports = await service.get_score_stats("job-1", language="English")
+
+        assert reports[0].mean_score == 7.0
+        assert reports[0].score_variance == 2.5
+        assert reports[0].correct_ratio == 0.75
+        assert reports[0].score_histogram == {"5": 1, "7": 2, "9": 1}
+        assert reports[0].mean_elapse_time == 15.0
+        assert reports[0].elapse_time_variance == 25.0
+        mock_get_stats.assert_called_once_with("job-1", None, "English")
+
+@pytest.mark.asyncio
+async def test_test_result_percentile_rank():
+    """The result carries its percentile rank in the score sketch of its job and difficulty"""
+    test_id = str(uuid.uuid4())
+    test_result = TestResult(test_id=test_id, user_id=str(uuid.uuid4()), summary="", score=8.0,
+                             question_number=10, correct_number=8, elapse_time=20, qa_history=[], job_id="job-1")
+    digest = TDigest()
+    digest.update([4.0, 6.0, 8.0, 9.0])
+
+    with patch('api.repositories.test_result_repository.TestResultRepository.get_result_by_test_id', return_value=test_result), \
+         patch('api.repositories.test_repository.TestRepository.get_stats_keys', return_value={test_id: {"difficulty": "medium"}}), \
+         patch('api.repositories.score_sketch_repository.ScoreSketchRepository.get_digests') as mock_get_digests:
+        mock_get_digests.return_value = {("job-1", "medium"): digest}
+
+        service = TestResultService()
+        result = await service.get_test_result_by_test_id(test_id)
+
+        # two lower scores, the result itself counts half
+        assert result.percentile_rank == 62.5
+        mock_get_digests.assert_called_once_with([("job-1", "medium")])
+
+@pytest.mark.asyncio
+async def test_get_qa_history_page():
+    """The Q&A history is paginated from the entries collection"""
+    test_id = str(uuid.uuid4())
+    entries = [QAEntry(test_id=test_id, index=i, question=f"Q{i}", answer="A", score=3, is_correct=True)
+               for i in (20, 21)]
+
+    with patch('api.repositories.qa_entry_repository.QAEntryRepository.get_entries', return_value=(entries, 22)) as mock_get_entries, \
+         patch('api.repositories.test_result_repository.TestResultRepository.get_result_by_test_id') as mock_get_result:
+        service = TestResultService()
+        history, metadata = await service.get_qa_history(test_id, page=2, page_size=20)
+
+        assert [entry.index for entry in history] == [20, 21]
+        assert history[0].question == "Q20" and history[0].score == 3
+        assert metadata.total_count == 22 and metadata.total_pages == 2
+        assert not metadata.has_next and metadata.has_previous
+        mock_get_entries.assert_called_once_with(test_id, 20, 20)
+        mock_get_result.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_qa_history_not_migrated():
+    """A result still embedding its history is paginated from it"""
+    test_id = str(uuid.uuid4())
+    test_result = TestResult(test_id=test_id, user_id=str(uuid.uuid4()), summary="", score=8.0,
+                             question_number=3, correct_number=2, elapse_time=20)
+    qa_history = [{"question": f"Q{i}", "answer": "A", "feedback": "Good"} for i in range(3)]
+
+    with patch('api.repositories.qa_entry_repository.QAEntryRepository.get_entries', return_value=([], 0)), \
+         patch('api.repositories.test_result_repository.TestResultRepository.get_result_by_test_id', return_value=test_result), \
+         patch('api.repositories.test_result_repository.TestResultRepository.get_embedded_qa_history', return_value=qa_history):
+        service = TestResultService()
+        history, metadata = await service.get_qa_history(test_id, page=2, page_size=2)
+
+        assert [(entry.index, entry.question, entry.feedback) for entry in history] == [(2, "Q2", "Good")]
+        assert metadata.total_count == 3 and metadata.total_pages == 2
+
+@pytest.mark.asyncio
+async def test_get_qa_history_not_found():
+    """Test getting the Q&A history of a non-existent test result"""
+    with patch('api.repositories.qa_entry_repository.QAEntryRepository.get_entries', return_value=([], 0)), \
+         patch('api.repositories.test_result_repository.TestResultRepository.get_result_by_test_id', return_value=None):
+        service = TestResultService()
+        with pytest.raises(NotFoundError):
+            await service.get_qa_history(str(uuid.uuid4()))
+
+@pytest.mark.asyncio
+async def test_complete_test_results_stores_histories_apart():
+    """The batched results are written without their history, the histories go to the entries collection"""
+    test_ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    requests = [CreateTestResultRequest(test_id=test_id, user_id="user-1", summary="", score=5.0, question_number=1,
+                                        correct_number=1, elapse_time=10, job_id="job-1",
+                                        qa_history=[{"question": "Q1", "answer": test_id}])
+                for test_id in test_ids]
+
+    with patch('api.repositories.test_repository.TestRepository.get_stats_keys', return_value={}), \
+         patch('api.repositories.test_result_repository.TestResultRepository.get_stats_values', return_value={}), \
+         patch('api.repositories.qa_entry_repository.QAEntryRepository.replace_entries') as mock_replace, \
+         patch('api.repositories.test_result_repository.TestResultRepository.bulk_upsert_results', return_value=2) as mock_upsert, \
+         patch('api.repositories.test_result_stats_repository.TestResultStatsRepository.apply_increments'), \
+         patch('api.repositories.score_sketch_repository.ScoreSketchRepository.add_scores'):
+        service = TestResultService()
+        assert await service.complete_test_results(requests) == 2
+
+        histories = mock_replace.call_args.args[0]
+        assert histories == {test_id: [{"question": "Q1", "answer": test_id}] for test_id in test_ids}
+        assert all("qa_history" not in result for result in mock_upsert.call_args.args[0])
@@ -0,0 +1,51 @@
+import pytest
+from api.model.db.test import Test
+from api.model.db.test_result import TestResult
+from api.scripts.init_db import PLAN_DOCUMENTS, planned_indexes, redundant_indexes, apply_plan, check_plan
+
+@pytest.fixture(autouse=True)
+async def cleanup():
+    """Clean up test data after each test"""
+    yield
+    Test.objects.delete()
+    TestResult.objects.delete()
+
+def test_redundant_indexes():
+    """Prefixes of another index are redundant, unique and sparse indexes are not"""
+    plain = {"unique": False, "sparse": False}
+    indexes = {
+        (("user_id", 1),): plain,
+        (("user_id", 1), ("create_date", -1)): plain,
+        (("status", -1),): plain,
+        (("status", 1), ("expire_date", 1)): plain,
+        (("test_id", 1),): {"unique": True, "sparse": False},
+        (("test_id", 1), ("index", 1)): plain,
+        (("deadline_date", 1),): {"unique": False, "sparse": True},
+        (("deadline_date", 1), ("status", 1)): plain,
+        (("job_id", 1), ("status", 1)): plain,
+        (("status", 1), ("job_id", 1)): plain,
+    }
+    assert sorted(redundant_indexes(indexes)) == [
+        ((("status", -1),), (("status", 1), ("expire_date", 1))),
+        ((("user_id", 1),), (("user_id", 1), ("create_date", -1))),
+    ]
+
+def test_plan_has_no_redundant_indexes():
+    """No document declares an index served by another one"""
+    for document in PLAN_DOCUMENTS:
+        assert redundant_indexes(planned_indexes(document)) == [], document._get_collection_name()
+
+def test_apply_plan_is_idempotent():
+    """Indexes not in the plan are dropped once, the planned ones are kept"""
+    Test._get_collection().create_index("status", name="status_1")
+    Test._get_collection().create_index("user_id", name="user_id_1")
+
+    assert sorted(apply_plan(Test)) == ["status_1", "user_id_1"]
+    assert apply_plan(Test) == []
+    assert "status_1_expire_date_1" in Test._get_collection().index_information()
+
+def test_repository_queries_use_indexes():
+    """Every repository query is served by an index of the plan"""
+    for document in PLAN_DOCUMENTS:
+        apply_plan(document)
+    assert check_plan() == []
@@ -0,0 +1,59 @@
+import pytest
+from api.model.db.qa_entry import QAEntry
+from api.model.db.test_result import TestResult
+from api.repositories.qa_entry_repository import QAEntryRepository
+from api.repositories.test_result_repository import TestResultRepository
+
+@pytest.fixture(autouse=True)
+async def cleanup():
+    """Clean up test data after each test"""
+    yield
+    TestResult.objects.delete()
+    QAEntry.objects.delete()
+
+def make_qa(question: str, knowledge_point: str = "React", score: int = 4) -> dict:
+    """A qa_history entry as written by the interview workflow"""
+    return {"question": question, "answer": f"Answer of {question}",
+            "summary": {"question": {"question": question, "question_number": 1, "question_type": "Essay",
+                                     "knowledge_point": knowledge_point, "answer": ""},
+                        "answer": {"is_valid": True, "giveup": False, "suggest_more_details": False,
+                                   "follow_up_question": "", "feedback": "Good", "is_correct": score >= 3,
+                                   "analysis": "", "score": score},
+                        "is_interview_over": False, "summary": f"{question}: {score}/5"}}
+
+@pytest.mark.asyncio
+async def test_replace_entries_pages_and_shrinks():
+    """The entries are typed and paginated in order, a shorter history removes the extra entries"""
+    repo = QAEntryRepository()
+    assert await repo.replace_entries({"qa-1": [make_qa(f"Q{i}") for i in range(5)]}) == 5
+
+    entries, total = await repo.get_entries("qa-1", skip=2, limit=2)
+    assert total == 5
+    assert [e.question for e in entries] == ["Q2", "Q3"]
+    assert entries[0].knowledge_point == "React" and entries[0].score == 4 and entries[0].is_correct
+    assert entries[0].feedback == "Good" and entries[0].summary == "Q2: 4/5"
+
+    await repo.replace_entries({"qa-1": [make_qa("New")]})
+    entries, total = await repo.get_entries("qa-1")
+    assert total == 1
+    assert entries[0].question == "New"
+
+@pytest.mark.asyncio
+async def test_migrate_qa_histories():
+    """The embedded histories are moved to the entries and removed from the results"""
+    for i in range(3):
+        TestResult(test_id=f"qa-{i}", user_id="user-1", summary="", score=5, question_number=2,
+                   correct_number=1, elapse_time=10,
+                   qa_history=[make_qa("Q1"), {"question": "Q2", "answer": "A", "score": 2.5}]).save()
+
+    assert await TestResultRepository().migrate_qa_histories(batch_size=2) == 3
+    assert await TestResultRepository().migrate_qa_histories() == 0
+
+    assert TestResult._get_collection().count_documents({"qa_history": {"$exists": True}}) == 0
+    entries, total = await QAEntryRepository().get_entries("qa-1")
+    assert total == 2
+    assert entries[1].question == "Q2" and entries[1].score == 2.5 and entries[1].knowledge_point is None
+
+    columns = await TestResultRepository().load_skill_columns()
+    assert columns.size == 3
+    assert columns.skills == ["React"]
@@ -0,0 +1,37 @@
+import pytest
+from api.model.db.test import Test
+from api.model.db.test_result import TestResult
+from api.model.db.score_sketch import ScoreSketch
+from api.repositories.score_sketch_repository import ScoreSketchRepository, COMPACT_THRESHOLD
+
+@pytest.fixture(autouse=True)
+async def cleanup():
+    """Clean up test data after each test"""
+    yield
+    Test.objects.delete()
+    TestResult.objects.delete()
+    ScoreSketch.objects.delete()
+
+@pytest.mark.asyncio
+async def test_incremental_sketch_matches_rebuild():
+    """Scores added one by one (with compactions) rank like the rebuilt sketch"""
+    repo = ScoreSketchRepository()
+    scores = [float(i % 101) for i in range(3 * COMPACT_THRESHOLD)]
+    for i, score in enumerate(scores):
+        Test(test_id=f"sketch-{i}", activate_code=f"sketch-{i}", user_id="user-1", job_id="job-1",
+             type="interview", language="English", difficulty="medium", test_time=30).save()
+        TestResult(test_id=f"sketch-{i}", user_id="user-1", summary="", score=score, question_number=10,
+                   correct_number=5, elapse_time=10, qa_history=[]).save()
+        await repo.add_scores({("job-1", "medium"): ([score], [])})
+
+    document = ScoreSketch._get_collection().find_one({"job_id": "job-1"})
+    assert document["version"] >= 2
+    assert len(document["pending"]) < COMPACT_THRESHOLD
+
+    incremental = (await repo.get_digests([("job-1", "medium")]))[("job-1", "medium")]
+    assert await repo.rebuild() == 1
+    rebuilt = (await repo.get_digests([("job-1", "medium")]))[("job-1", "medium")]
+
+    assert incremental.count == rebuilt.count == len(scores)
+    for x in (10, 50, 90):
+        assert abs(incremental.cdf(x) - rebuilt.cdf(x)) < 0.01
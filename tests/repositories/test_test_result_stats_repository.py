@@ -0,0 +1,63 @@
+import pytest
+from api.model.db.test import Test
+from api.model.db.test_result import TestResult
+from api.model.db.test_result_stats import TestResultStats
+from api.repositories.test_result_stats_repository import TestResultStatsRepository, stats_increments
+from agent.interview_stats import MAX_INTERVIEW_SCORE
+
+@pytest.fixture(autouse=True)
+async def cleanup():
+    """Clean up test data after each test"""
+    yield
+    Test.objects.delete()
+    TestResult.objects.delete()
+    TestResultStats.objects.delete()
+
+RESULTS = [
+    # test_id, difficulty, score, question_number, correct_number, elapse_time
+    ("stats-1", "easy", 4.0, 10, 4, 12),
+    ("stats-2", "easy", 9.0, 10, 9, 25),
+    ("stats-3", "easy", 10.0, 5, 5, 8),
+    ("stats-4", "hard", 3.0, 8, 2, 130),
+]
+
+def save_results():
+    for test_id, difficulty, score, question_number, correct_number, elapse_time in RESULTS:
+        Test(test_id=test_id, activate_code=test_id, user_id="user-1", job_id="job-1", type="interview",
+             language="English", difficulty=difficulty, test_time=30).save()
+        TestResult(test_id=test_id, user_id="user-1", summary="", score=score, question_number=question_number,
+                   correct_number=correct_number, elapse_time=elapse_time, qa_history=[]).save()
+
+def as_dict(stats: TestResultStats) -> dict:
+    fields = ("count", "score_sum", "score_sq_sum", "question_sum", "correct_sum", "elapse_time_sum",
+              "elapse_time_sq_sum", "score_histogram", "elapse_time_histogram")
+    return {field: stats[field] for field in fields}
+
+@pytest.mark.asyncio
+async def test_rebuild_matches_incremental_updates():
+    """The backfill pipeline and the incremental updates give the same rollup"""
+    save_results()
+    repo = TestResultStatsRepository()
+
+    assert await repo.rebuild() == 2
+    rebuilt = {s.difficulty: as_dict(s) for s in await repo.get_stats("job-1")}
+
+    TestResultStats.objects.delete()
+    await repo.apply_increments([
+        ({"job_id": "job-1", "difficulty": difficulty, "language": "English"},
+         stats_increments(score, question_number, correct_number, elapse_time))
+        for _, difficulty, score, question_number, correct_number, elapse_time in RESULTS
+    ])
+    incremental = {s.difficulty: as_dict(s) for s in await repo.get_stats("job-1")}
+
+    assert rebuilt == incremental
+    assert rebuilt["easy"]["count"] == 3
+    assert rebuilt["easy"]["score_histogram"] == {"4": 1, "9": 1, "10": 1}
+    assert rebuilt["hard"]["elapse_time_histogram"] == {"120": 1}
+
+def test_workflow_scores_spread_over_the_buckets():
+    """Scores on the interview scale (0-10) each get their own bucket"""
+    assert stats_increments(0, 5, 0, 10)["score_histogram.0"] == 1
+    assert stats_increments(6, 5, 3, 10)["score_histogram.6"] == 1
+    assert stats_increments(6.5, 5, 3, 10)["score_histogram.6"] == 1
+    assert stats_increments(MAX_INTERVIEW_SCORE, 5, 5, 10)[f"score_histogram.{MAX_INTERVIEW_SCORE}"] == 1
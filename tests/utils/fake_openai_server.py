@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Dict
+
+
+class FakeOpenAIServer:
+    """
+    Local OpenAI-compatible chat completions server for tests
+
+    Each request takes the next scripted action, e.g. {"delay": 2} or {"status": 500},
+    then default_action (answer immediately with `content` unless set, e.g. to inject
+    failures into every request). Streamed requests get one chunk per word, "chunk_delay"
+    apart, and `streamed` counts the chunks actually written.
+    """
+
+    def __init__(self, content: str = "ok"):
+        self.content = content
+        self.default_action: Dict = {}
+        self.actions: List[Dict] = []
+        self.requests: List[Dict] = []
+        self.streamed = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def script(self, *actions: Dict) -> None:
+        with self._lock:
+            self.actions.extend(actions)
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _next_action(self, body: Dict) -> Dict:
+        with self._lock:
+            self.requests.append(body)
+            return self.actions.pop(0) if self.actions else self.default_action
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                action = server._next_action(body)
+                time.sleep(action.get("delay", 0))
+
+                status = action.get("status", 200)
+                if status == 200 and body.get("stream"):
+                    self._stream(body, action)
+                    return
+                if status != 200:
+                    payload = {"error": {"message": "injected failure", "type": "server_error"}}
+                else:
+                    payload = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": action.get("content", server.content)},
+                            "finish_reason": "stop"
+                        }],
+                        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+                    }
+
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client gave up on this attempt
+                    pass
+
+            def _stream(self, body: Dict, action: Dict):
+                def chunk(delta: Dict, finish_reason=None, usage=None) -> bytes:
+                    payload = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+                        "usage": usage
+                    }
+                    return f"data: {json.dumps(payload)}\n\n".encode()
+
+                words = action.get("content", server.content).split(" ")
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for i, word in enumerate(words):
+                        time.sleep(action.get("chunk_delay", 0))
+                        self.wfile.write(chunk({"role": "assistant", "content": word if i == 0 else " " + word}))
+                        self.wfile.flush()
+                        with server._lock:
+                            server.streamed += 1
+                    self.wfile.write(chunk({}, finish_reason="stop"))
+                    self.wfile.write(chunk({}, usage={"prompt_tokens": 10, "completion_tokens": len(words),
+                                                      "total_tokens": 10 + len(words)}))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client closed the stream
+                    pass
+
+        return Handler
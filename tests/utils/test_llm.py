@@ -0,0 +1,62 @@
+from utils.llm import resolve_route, summarize_usage, check_route_overrides, ModelRoute
+
+
+ROUTES = {
+    "default": {"model": "gpt-4o", "temperature": 0.5, "max_tokens": None},
+    "analysis": {"model": "gpt-4o-mini", "temperature": 0, "max_tokens": 512},
+}
+
+
+def test_resolve_route_node_and_default():
+    """Node settings are applied on top of the default entry"""
+    assert resolve_route("analysis", ROUTES) == ModelRoute(model="gpt-4o-mini", temperature=0, max_tokens=512)
+    assert resolve_route("summary", ROUTES) == ModelRoute(model="gpt-4o", temperature=0.5, max_tokens=None)
+    assert resolve_route("summary") == ModelRoute()
+
+
+def test_resolve_route_overrides():
+    """Per-test overrides win over the routing table, unknown keys are ignored"""
+    overrides = {"analysis": {"model": "deepseek-v3", "unknown": 1}}
+
+    route = resolve_route("analysis", ROUTES, overrides)
+
+    assert route == ModelRoute(model="deepseek-v3", temperature=0, max_tokens=512)
+    assert resolve_route("kickoff", ROUTES, overrides).model == "gpt-4o"
+
+
+def test_check_route_overrides():
+    """Overrides may only use the allowed models and stay under the max_tokens cap"""
+    allowed = ["gpt-4o", "gpt-4o-mini"]
+
+    assert check_route_overrides(None, allowed, 2048) == []
+    assert check_route_overrides({"analysis": {"model": "gpt-4o", "temperature": 0, "max_tokens": 512}}, allowed, 2048) == []
+
+    problems = check_route_overrides({"analysis": {"model": "o1-pro"},
+                                      "summary": {"max_tokens": 100000},
+                                      "kickoff": {"max_tokens": None},
+                                      "plan": {"api_key": "x"}}, allowed, 2048)
+    assert len(problems) == 4
+    assert any("o1-pro" in problem for problem in problems)
+
+
+def test_summarize_usage():
+    """Usage records are summed overall and by node / model"""
+    records = [
+        {"node": "analysis", "model": "gpt-4o-mini", "input_tokens": 100, "output_tokens": 20, "cached_tokens": 0,
+         "latency": 0.5, "wall_time": 0.6},
+        {"node": "analysis", "model": "gpt-4o-mini", "input_tokens": 120, "output_tokens": 30, "cached_tokens": 64,
+         "latency": 0.4, "wall_time": 0.4},
+        {"node": "kickoff", "model": "gpt-4o", "input_tokens": 800, "output_tokens": 50, "cached_tokens": 0,
+         "latency": 1.2, "wall_time": 1.5},
+    ]
+
+    usage = summarize_usage(records)
+
+    assert usage["calls"] == 3
+    assert usage["input_tokens"] == 1020
+    assert usage["cached_tokens"] == 64
+    assert usage["wall_time"] == 2.5
+    analysis = next(entry for entry in usage["by_node"] if entry["node"] == "analysis")
+    assert analysis == {"node": "analysis", "model": "gpt-4o-mini", "calls": 2, "input_tokens": 220,
+                        "output_tokens": 50, "cached_tokens": 64, "latency": 0.9, "wall_time": 1.0}
+    assert summarize_usage([])["calls"] == 0
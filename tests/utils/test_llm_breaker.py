@@ -0,0 +1,114 @@
+import time
+import pytest
+from langchain_core.messages import HumanMessage
+from fake_openai_server import FakeOpenAIServer
+import utils.llm
+from utils.llm import invoke_model, probe_endpoint, ModelRoute
+from utils.llm_breaker import CircuitBreaker, CircuitBreakerRegistry, CircuitState, LLMUnavailableError
+from utils.llm_resilience import CallPolicy, NODE_POLICIES
+
+
+def test_breaker_opens_after_consecutive_failures():
+    """Consecutive failures open the circuit, a success in between resets the count"""
+    breaker = CircuitBreaker("gpt-4o", "http://primary", failure_threshold=3)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_opens_on_latency_spike():
+    """Consecutive slow calls open the circuit"""
+    breaker = CircuitBreaker("gpt-4o", "http://primary", slow_call_seconds=1, slow_call_threshold=2)
+
+    breaker.record_success(5)
+    breaker.record_success(5)
+
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_breaker_half_open_probe():
+    """After the open time the circuit is probed, closed on success and reopened on failure"""
+    breaker = CircuitBreaker("gpt-4o", "http://primary", failure_threshold=1, open_seconds=0.05)
+    breaker.record_failure()
+    assert not breaker.start_probe()
+
+    time.sleep(0.06)
+    assert breaker.start_probe()
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert not breaker.allow()
+    breaker.finish_probe(False)
+    assert breaker.state == CircuitState.OPEN
+
+    time.sleep(0.06)
+    assert breaker.start_probe()
+    breaker.finish_probe(True)
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.allow()
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    primary = FakeOpenAIServer(content="primary").start()
+    fallback = FakeOpenAIServer(content="fallback").start()
+    monkeypatch.setenv("OPENAI_BASE_URL", primary.base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_FALLBACK_BASE_URL", fallback.base_url)
+    monkeypatch.delenv("LLM_FALLBACK_MODEL", raising=False)
+    monkeypatch.setitem(NODE_POLICIES, "test", CallPolicy(timeout=2.0, max_retries=0))
+
+    registry = CircuitBreakerRegistry(probe_interval=3600, failure_threshold=2, open_seconds=0.1)
+    registry.set_probe(probe_endpoint)
+    monkeypatch.setattr(utils.llm, "circuit_breakers", registry)
+    yield primary, fallback, registry
+    primary.stop()
+    fallback.stop()
+
+
+def test_fallback_while_open_then_recover(servers):
+    """Calls go to the fallback endpoint while the primary circuit is open, and back once the probe succeeds"""
+    primary, fallback, registry = servers
+    primary.default_action = {"status": 500}
+    messages = [HumanMessage(content="hi")]
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            invoke_model(ModelRoute(), messages, node="test")
+    assert registry.get("gpt-4o", primary.base_url).state == CircuitState.OPEN
+
+    assert invoke_model(ModelRoute(), messages, node="test").content == "fallback"
+    primary_requests = len(primary.requests)
+
+    # primary recovers, the background probe closes the circuit
+    primary.default_action = {}
+    time.sleep(0.15)
+    registry.probe_once()
+    assert registry.get("gpt-4o", primary.base_url).state == CircuitState.CLOSED
+    assert len(primary.requests) == primary_requests + 1
+
+    assert invoke_model(ModelRoute(), messages, node="test").content == "primary"
+
+
+def test_unavailable_when_all_circuits_open(servers):
+    """Fail fast with retry_after when the primary and fallback circuits are open"""
+    primary, fallback, registry = servers
+    primary.default_action = {"status": 500}
+    fallback.default_action = {"status": 500}
+    messages = [HumanMessage(content="hi")]
+
+    for _ in range(4):
+        with pytest.raises(Exception):
+            invoke_model(ModelRoute(), messages, node="test")
+
+    requests = len(primary.requests) + len(fallback.requests)
+    with pytest.raises(LLMUnavailableError) as e:
+        invoke_model(ModelRoute(), messages, node="test")
+    assert e.value.retry_after >= 1
+    assert len(primary.requests) + len(fallback.requests) == requests
@@ -0,0 +1,84 @@
+from collections import Counter
+from utils.llm_endpoints import Endpoint, EndpointPool, parse_endpoints
+
+
+FAST = Endpoint(base_url="http://fast/v1")
+SLOW = Endpoint(base_url="http://slow/v1")
+
+
+def warm_up(pool: EndpointPool, endpoint: Endpoint, latency: float, count: int = 3):
+    for _ in range(count):
+        pool.start(endpoint)
+        pool.record(endpoint, latency, ok=True)
+
+
+def test_parse_endpoints():
+    """Weights and per-endpoint keys are optional"""
+    endpoints = parse_endpoints("http://a/v1|2, http://b/v1", "key")
+
+    assert endpoints == [(Endpoint("http://a/v1", "key"), 2.0), (Endpoint("http://b/v1", "key"), 1.0)]
+    assert parse_endpoints("http://a/v1,http://b/v1", "k1,k2")[1][0].api_key == "k2"
+
+
+def test_power_of_two_choices_prefers_lower_latency():
+    """With two endpoints, the faster one is always picked"""
+    pool = EndpointPool([(FAST, 1), (SLOW, 1)], eject_latency_factor=100)
+    warm_up(pool, FAST, 0.1)
+    warm_up(pool, SLOW, 1.0)
+
+    picks = Counter(pool.select().base_url for _ in range(50))
+
+    assert picks == {FAST.base_url: 50}
+
+
+def test_weights_spread_load():
+    """Unmeasured endpoints are sampled by weight"""
+    a, b, c = Endpoint("http://a/v1"), Endpoint("http://b/v1"), Endpoint("http://c/v1")
+    pool = EndpointPool([(a, 8), (b, 1), (c, 1)])
+
+    picks = Counter(pool.select().base_url for _ in range(500))
+
+    # a is in almost every sampled pair and wins the ties
+    assert picks[a.base_url] > picks[b.base_url] + picks[c.base_url]
+
+
+def test_sticky_thread():
+    """A thread stays on its endpoint while it is available"""
+    pool = EndpointPool([(FAST, 1), (SLOW, 1)])
+    first = pool.select("thread-1")
+
+    assert all(pool.select("thread-1") == first for _ in range(20))
+    other = SLOW if first == FAST else FAST
+    assert pool.select("thread-1", available=lambda e: e == other) == other
+    assert pool.select("thread-1") == other
+
+
+def test_eject_slow_endpoint():
+    """An endpoint much slower than the rest is taken out of rotation, never the last one"""
+    pool = EndpointPool([(FAST, 1), (SLOW, 1)], eject_latency_factor=3, min_samples=3, eject_seconds=60)
+    warm_up(pool, FAST, 0.1)
+    pool.select("thread-1", available=lambda e: e == SLOW)
+    warm_up(pool, SLOW, 2.0)
+
+    snapshot = {endpoint["base_url"]: endpoint for endpoint in pool.snapshot()}
+    assert snapshot[SLOW.base_url]["ejected"]
+    assert not snapshot[FAST.base_url]["ejected"]
+    # the sticky thread moves to the remaining endpoint
+    assert pool.select("thread-1") == FAST
+
+    # the fast endpoint is the last one in rotation, failures do not eject it
+    for _ in range(10):
+        pool.start(FAST)
+        pool.record(FAST, 0.1, ok=False)
+    assert pool.select() == FAST
+
+
+def test_eject_failing_endpoint():
+    """An endpoint failing most calls is taken out of rotation"""
+    pool = EndpointPool([(FAST, 1), (SLOW, 1)], min_samples=3)
+    warm_up(pool, SLOW, 0.5)
+    for _ in range(5):
+        pool.start(FAST)
+        pool.record(FAST, 0.1, ok=False)
+
+    assert all(pool.select() == SLOW for _ in range(20))
@@ -0,0 +1,143 @@
+import threading
+import time
+import pytest
+from langchain_core.messages import HumanMessage
+from fake_openai_server import FakeOpenAIServer
+from utils.llm import invoke_model, get_call_record, ModelRoute
+from utils.llm_resilience import CallPolicy, ResilientCaller, NODE_POLICIES
+from utils.llm_cancel import cancellations, LLMCancelledError
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    server = FakeOpenAIServer(content="Q1. What is a closure?").start()
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fast_policies(monkeypatch):
+    monkeypatch.setitem(NODE_POLICIES, "test", CallPolicy(timeout=0.5, max_retries=2, retry_base_delay=0.01))
+    monkeypatch.setitem(NODE_POLICIES, "test_hedge", CallPolicy(timeout=2.0, max_retries=0, hedge=True,
+                                                                hedge_min_delay=0.05, hedge_min_samples=5))
+
+
+def test_invoke_model(fake_openai, fast_policies):
+    """A healthy call returns the model response"""
+    response = invoke_model(ModelRoute(), [HumanMessage(content="hi")], node="test")
+
+    assert response.content == "Q1. What is a closure?"
+    assert len(fake_openai.requests) == 1
+
+    record = get_call_record(response)
+    assert record["node"] == "test"
+    assert record["model"] == "gpt-4o"
+    assert (record["input_tokens"], record["output_tokens"], record["cached_tokens"]) == (10, 5, 0)
+    assert record["wall_time"] >= record["latency"] > 0
+
+
+def test_retry_on_server_error(fake_openai, fast_policies):
+    """5xx responses are retried with backoff"""
+    fake_openai.script({"status": 500}, {"status": 503})
+
+    response = invoke_model(ModelRoute(), [HumanMessage(content="hi")], node="test")
+
+    assert response.content == "Q1. What is a closure?"
+    assert len(fake_openai.requests) == 3
+
+
+def test_timeout_then_retry(fake_openai, fast_policies):
+    """A slow attempt is abandoned after the node timeout and retried"""
+    fake_openai.script({"delay": 2})
+
+    start = time.monotonic()
+    response = invoke_model(ModelRoute(), [HumanMessage(content="hi")], node="test")
+
+    assert response.content == "Q1. What is a closure?"
+    assert time.monotonic() - start < 1.5
+
+
+def test_retries_exhausted(fake_openai, fast_policies):
+    """The last error is raised once the retries are exhausted"""
+    fake_openai.script({"status": 500}, {"status": 500}, {"status": 500})
+
+    with pytest.raises(Exception):
+        invoke_model(ModelRoute(), [HumanMessage(content="hi")], node="test")
+    assert len(fake_openai.requests) == 3
+
+
+def test_bad_request_not_retried(fake_openai, fast_policies):
+    """Client errors are raised immediately"""
+    fake_openai.script({"status": 400})
+
+    with pytest.raises(Exception):
+        invoke_model(ModelRoute(), [HumanMessage(content="hi")], node="test")
+    assert len(fake_openai.requests) == 1
+
+
+def test_hedge_past_p95(fake_openai, fast_policies):
+    """Once p95 is known, a slow attempt is hedged and the faster one wins"""
+    model = ModelRoute()
+    for _ in range(5):
+        invoke_model(model, [HumanMessage(content="warm up")], node="test_hedge")
+
+    fake_openai.script({"delay": 1.5, "content": "slow"})
+    start = time.monotonic()
+    response = invoke_model(model, [HumanMessage(content="hi")], node="test_hedge")
+
+    assert response.content == "Q1. What is a closure?"
+    assert time.monotonic() - start < 1.0
+    assert len(fake_openai.requests) == 7
+
+
+def test_caller_hedge_without_server():
+    """The hedge result is returned while the primary attempt is still running"""
+    caller = ResilientCaller(max_workers=4)
+    policy = CallPolicy(timeout=2.0, max_retries=0, hedge=True, hedge_min_delay=0.01, hedge_min_samples=1)
+    caller.latency.observe("node", 0.01)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "primary"
+        return "hedge"
+
+    assert caller.call("node", fn, policy) == "hedge"
+
+
+def test_cancelled_stream(fake_openai, fast_policies):
+    """Interactive calls of a cancelled thread stop reading the stream, the provider stops generating"""
+    fake_openai.script({"content": " ".join(["word"] * 50), "chunk_delay": 0.05})
+
+    with cancellations.scope("thread-1") as token:
+        threading.Timer(0.2, token.set).start()
+        start = time.monotonic()
+        with pytest.raises(LLMCancelledError):
+            invoke_model(ModelRoute(), [HumanMessage(content="hi")], node="test", thread_id="thread-1")
+
+    assert time.monotonic() - start < 1.0
+    time.sleep(0.2)
+    assert fake_openai.streamed < 50
+
+
+def test_cancelled_before_start(fake_openai, fast_policies):
+    """A call of a thread already cancelled is not sent"""
+    with cancellations.scope("thread-1") as token:
+        token.set()
+        with pytest.raises(LLMCancelledError):
+            invoke_model(ModelRoute(), [HumanMessage(content="hi")], node="test", thread_id="thread-1")
+
+    assert fake_openai.requests == []
+
+
+def test_uncancelled_stream(fake_openai, fast_policies):
+    """A call in a cancellation scope is streamed and keeps its usage record"""
+    with cancellations.scope("thread-1"):
+        response = invoke_model(ModelRoute(), [HumanMessage(content="hi")], node="test", thread_id="thread-1")
+
+    assert response.content == "Q1. What is a closure?"
+    assert get_call_record(response)["output_tokens"] == 5
@@ -0,0 +1,47 @@
+import threading
+import time
+import pytest
+from utils.llm_scheduler import LLMScheduler, LLMOverloadedError, Priority
+
+
+def test_slot_settles_actual_tokens():
+    """Unused reserved tokens are given back once the actual usage is known"""
+    scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=1000)
+    with scheduler.slot(Priority.INTERACTIVE, 800) as slot:
+        slot.tokens = 100
+    # 900 tokens left, a 800 tokens call does not wait
+    assert scheduler._tokens.delay(800) == 0
+
+
+def test_shed_when_wait_exceeds_bound():
+    """A call that can not get capacity within its bound is rejected with retry_after"""
+    scheduler = LLMScheduler(requests_per_minute=1, tokens_per_minute=1000,
+                             max_wait={Priority.INTERACTIVE: 0.1})
+    with scheduler.slot(Priority.INTERACTIVE, 10):
+        pass
+    with pytest.raises(LLMOverloadedError) as e:
+        scheduler.acquire(Priority.INTERACTIVE, 10)
+    assert e.value.retry_after >= 1
+
+
+def test_interactive_served_before_deferrable():
+    """Waiting interactive calls get the freed slot before earlier deferrable calls"""
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+
+    def call(priority: Priority):
+        with scheduler.slot(priority, 10):
+            order.append(priority)
+
+    scheduler.acquire(Priority.INTERACTIVE, 10)
+    deferrable = threading.Thread(target=call, args=(Priority.DEFERRABLE,))
+    deferrable.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=call, args=(Priority.INTERACTIVE,))
+    interactive.start()
+    time.sleep(0.05)
+    scheduler.release(10, 10)
+    deferrable.join()
+    interactive.join()
+
+    assert order == [Priority.INTERACTIVE, Priority.DEFERRABLE]
@@ -1,22 +1,365 @@
+import math
 import os
+import time
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, List, Tuple
 from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, AIMessage, message_chunk_to_message
 from langchain_core.tools import tool
 from dotenv import load_dotenv
+from utils.llm_scheduler import scheduler, Priority
+from utils.llm_resilience import resilient_caller, get_policy, RETRYABLE_ERRORS
+from utils.llm_breaker import circuit_breakers, CircuitState, LLMUnavailableError
+from utils.llm_endpoints import Endpoint, get_endpoint_pool, get_fallback_endpoint, get_fallback_model
+from utils.llm_cancel import cancellations, cancelled_tokens, record_cancelled, LLMCancelledError
+from utils.metrics import metrics
 
 # Load environment variables from .env file
 load_dotenv()
 
-def get_model(model: str = "gpt-4o", tools: list = None, temperature: float = 0.5) -> ChatOpenAI:
+input_tokens = metrics.counter("llm_input_tokens_total", "Prompt tokens of LLM calls, by node")
+cached_input_tokens = metrics.counter("llm_cached_input_tokens_total", "Prompt tokens served from the provider prefix cache, by node")
+output_tokens_total = metrics.counter("llm_output_tokens_total", "Completion tokens of LLM calls, by node")
+call_latency = metrics.histogram("llm_call_seconds", "Latency of successful LLM calls, by node and prefix cache hit")
+fallback_calls = metrics.counter("llm_fallback_calls_total", "LLM calls sent to a fallback model / endpoint because the circuit is open")
+
+def get_model(model: str = "gpt-4o", tools: list = None, temperature: float = 0.5,
+              max_tokens: int | None = None) -> ChatOpenAI:
     api_key = os.getenv("OPENAI_API_KEY", "any")
     base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
     
+    # Per-node timeouts and retries are applied by invoke_model, the client timeout
+    # only bounds the attempts abandoned by it
     model = ChatOpenAI(
         model=model, 
         base_url=base_url,
         api_key=api_key,
-        temperature=temperature
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=float(os.getenv("LLM_REQUEST_TIMEOUT", "120")),
+        max_retries=0
     )
     
     if tools and len(tools) > 0:
         model = model.bind_tools(tools)
     return model
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """Model settings of one workflow node"""
+    model: str = "gpt-4o"
+    temperature: float = 0.5
+    max_tokens: int | None = None
+
+
+def resolve_route(node: str, routes: Dict[str, Dict] | None = None, overrides: Dict[str, Dict] | None = None) -> ModelRoute:
+    """Resolve the model route of a node.
+    Args:
+        node: The workflow node, e.g. kickoff, analysis, next_question, summary.
+        routes: The routing table (node -> settings), a "default" entry applies to every node.
+        overrides: The per-test routing table, applied on top of routes.
+
+    Returns:
+        The model route.
+    """
+    settings = {}
+    for table in (routes or {}, overrides or {}):
+        settings.update(table.get("default") or {})
+        settings.update(table.get(node) or {})
+    return ModelRoute(**{k: v for k, v in settings.items() if k in ModelRoute.__dataclass_fields__})
+
+
+def check_route_overrides(overrides: Dict[str, Dict] | None,
+                          allowed_models: List[str],
+                          max_tokens_cap: int | None = None) -> List[str]:
+    """Check per-test route overrides against the limits of the app config.
+    Args:
+        overrides: The per-test routing table (node -> settings).
+        allowed_models: The models an override may use.
+        max_tokens_cap: The largest max_tokens an override may set, None for no cap.
+
+    Returns:
+        The problems found, empty if the overrides can be applied.
+    """
+    problems = []
+    for node, settings in (overrides or {}).items():
+        if not isinstance(settings, dict):
+            problems.append(f"{node}: the settings must be a mapping")
+            continue
+        unknown = sorted(set(settings) - set(ModelRoute.__dataclass_fields__))
+        if unknown:
+            problems.append(f"{node}: unknown settings {unknown}")
+        if "model" in settings and settings["model"] not in allowed_models:
+            problems.append(f"{node}: model {settings['model']} is not allowed, expected one of {allowed_models}")
+        # an unset max_tokens (None) is not bounded either
+        if max_tokens_cap is not None and "max_tokens" in settings and \
+                (settings["max_tokens"] is None or settings["max_tokens"] > max_tokens_cap):
+            problems.append(f"{node}: max_tokens {settings['max_tokens']} is above the cap of {max_tokens_cap}")
+    return problems
+
+
+@lru_cache(maxsize=256)
+def _get_client(model: str, endpoint: Endpoint, temperature: float, max_tokens: int | None, timeout: float) -> ChatOpenAI:
+    return ChatOpenAI(
+        model=model,
+        base_url=endpoint.base_url,
+        api_key=endpoint.api_key,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        max_retries=0,
+        # usage metadata of the streamed (cancellable) calls
+        stream_usage=True
+    )
+
+
+def select_target(model: str, endpoint: Endpoint) -> Tuple[str, Endpoint]:
+    """Pick the first of model / fallback model on endpoint / fallback endpoint whose circuit is closed.
+    Args:
+        model: The model of the route.
+        endpoint: The endpoint selected for the call.
+
+    Returns:
+        The model and endpoint to call.
+
+    Raises:
+        LLMUnavailableError: If every candidate circuit is open.
+    """
+    fallback_model = get_fallback_model()
+    fallback_endpoint = get_fallback_endpoint()
+    candidates = [(model, endpoint)]
+    if fallback_endpoint:
+        candidates.append((model, fallback_endpoint))
+    if fallback_model:
+        candidates.append((fallback_model, endpoint))
+        if fallback_endpoint:
+            candidates.append((fallback_model, fallback_endpoint))
+
+    for i, (candidate_model, candidate_endpoint) in enumerate(candidates):
+        if circuit_breakers.get(candidate_model, candidate_endpoint.base_url).allow():
+            _known_endpoints[candidate_endpoint.base_url] = candidate_endpoint
+            if i > 0:
+                fallback_calls.inc(model=model, fallback_model=candidate_model, base_url=candidate_endpoint.base_url)
+            return candidate_model, candidate_endpoint
+
+    retry_after = min(circuit_breakers.get(m, e.base_url).remaining_open_time() for m, e in candidates)
+    raise LLMUnavailableError(f"LLM unavailable, circuit of {model} on {endpoint.base_url} and its fallbacks are open",
+                              retry_after=max(1, math.ceil(retry_after)))
+
+
+# Endpoints by base URL, for the background probes of the circuit breakers
+_known_endpoints: Dict[str, Endpoint] = {}
+PROBE_TIMEOUT = 10.0
+
+
+def probe_endpoint(model: str, base_url: str) -> bool:
+    """Half open probe, a one token completion"""
+    endpoint = _known_endpoints.get(base_url, Endpoint(base_url=base_url))
+    _get_client(model, endpoint, 0, 1, PROBE_TIMEOUT).invoke([HumanMessage(content="ping")])
+    return True
+
+
+circuit_breakers.set_probe(probe_endpoint)
+
+
+# Expected completion size, used with the prompt size to reserve tokens-per-minute capacity
+DEFAULT_OUTPUT_TOKENS = 512
+
+
+def estimate_tokens(messages: list) -> int:
+    """Rough token estimate of the prompt (about 4 characters per token)"""
+    return sum(len(str(message.content)) for message in messages) // 4
+
+
+def get_usage(response) -> dict | None:
+    """Usage metadata of a model response, also for with_structured_output(include_raw=True)"""
+    raw = response["raw"] if isinstance(response, dict) else response
+    return getattr(raw, "usage_metadata", None)
+
+
+def get_cached_tokens(usage: dict | None) -> int:
+    """Prompt tokens read from the provider prefix cache"""
+    if not usage:
+        return 0
+    return (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+
+def record_usage(node: str, usage: dict | None, latency: float) -> None:
+    """Record token usage, prefix cache hits and latency of a successful call"""
+    cached = get_cached_tokens(usage)
+    if usage:
+        input_tokens.inc(usage.get("input_tokens", 0), node=node)
+        cached_input_tokens.inc(cached, node=node)
+        output_tokens_total.inc(usage.get("output_tokens", 0), node=node)
+    call_latency.observe(latency, node=node, cache="hit" if cached else "miss")
+
+
+def stream_cancellable(model: ChatOpenAI, messages: list, cancel, node: str, output_tokens: int) -> AIMessage:
+    """Stream the completion, a cancellation closes the HTTP response so the provider stops generating.
+    Args:
+        model: The model client.
+        messages: The prompt messages.
+        cancel: The cancellation token of the call.
+        node: The workflow node making the call.
+        output_tokens: The expected completion size, to estimate the saved tokens.
+
+    Returns:
+        The model response.
+
+    Raises:
+        LLMCancelledError: If the token is set before the completion ends.
+    """
+    response = None
+    stream = model.stream(messages)
+    try:
+        for chunk in stream:
+            response = chunk if response is None else response + chunk
+            if cancel.is_set():
+                generated = len(str(response.content)) // 4
+                cancelled_tokens.inc(max(0, output_tokens - generated), node=node)
+                raise LLMCancelledError()
+    finally:
+        stream.close()
+    return message_chunk_to_message(response) if response is not None else AIMessage(content="")
+
+
+# Key of the call record in the response_metadata of the model message
+CALL_RECORD_KEY = "llm_call"
+USAGE_FIELDS = ("calls", "input_tokens", "output_tokens", "cached_tokens", "latency", "wall_time")
+
+
+def get_call_record(response) -> dict | None:
+    """Usage record of an invoke_model call (node, model, tokens, latency and wall time),
+    also for with_structured_output(include_raw=True)"""
+    raw = response["raw"] if isinstance(response, dict) else response
+    metadata = getattr(raw, "response_metadata", None) or {}
+    return metadata.get(CALL_RECORD_KEY)
+
+
+def collect_usage(response, llm_usage: List[dict] | None) -> None:
+    """Append the usage record of an invoke_model call to llm_usage (if given)"""
+    record = get_call_record(response)
+    if llm_usage is not None and record:
+        llm_usage.append(record)
+
+
+def summarize_usage(records: List[dict]) -> dict:
+    """Totals of the usage records of an interview, overall and by node / model.
+    Args:
+        records: The usage records, see get_call_record.
+
+    Returns:
+        The usage summary, persisted with the test result.
+    """
+    def empty() -> dict:
+        return {field: 0 for field in USAGE_FIELDS}
+
+    totals = empty()
+    by_node: Dict[Tuple[str, str], dict] = {}
+    for record in records:
+        key = (record.get("node", "default"), record.get("model", ""))
+        entry = by_node.setdefault(key, {"node": key[0], "model": key[1], **empty()})
+        for target in (totals, entry):
+            target["calls"] += 1
+            for field in USAGE_FIELDS[1:]:
+                target[field] += record.get(field) or 0
+
+    for entry in [totals, *by_node.values()]:
+        entry["latency"] = round(entry["latency"], 3)
+        entry["wall_time"] = round(entry["wall_time"], 3)
+    return {**totals, "by_node": list(by_node.values())}
+
+
+def invoke_model(route: ModelRoute, messages: list, priority: Priority = Priority.INTERACTIVE,
+                 output_tokens: int = DEFAULT_OUTPUT_TOKENS, node: str = "default", schema: type | None = None,
+                 thread_id: str | None = None):
+    """Invoke the model of the route through the shared LLM scheduler, with the timeouts,
+    retries and hedging of the node policy, on an endpoint of the pool guarded by the
+    circuit breakers of the model / endpoint.
+    Args:
+        route: The model route of the node.
+        messages: The prompt messages.
+        priority: The priority class of the call.
+        output_tokens: The expected completion size.
+        node: The workflow node making the call.
+        schema: Structured output schema, the response is then the with_structured_output(include_raw=True) dict.
+        thread_id: The interview thread, keeps the calls of a thread on the same endpoint. Interactive
+            calls of a thread are cancelled when the graph run of the thread is, see utils.llm_cancel.
+
+    Returns:
+        The model response, its usage record is read with get_call_record.
+
+    Raises:
+        LLMOverloadedError: If no slot is available within the waiting bound of the priority.
+        LLMUnavailableError: If the circuits of the model / endpoint and their fallbacks are open.
+        LLMCancelledError: If the client waiting for the call went away.
+        TimeoutError: If the attempts of the node timed out.
+    """
+    estimated_tokens = estimate_tokens(messages) + output_tokens
+    policy = get_policy(node)
+    cancel = None
+    if priority != Priority.INTERACTIVE:
+        # nobody waits for the response, not worth the extra tokens of a hedge
+        policy = replace(policy, hedge=False)
+    else:
+        cancel = cancellations.get(thread_id)
+    if cancel is not None and cancel.is_set():
+        record_cancelled(node, "queued", estimated_tokens)
+        raise LLMCancelledError()
+
+    def attempt():
+        pool = get_endpoint_pool()
+        endpoint = pool.select(thread_id, available=lambda e: circuit_breakers.get(route.model, e.base_url).state == CircuitState.CLOSED)
+        model_name, endpoint = select_target(route.model, endpoint)
+        # abandoned attempts end with the node timeout, and count as failures of the circuit
+        model = _get_client(model_name, endpoint, route.temperature, route.max_tokens, policy.timeout)
+        if schema is not None:
+            model = model.with_structured_output(schema, include_raw=True)
+        breaker = circuit_breakers.get(model_name, endpoint.base_url)
+
+        # every attempt (retry or hedge) takes its own scheduler slot
+        with scheduler.slot(priority, estimated_tokens) as slot:
+            pool.start(endpoint)
+            start = time.monotonic()
+            try:
+                if cancel is not None and schema is None:
+                    response = stream_cancellable(model, messages, cancel, node, output_tokens)
+                else:
+                    response = model.invoke(messages)
+            except RETRYABLE_ERRORS:
+                pool.record(endpoint, time.monotonic() - start, ok=False)
+                breaker.record_failure()
+                raise
+            except Exception:
+                pool.record(endpoint, None, ok=True)
+                raise
+            latency = time.monotonic() - start
+            pool.record(endpoint, latency, ok=True)
+            breaker.record_success(latency)
+            usage = get_usage(response)
+            if usage:
+                slot.tokens = usage.get("total_tokens", estimated_tokens)
+            record_usage(node, usage, latency)
+
+        raw = response["raw"] if isinstance(response, dict) else response
+        raw.response_metadata[CALL_RECORD_KEY] = {
+            "node": node,
+            "model": model_name,
+            "input_tokens": (usage or {}).get("input_tokens", 0),
+            "output_tokens": (usage or {}).get("output_tokens", 0),
+            "cached_tokens": get_cached_tokens(usage),
+            "latency": latency
+        }
+        return response
+
+    start = time.monotonic()
+    try:
+        response = resilient_caller.call(node, attempt, policy, cancel)
+    except LLMCancelledError:
+        record_cancelled(node, "in_flight", 0)
+        raise
+    # wall time includes the scheduler queueing, the retries and the hedges
+    get_call_record(response)["wall_time"] = time.monotonic() - start
+    return response
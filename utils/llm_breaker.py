@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from enum import Enum
+from typing import Callable, Dict, List, Tuple
+from utils.log_utils import logger
+from utils.metrics import metrics
+
+
+circuit_state = metrics.gauge("llm_circuit_state", "Circuit breaker state by model and base URL (0 closed, 1 half open, 2 open)")
+circuit_transitions = metrics.counter("llm_circuit_transitions_total", "Circuit breaker state changes, by model, base URL and new state")
+circuit_rejected = metrics.counter("llm_circuit_rejected_total", "Calls not sent to a model / base URL because its circuit is open")
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class LLMUnavailableError(Exception):
+    """No model / endpoint with a closed circuit is available for the call"""
+    def __init__(self, message: str, retry_after: float):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one model on one endpoint
+
+    Opens after failure_threshold consecutive failures, or slow_call_threshold consecutive
+    calls slower than slow_call_seconds. While open no live call is sent, once open_seconds
+    passed the background prober moves it to half open and sends a probe, which closes
+    the circuit on success or opens it again on failure.
+    """
+
+    def __init__(self,
+                 model: str,
+                 base_url: str,
+                 failure_threshold: int = 5,
+                 slow_call_seconds: float = 20.0,
+                 slow_call_threshold: int = 5,
+                 open_seconds: float = 30.0):
+        self.model = model
+        self.base_url = base_url
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_threshold = slow_call_threshold
+        self.open_seconds = open_seconds
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.slow_calls = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+        circuit_state.set(0, model=model, base_url=base_url)
+
+    def allow(self) -> bool:
+        """Whether live calls may be sent, half open circuits only get the probe"""
+        allowed = self.state == CircuitState.CLOSED
+        if not allowed:
+            circuit_rejected.inc(model=self.model, base_url=self.base_url)
+        return allowed
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.failures = 0
+            self.slow_calls = self.slow_calls + 1 if latency > self.slow_call_seconds else 0
+            if self.slow_calls >= self.slow_call_threshold and self.state == CircuitState.CLOSED:
+                self._transition(CircuitState.OPEN, f"{self.slow_calls} calls slower than {self.slow_call_seconds}s")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.state == CircuitState.CLOSED:
+                self._transition(CircuitState.OPEN, f"{self.failures} consecutive failures")
+
+    def start_probe(self) -> bool:
+        """Move an open circuit to half open once its open time passed, True if it should be probed"""
+        with self._lock:
+            if self.state == CircuitState.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self._transition(CircuitState.HALF_OPEN, "probing")
+                return True
+            return False
+
+    def finish_probe(self, ok: bool) -> None:
+        with self._lock:
+            if self.state != CircuitState.HALF_OPEN:
+                return
+            if ok:
+                self.failures = 0
+                self.slow_calls = 0
+                self._transition(CircuitState.CLOSED, "probe succeeded")
+            else:
+                self._transition(CircuitState.OPEN, "probe failed")
+
+    def remaining_open_time(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def _transition(self, state: CircuitState, reason: str) -> None:
+        self.state = state
+        if state == CircuitState.OPEN:
+            self.opened_at = time.monotonic()
+        circuit_state.set(STATE_VALUES[state], model=self.model, base_url=self.base_url)
+        circuit_transitions.inc(model=self.model, base_url=self.base_url, state=state.value)
+        log = logger.info if state == CircuitState.CLOSED else logger.warning
+        log(f"Circuit of {self.model} on {self.base_url} is {state.value}: {reason}")
+
+    def snapshot(self) -> Dict:
+        return {
+            "model": self.model,
+            "base_url": self.base_url,
+            "state": self.state.value,
+            "consecutive_failures": self.failures,
+            "consecutive_slow_calls": self.slow_calls
+        }
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers by (model, base URL), with the background half open prober"""
+
+    def __init__(self, probe_interval: float = 5.0, **breaker_options):
+        self.probe_interval = probe_interval
+        self.breaker_options = breaker_options
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._probe: Callable[[str, str], bool] | None = None
+        self._prober: threading.Thread | None = None
+
+    @classmethod
+    def from_env(cls) -> 'CircuitBreakerRegistry':
+        return cls(probe_interval=float(os.getenv("LLM_CIRCUIT_PROBE_INTERVAL", "5")),
+                   failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5")),
+                   slow_call_seconds=float(os.getenv("LLM_CIRCUIT_SLOW_CALL_SECONDS", "20")),
+                   slow_call_threshold=int(os.getenv("LLM_CIRCUIT_SLOW_CALL_THRESHOLD", "5")),
+                   open_seconds=float(os.getenv("LLM_CIRCUIT_OPEN_SECONDS", "30")))
+
+    def get(self, model: str, base_url: str) -> CircuitBreaker:
+        key = (model, base_url)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(model, base_url, **self.breaker_options)
+                self._start_prober()
+            return breaker
+
+    def set_probe(self, probe: Callable[[str, str], bool]) -> None:
+        """Set the probe (model, base URL) -> healthy, run by the background prober"""
+        self._probe = probe
+
+    def _start_prober(self) -> None:
+        """Start the background prober with the first circuit (called under the lock)"""
+        if self._probe is not None and (self._prober is None or not self._prober.is_alive()):
+            self._prober = threading.Thread(target=self._run_prober, name="llm-circuit-prober", daemon=True)
+            self._prober.start()
+
+    def probe_once(self) -> None:
+        """Probe the circuits whose open time passed"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        for breaker in breakers:
+            if breaker.start_probe():
+                try:
+                    ok = bool(self._probe(breaker.model, breaker.base_url)) if self._probe else False
+                except Exception as e:
+                    logger.warning(f"Probe of {breaker.model} on {breaker.base_url} failed: {e}")
+                    ok = False
+                breaker.finish_probe(ok)
+
+    def _run_prober(self) -> None:
+        while True:
+            time.sleep(self.probe_interval)
+            try:
+                self.probe_once()
+            except Exception as e:
+                logger.error(f"Circuit prober error: {e}")
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [breaker.snapshot() for breaker in breakers]
+
+
+# Shared by every LLM call of the process
+circuit_breakers = CircuitBreakerRegistry.from_env()
@@ -0,0 +1,68 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from utils.metrics import metrics
+
+
+cancelled_calls = metrics.counter("llm_cancelled_calls_total", "LLM calls cancelled because the client went away, by node and stage")
+cancelled_tokens = metrics.counter("llm_cancelled_tokens_total", "Estimated LLM tokens saved by cancelled calls, by node")
+
+
+class LLMCancelledError(Exception):
+    """The client waiting for the LLM call went away"""
+
+    def __init__(self, message: str = "LLM call cancelled, the client disconnected"):
+        super().__init__(message)
+        self.message = message
+
+
+class CancellationRegistry:
+    """
+    Cancellation tokens of the graph runs in flight, by interview thread
+
+    The chat service opens a token for the duration of a graph run and sets it when
+    the client disconnects. Interactive LLM calls of the thread check it before they
+    start, while waiting for the attempts and between streamed chunks.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def scope(self, thread_id: str) -> Iterator[threading.Event]:
+        """Token of one graph run of the thread"""
+        token = threading.Event()
+        with self._lock:
+            self._tokens[str(thread_id)] = token
+        try:
+            yield token
+        finally:
+            with self._lock:
+                if self._tokens.get(str(thread_id)) is token:
+                    del self._tokens[str(thread_id)]
+
+    def get(self, thread_id: str | None) -> threading.Event | None:
+        if thread_id is None:
+            return None
+        with self._lock:
+            return self._tokens.get(str(thread_id))
+
+    def cancel(self, thread_id: str) -> bool:
+        """Cancel the graph run of the thread, False if none is in flight"""
+        token = self.get(thread_id)
+        if token is None:
+            return False
+        token.set()
+        return True
+
+
+def record_cancelled(node: str, stage: str, saved_tokens: int) -> None:
+    """Record a cancelled call and the tokens it did not spend"""
+    cancelled_calls.inc(node=node, stage=stage)
+    if saved_tokens > 0:
+        cancelled_tokens.inc(saved_tokens, node=node)
+
+
+# Shared by the chat service and the LLM calls of the process
+cancellations = CancellationRegistry()
@@ -0,0 +1,247 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+from dotenv import load_dotenv
+from utils.log_utils import logger
+from utils.metrics import metrics
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """An OpenAI-compatible API endpoint"""
+    base_url: str
+    api_key: str = "any"
+
+
+def get_default_endpoint() -> Endpoint:
+    return Endpoint(base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+                    api_key=os.getenv("OPENAI_API_KEY", "any"))
+
+
+def get_fallback_endpoint() -> Endpoint | None:
+    """Endpoint used while the circuit of the primary one is open, None to keep the primary one"""
+    base_url = os.getenv("LLM_FALLBACK_BASE_URL")
+    if not base_url:
+        return None
+    return Endpoint(base_url=base_url, api_key=os.getenv("LLM_FALLBACK_API_KEY", os.getenv("OPENAI_API_KEY", "any")))
+
+
+def get_fallback_model() -> str | None:
+    """Model used while the circuit of the primary model is open, None to keep the primary model"""
+    return os.getenv("LLM_FALLBACK_MODEL") or None
+
+
+endpoint_latency = metrics.gauge("llm_endpoint_latency_ewma_seconds", "EWMA latency of the LLM endpoints, by base URL")
+endpoint_error_rate = metrics.gauge("llm_endpoint_error_rate", "EWMA error rate of the LLM endpoints, by base URL")
+endpoint_ejected = metrics.gauge("llm_endpoint_ejected", "1 while the LLM endpoint is out of rotation, by base URL")
+endpoint_selected = metrics.counter("llm_endpoint_selected_total", "LLM endpoint selections, by base URL and reason")
+
+
+@dataclass
+class EndpointStats:
+    """Load statistics of one pooled endpoint"""
+    endpoint: Endpoint
+    weight: float = 1.0
+    latency: float | None = None
+    error_rate: float = 0.0
+    samples: int = 0
+    in_flight: int = 0
+    ejected_until: float = 0.0
+
+    def cost(self, default_latency: float) -> float:
+        """Expected cost of one more call, lower is better"""
+        latency = self.latency if self.latency is not None else default_latency
+        return latency * (1 + self.in_flight) * (1 + 10 * self.error_rate) / self.weight
+
+
+def parse_endpoints(base_urls: str, api_keys: str) -> List[Tuple[Endpoint, float]]:
+    """Parse "url[|weight],url[|weight]" and the matching "key,key" (or a single key for all)"""
+    urls = [url.strip() for url in base_urls.split(",") if url.strip()]
+    keys = [key.strip() for key in api_keys.split(",")]
+    endpoints = []
+    for i, url in enumerate(urls):
+        url, _, weight = url.partition("|")
+        key = keys[i] if len(keys) == len(urls) else keys[0]
+        endpoints.append((Endpoint(base_url=url, api_key=key), float(weight or 1)))
+    return endpoints
+
+
+class EndpointPool:
+    """
+    Latency-aware pool of OpenAI-compatible endpoints
+
+    Picks endpoints with weighted power-of-two-choices on EWMA latency, EWMA error rate
+    and in-flight calls. Endpoints much slower than the rest of the pool, or failing most
+    calls, are ejected for a while. Each interview thread sticks to its endpoint while it
+    stays available, so provider-side prompt caching keeps working.
+    """
+
+    def __init__(self,
+                 endpoints: List[Tuple[Endpoint, float]],
+                 alpha: float = 0.3,
+                 eject_latency_factor: float = 3.0,
+                 eject_error_rate: float = 0.5,
+                 eject_seconds: float = 30.0,
+                 min_samples: int = 5,
+                 max_sticky_threads: int = 10000):
+        self.alpha = alpha
+        self.eject_latency_factor = eject_latency_factor
+        self.eject_error_rate = eject_error_rate
+        self.eject_seconds = eject_seconds
+        self.min_samples = min_samples
+        self.max_sticky_threads = max_sticky_threads
+        self._stats: Dict[str, EndpointStats] = {
+            endpoint.base_url: EndpointStats(endpoint=endpoint, weight=weight) for endpoint, weight in endpoints
+        }
+        self._sticky: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def endpoints(self) -> List[Endpoint]:
+        return [stats.endpoint for stats in self._stats.values()]
+
+    def select(self, thread_id: str | None = None,
+               available: Callable[[Endpoint], bool] | None = None) -> Endpoint:
+        """
+        Select the endpoint of a call
+
+        Args:
+            thread_id: Interview thread, keeps the thread on the same endpoint
+            available: Extra availability check, e.g. the circuit of the model is closed
+
+        Returns:
+            Endpoint: The selected endpoint
+        """
+        now = time.monotonic()
+        with self._lock:
+            for stats in self._stats.values():
+                if stats.ejected_until and stats.ejected_until <= now:
+                    # ejection time is over, back in rotation
+                    stats.ejected_until = 0.0
+                    endpoint_ejected.set(0, base_url=stats.endpoint.base_url)
+            candidates = [stats for stats in self._stats.values()
+                          if not stats.ejected_until and (available is None or available(stats.endpoint))]
+            if not candidates:
+                # never leave the pool empty, the circuit breakers decide what happens next
+                candidates = list(self._stats.values())
+
+            if thread_id is not None:
+                base_url = self._sticky.get(str(thread_id))
+                sticky = self._stats.get(base_url) if base_url else None
+                if sticky in candidates:
+                    self._sticky.move_to_end(str(thread_id))
+                    endpoint_selected.inc(base_url=sticky.endpoint.base_url, reason="sticky")
+                    return sticky.endpoint
+
+            selected = self._power_of_two_choices(candidates)
+            if thread_id is not None:
+                self._sticky[str(thread_id)] = selected.endpoint.base_url
+                self._sticky.move_to_end(str(thread_id))
+                while len(self._sticky) > self.max_sticky_threads:
+                    self._sticky.popitem(last=False)
+            endpoint_selected.inc(base_url=selected.endpoint.base_url, reason="balanced")
+            return selected.endpoint
+
+    def _power_of_two_choices(self, candidates: List[EndpointStats]) -> EndpointStats:
+        if len(candidates) == 1:
+            return candidates[0]
+        first = self._weighted_sample(candidates)
+        second = self._weighted_sample([stats for stats in candidates if stats is not first])
+        latencies = [stats.latency for stats in candidates if stats.latency is not None]
+        default_latency = min(latencies) if latencies else 1.0
+        return first if first.cost(default_latency) <= second.cost(default_latency) else second
+
+    @staticmethod
+    def _weighted_sample(candidates: List[EndpointStats]) -> EndpointStats:
+        weights = [stats.weight for stats in candidates]
+        return random.choices(candidates, weights=weights if sum(weights) > 0 else None)[0]
+
+    def start(self, endpoint: Endpoint) -> None:
+        """A call to the endpoint started"""
+        with self._lock:
+            stats = self._stats.get(endpoint.base_url)
+            if stats:
+                stats.in_flight += 1
+
+    def record(self, endpoint: Endpoint, latency: float | None, ok: bool) -> None:
+        """A call to the endpoint finished (latency None if it tells nothing, e.g. a bad request),
+        update its EWMA statistics and eject it if needed"""
+        with self._lock:
+            stats = self._stats.get(endpoint.base_url)
+            if stats is None:
+                return
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.samples += 1
+            stats.error_rate = self.alpha * (0 if ok else 1) + (1 - self.alpha) * stats.error_rate
+            if ok and latency is not None:
+                stats.latency = latency if stats.latency is None else self.alpha * latency + (1 - self.alpha) * stats.latency
+            self._maybe_eject(stats)
+
+            base_url = endpoint.base_url
+            endpoint_error_rate.set(stats.error_rate, base_url=base_url)
+            if stats.latency is not None:
+                endpoint_latency.set(stats.latency, base_url=base_url)
+
+    def _maybe_eject(self, stats: EndpointStats) -> None:
+        """Eject a slow or failing endpoint, unless it is the last one in rotation (called under the lock)"""
+        now = time.monotonic()
+        if stats.samples < self.min_samples or stats.ejected_until > now:
+            return
+        others = [other for other in self._stats.values() if other is not stats and other.ejected_until <= now]
+        if not others:
+            return
+
+        other_latencies = sorted(other.latency for other in others if other.latency is not None)
+        median = other_latencies[len(other_latencies) // 2] if other_latencies else None
+        too_slow = median is not None and stats.latency is not None and stats.latency > self.eject_latency_factor * median
+        if too_slow or stats.error_rate > self.eject_error_rate:
+            stats.ejected_until = now + self.eject_seconds
+            # back in rotation with a clean slate, it has to prove itself again
+            stats.samples = 0
+            stats.error_rate = 0.0
+            stats.latency = median
+            endpoint_ejected.set(1, base_url=stats.endpoint.base_url)
+            logger.warning(f"LLM endpoint {stats.endpoint.base_url} ejected for {self.eject_seconds}s, "
+                           f"{'slow' if too_slow else 'failing'}")
+
+    def snapshot(self) -> List[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "base_url": stats.endpoint.base_url,
+                "weight": stats.weight,
+                "latency_ewma": stats.latency,
+                "error_rate": stats.error_rate,
+                "in_flight": stats.in_flight,
+                "ejected": stats.ejected_until > now
+            } for stats in self._stats.values()]
+
+
+_pool: EndpointPool | None = None
+_pool_spec: Tuple[str, str] | None = None
+_pool_lock = threading.Lock()
+
+
+def get_endpoint_pool() -> EndpointPool:
+    """
+    Endpoint pool of OPENAI_BASE_URLS ("url[|weight],..." with OPENAI_API_KEYS), or of the
+    single OPENAI_BASE_URL, rebuilt when the environment changes
+    """
+    global _pool, _pool_spec
+    default = get_default_endpoint()
+    spec = (os.getenv("OPENAI_BASE_URLS") or default.base_url, os.getenv("OPENAI_API_KEYS") or default.api_key)
+    with _pool_lock:
+        if _pool is None or _pool_spec != spec:
+            _pool = EndpointPool(parse_endpoints(*spec),
+                                 eject_latency_factor=float(os.getenv("LLM_ENDPOINT_EJECT_LATENCY_FACTOR", "3")),
+                                 eject_error_rate=float(os.getenv("LLM_ENDPOINT_EJECT_ERROR_RATE", "0.5")),
+                                 eject_seconds=float(os.getenv("LLM_ENDPOINT_EJECT_SECONDS", "30")))
+            _pool_spec = spec
+        return _pool
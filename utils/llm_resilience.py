@@ -0,0 +1,219 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Callable, Dict, TypeVar
+import openai
+from utils.metrics import metrics
+from utils.llm_cancel import LLMCancelledError
+
+
+T = TypeVar("T")
+
+attempts_total = metrics.counter("llm_attempts_total", "LLM call attempts, by node and outcome")
+attempt_latency = metrics.histogram("llm_attempt_seconds", "Latency of successful LLM call attempts, by node")
+retries_total = metrics.counter("llm_retries_total", "LLM call retries after a failed attempt, by node")
+hedges_total = metrics.counter("llm_hedges_total", "Hedged LLM attempts fired, by node and whether the hedge won")
+
+# How often a cancellable call checks its cancellation token while waiting
+CANCEL_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class CallPolicy:
+    """Resilience policy of the LLM calls of one workflow node"""
+    # seconds before an attempt is abandoned
+    timeout: float = 30.0
+    # retries after the first attempt
+    max_retries: int = 2
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 8.0
+    # fire a second attempt once the first one passes the observed p95
+    hedge: bool = False
+    # never hedge earlier than this, and not before enough samples were observed
+    hedge_min_delay: float = 1.0
+    hedge_min_samples: int = 20
+
+
+NODE_POLICIES: Dict[str, CallPolicy] = {
+    "plan": CallPolicy(timeout=60.0, max_retries=1),
+    "kickoff": CallPolicy(timeout=20.0, hedge=True),
+    "analysis": CallPolicy(timeout=20.0, hedge=True),
+    "next_question": CallPolicy(timeout=20.0, hedge=True),
+    "summary": CallPolicy(timeout=90.0, max_retries=3, retry_base_delay=2.0, retry_max_delay=30.0),
+    "default": CallPolicy(),
+}
+
+# Transient errors worth another attempt, anything else (bad request, auth, parsing) is raised
+RETRYABLE_ERRORS = (
+    TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def get_policy(node: str) -> CallPolicy:
+    return NODE_POLICIES.get(node, NODE_POLICIES["default"])
+
+
+class LatencyTracker:
+    """Sliding window of successful attempt latencies per node"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, node: str, latency: float) -> None:
+        with self._lock:
+            self._samples.setdefault(node, deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, node: str, q: float, min_samples: int = 1) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get(node, ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def backoff_delay(attempt: int, policy: CallPolicy) -> float:
+    """Full-jitter exponential backoff before the given retry (1-based)"""
+    return random.uniform(0, min(policy.retry_max_delay, policy.retry_base_delay * 2 ** (attempt - 1)))
+
+
+class ResilientCaller:
+    """
+    Run LLM calls with per-node timeouts, jittered exponential retries and hedging
+
+    Attempts run on a shared thread pool so they can be abandoned on timeout (the
+    underlying HTTP client is also given the timeout, so abandoned attempts end).
+    When a node allows hedging and the first attempt is still running past the
+    node's observed p95, a second attempt is fired and the first result wins.
+    """
+
+    def __init__(self, max_workers: int = 64, latency_window: int = 200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-call")
+        self.latency = LatencyTracker(latency_window)
+
+    def call(self, node: str, fn: Callable[[], T], policy: CallPolicy | None = None,
+             cancel: threading.Event | None = None) -> T:
+        """
+        Call fn under the policy of node
+
+        Args:
+            node: The workflow node, selects the policy and the latency statistics
+            fn: The model invocation, called once per attempt
+            policy: Override of the node policy
+            cancel: Cancellation token, set when nobody waits for the result anymore
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            LLMCancelledError: If the token is set, the attempts in flight are abandoned
+            The last error once the retries are exhausted, non-retryable errors immediately
+        """
+        policy = policy or get_policy(node)
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(node, fn, policy, cancel)
+            except RETRYABLE_ERRORS:
+                attempt += 1
+                if attempt > policy.max_retries:
+                    raise
+                delay = backoff_delay(attempt, policy)
+                retries_total.inc(node=node)
+                if cancel is not None:
+                    if cancel.wait(delay):
+                        raise LLMCancelledError()
+                else:
+                    time.sleep(delay)
+
+    def _wait(self, node: str, futures: Dict[Future, str], timeout: float, cancel: threading.Event | None,
+              return_when: str = FIRST_COMPLETED):
+        """wait() that gives up on the attempts once the cancellation token is set"""
+        if cancel is None:
+            return wait(futures, timeout=timeout, return_when=return_when)
+        deadline = time.monotonic() + timeout
+        while True:
+            if cancel.is_set():
+                self._abandon(node, futures, "cancelled")
+                raise LLMCancelledError()
+            remaining = deadline - time.monotonic()
+            done, pending = wait(futures, timeout=max(0, min(remaining, CANCEL_POLL_INTERVAL)), return_when=return_when)
+            if done or remaining <= CANCEL_POLL_INTERVAL:
+                return done, pending
+
+    def _attempt(self, node: str, fn: Callable[[], T], policy: CallPolicy, cancel: threading.Event | None = None) -> T:
+        deadline = time.monotonic() + policy.timeout
+        futures = {self._submit(node, fn): "primary"}
+
+        hedged = False
+        hedge_after = self.latency.percentile(node, 0.95, policy.hedge_min_samples) if policy.hedge else None
+        if hedge_after is not None:
+            done, _ = self._wait(node, futures, min(max(hedge_after, policy.hedge_min_delay), policy.timeout), cancel)
+            if not done:
+                futures[self._submit(node, fn)] = "hedge"
+                hedged = True
+
+        error = None
+        while futures:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = self._wait(node, futures, remaining, cancel)
+            for future in done:
+                kind = futures.pop(future)
+                error = future.exception()
+                if error is None:
+                    if hedged:
+                        hedges_total.inc(node=node, won=str(kind == "hedge").lower())
+                    self._abandon(node, futures, "lost")
+                    return future.result()
+                if not isinstance(error, RETRYABLE_ERRORS):
+                    self._abandon(node, futures, "lost")
+                    raise error
+
+        if futures:
+            self._abandon(node, futures, "timeout")
+            raise TimeoutError(f"LLM call of node {node} timed out after {policy.timeout}s")
+        raise error
+
+    @staticmethod
+    def _abandon(node: str, futures: Dict[Future, str], outcome: str) -> None:
+        """Stop waiting for the attempts, they are recorded with outcome instead of their own result"""
+        for future in futures:
+            future.abandoned.set()
+            future.cancel()
+            attempts_total.inc(node=node, outcome=outcome)
+
+    def _submit(self, node: str, fn: Callable[[], T]) -> Future:
+        abandoned = threading.Event()
+
+        def run():
+            start = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                if not abandoned.is_set():
+                    attempts_total.inc(node=node, outcome="error", error=type(e).__name__)
+                raise
+            latency = time.monotonic() - start
+            self.latency.observe(node, latency)
+            if not abandoned.is_set():
+                attempt_latency.observe(latency, node=node)
+                attempts_total.inc(node=node, outcome="success")
+            return result
+
+        future = self._executor.submit(run)
+        future.abandoned = abandoned
+        return future
+
+
+# Shared by every LLM call of the process
+resilient_caller = ResilientCaller()
@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Dict, Iterator
+from utils.metrics import metrics
+
+
+queue_depth = metrics.gauge("llm_queue_depth", "LLM calls waiting for a scheduler slot, by priority")
+queue_wait = metrics.histogram("llm_queue_wait_seconds", "Time LLM calls waited for a scheduler slot, by priority")
+shed_calls = metrics.counter("llm_shed_total", "LLM calls rejected because the wait would exceed the bound, by priority")
+in_flight_calls = metrics.gauge("llm_in_flight", "LLM calls holding a scheduler slot")
+
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+    # candidate is waiting for the response, e.g. kickoff, analyze_answer, send_next_question
+    INTERACTIVE = 0
+    # nobody is waiting, e.g. summarize_interview, prefetch, bulk generation
+    DEFERRABLE = 1
+
+
+class LLMOverloadedError(Exception):
+    """The LLM call could not get a slot within its bounded waiting time"""
+    def __init__(self, message: str, retry_after: float):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously, not thread-safe (guarded by the scheduler)"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until amount tokens are available"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or charge (negative) tokens, e.g. once actual usage is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+@dataclass
+class SchedulerSlot:
+    """Granted slot, set tokens to the actual usage before it is released"""
+    priority: Priority
+    estimated_tokens: int
+    tokens: int
+
+
+class LLMScheduler:
+    """
+    Shared scheduler for all LLM invocations
+
+    Combines requests-per-minute and tokens-per-minute token buckets with a concurrency
+    bound. Waiting calls are served by priority class then arrival order, each class has
+    a bounded waiting time after which the call is shed with LLMOverloadedError.
+    """
+
+    def __init__(self,
+                 requests_per_minute: int = 500,
+                 tokens_per_minute: int = 200_000,
+                 max_concurrency: int = 32,
+                 max_wait: Dict[Priority, float] | None = None):
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.max_concurrency = max_concurrency
+        self.max_wait = {Priority.INTERACTIVE: 10.0, Priority.DEFERRABLE: 120.0}
+        self.max_wait.update(max_wait or {})
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+
+    @classmethod
+    def from_env(cls) -> 'LLMScheduler':
+        return cls(requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+                   tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+                   max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+                   max_wait={Priority.INTERACTIVE: float(os.getenv("LLM_MAX_WAIT_INTERACTIVE", "10")),
+                             Priority.DEFERRABLE: float(os.getenv("LLM_MAX_WAIT_DEFERRABLE", "120"))})
+
+    def acquire(self, priority: Priority, estimated_tokens: int) -> None:
+        """Block until the call may run, raise LLMOverloadedError when the wait bound is exceeded"""
+        start = time.monotonic()
+        deadline = start + self.max_wait[priority]
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            self._update_queue_depth()
+            try:
+                while True:
+                    delay = None
+                    if self._waiters[0] == entry and self._in_flight < self.max_concurrency:
+                        delay = max(self._requests.delay(1), self._tokens.delay(estimated_tokens))
+                        if delay == 0:
+                            self._requests.consume(1)
+                            self._tokens.consume(estimated_tokens)
+                            self._in_flight += 1
+                            break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or (delay is not None and delay > remaining):
+                        retry_after = max(1.0, delay or self._requests.delay(1) or 1.0)
+                        shed_calls.inc(priority=priority.name)
+                        raise LLMOverloadedError(f"LLM capacity exhausted, {len(self._waiters)} calls waiting",
+                                                 retry_after=math.ceil(retry_after))
+                    self._cond.wait(timeout=min(remaining, delay) if delay else remaining)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._update_queue_depth()
+                self._cond.notify_all()
+
+        in_flight_calls.set(self._in_flight)
+        queue_wait.observe(time.monotonic() - start, priority=priority.name)
+
+    def release(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Free the slot and settle the token bucket with the actual usage"""
+        with self._cond:
+            self._in_flight -= 1
+            self._tokens.adjust(estimated_tokens - actual_tokens)
+            self._cond.notify_all()
+        in_flight_calls.set(self._in_flight)
+
+    @contextmanager
+    def slot(self, priority: Priority, estimated_tokens: int) -> Iterator[SchedulerSlot]:
+        self.acquire(priority, estimated_tokens)
+        slot = SchedulerSlot(priority=priority, estimated_tokens=estimated_tokens, tokens=estimated_tokens)
+        try:
+            yield slot
+        finally:
+            self.release(estimated_tokens, slot.tokens)
+
+    def _update_queue_depth(self) -> None:
+        for priority in Priority:
+            queue_depth.set(sum(1 for p, _ in self._waiters if p == priority), priority=priority.name)
+
+
+# Shared by every LLM call of the process
+scheduler = LLMScheduler.from_env()
@@ -1,7 +1,39 @@
 import os
+from functools import lru_cache
+from typing import Any, Dict, List
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
 
+@lru_cache(maxsize=None)
 def load_prompt(file_path: str) -> str:
     """Load a prompt from a file."""
     prompt_file_path = os.path.join(os.path.dirname(__file__), '..', 'agent', file_path)
     with open(prompt_file_path, 'r', encoding='utf-8') as file:
-        return file.read()
\ No newline at end of file
+        return file.read()
+
+
+def build_layered_prompt(system_file: str,
+                         context_file: str,
+                         turn_file: str,
+                         context: Dict[str, Any],
+                         turn: Dict[str, Any]) -> List[BaseMessage]:
+    """Build the prompt messages ordered from the most to the least stable part.
+
+    Providers cache the longest common prefix of the prompts, so the static instructions
+    come first (shared by every call), then the per-test context (shared by the calls of
+    an interview), then the per-turn context (remaining time, history).
+
+    Args:
+        system_file: The static instructions, without placeholders.
+        context_file: The per-test context template.
+        turn_file: The per-turn context template.
+        context: The per-test values, e.g. job title, knowledge points, difficulty.
+        turn: The per-turn values, e.g. remaining time, qa_history.
+
+    Returns:
+        The system message and the two human messages.
+    """
+    return [
+        SystemMessage(content=load_prompt(system_file)),
+        HumanMessage(content=load_prompt(context_file).format(**context)),
+        HumanMessage(content=load_prompt(turn_file).format(**turn))
+    ]